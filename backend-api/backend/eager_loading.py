@@ -0,0 +1,44 @@
+"""
+Declarative eager loading
+Serializers declare the relations they read in Meta.select_related and
+Meta.prefetch_related; viewsets using EagerLoadingMixin apply them to every
+queryset or page they serialize, so a list costs a constant number of
+queries however many rows it has.
+"""
+from django.db.models import QuerySet, prefetch_related_objects
+
+
+def eager_load(data, serializer_class):
+    """Apply a serializer's declared relations to a queryset or list of instances"""
+    meta = getattr(serializer_class, 'Meta', None)
+    select_related = getattr(meta, 'select_related', ())
+    prefetch_related = getattr(meta, 'prefetch_related', ())
+
+    if isinstance(data, QuerySet):
+        if select_related:
+            data = data.select_related(*select_related)
+        if prefetch_related:
+            data = data.prefetch_related(*prefetch_related)
+        return data
+
+    # Pages and other evaluated lists: relations already cached are skipped
+    instances = list(data)
+    if instances and (select_related or prefetch_related):
+        prefetch_related_objects(instances, *select_related, *prefetch_related)
+    return instances
+
+
+class EagerLoadingMixin:
+    """
+    Viewset mixin applying the serializer's declared relations to the
+    queryset of list/retrieve and to whatever custom actions serialize
+    with many=True
+    """
+
+    def filter_queryset(self, queryset):
+        return eager_load(super().filter_queryset(queryset), self.get_serializer_class())
+
+    def get_serializer(self, *args, **kwargs):
+        if args and kwargs.get('many'):
+            args = (eager_load(args[0], self.get_serializer_class()), *args[1:])
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,224 @@
+"""
+Query budget testing
+QueryBudgetTestCase seeds a condominium with deliverers, services, orders,
+reviews and payments, measures the queries an endpoint runs with 10 rows of
+everything and again with 1000, and fails when the count grows with the
+rows (an N+1) or goes over the endpoint's budget.
+"""
+import datetime
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from condominiums.models import Condominium, Department
+from users.models import UserAccount
+from services.load import DelivererLoadService
+from services.models import TypeOfService, Service, Order, Payment, Review
+from services.rollups import EarningsRollupService
+from services.stats import UserOrderStatsService
+
+
+class QueryBudgetWorld:
+    """
+    Fixtures of the budget tests: a receiver, a deliverer and a staff user
+    in one condominium, grown to a number of rows of every collection an
+    endpoint can list
+    """
+
+    PASSWORD = 'secret-password'
+
+    def __init__(self):
+        self.rows = 0
+        self.now = timezone.now()
+        self.condominium = Condominium.objects.create(
+            name='Condominio Central', address='Av. Siempre Viva 123', district='Centro',
+            region='Lima', entries=1
+        )
+        self.receiver = self._create_user(
+            'receptor@example.com', UserAccount.UserRole.RECEIVER, tower='A', floor=1
+        )
+        self.deliverer = self._create_user(
+            'repartidor@example.com', UserAccount.UserRole.DELIVERER, tower='A', floor=2,
+            is_available_for_delivery=True
+        )
+        # Available deliverer without orders, to claim from the open pool
+        self.claimer = self._create_user(
+            'reclamador@example.com', UserAccount.UserRole.DELIVERER, tower='B', floor=1,
+            is_available_for_delivery=True
+        )
+        self.staff = UserAccount.objects.create_user(
+            email='admin@example.com', password=self.PASSWORD, first_name='Admin',
+            last_name='Sistema', is_staff=True
+        )
+        self.type_of_service = TypeOfService.objects.create(
+            name='Entrega de paquetes', description='Paquetes de conserjería', price=Decimal('5.00')
+        )
+        self.service = Service.objects.create(type_of_service=self.type_of_service, user=self.deliverer)
+
+    def _create_user(self, email, role, tower, floor, **kwargs):
+        department = Department.objects.create(
+            condominium=self.condominium, name=f'{tower}{floor:02d}', tower=tower, floor=floor
+        )
+        return UserAccount.objects.create_user(
+            email=email, password=self.PASSWORD, first_name='Usuario', last_name=email.split('@')[0],
+            role=role, department=department, **kwargs
+        )
+
+    def grow(self, rows):
+        """Add rows up to the given number of each collection and resync derived state"""
+        start, self.rows = self.rows, max(self.rows, rows)
+        new = range(start, self.rows)
+        if not new:
+            return
+
+        Condominium.objects.bulk_create([
+            Condominium(
+                name=f'Condominio {i}', address=f'Calle {i}', district='Centro', region='Lima', entries=1
+            )
+            for i in new
+        ])
+
+        # Available deliverers, each in its own department of the condominium
+        departments = Department.objects.bulk_create([
+            Department(condominium=self.condominium, name=f'D{i}', tower=f'T{i % 8}', floor=i % 20)
+            for i in new
+        ])
+        UserAccount.objects.bulk_create([
+            UserAccount(
+                email=f'repartidor{i}@example.com', password='!', first_name='Repartidor',
+                last_name=str(i), role=UserAccount.UserRole.DELIVERER,
+                is_available_for_delivery=True, department=department
+            )
+            for i, department in zip(new, departments)
+        ])
+
+        types = TypeOfService.objects.bulk_create([
+            TypeOfService(name=f'Servicio {i}', description='Servicio de prueba', price=Decimal('5.00'))
+            for i in new
+        ])
+        services = Service.objects.bulk_create([
+            Service(type_of_service=type_of_service, user=self.deliverer)
+            for type_of_service in types
+        ])
+
+        def order(status, deliverer, scheduled_date, service=None):
+            return Order(
+                receiver=self.receiver, deliverer=deliverer, service=service,
+                condominium=self.condominium, status=status,
+                scheduled_date=scheduled_date, amount=Decimal('5.00')
+            )
+
+        # Completed history, one order per hour back, each reviewed and paid
+        completed = Order.objects.bulk_create([
+            order(Order.OrderStatus.COMPLETED, self.deliverer,
+                  self.now - datetime.timedelta(hours=i + 1), service)
+            for i, service in zip(new, services)
+        ])
+        Review.objects.bulk_create([
+            Review(user=self.receiver, order=completed_order, rating=i % 5 + 1,
+                   comment='Buen servicio', service=completed_order.service)
+            for i, completed_order in zip(new, completed)
+        ])
+        Payment.objects.bulk_create([
+            Payment(order=completed_order, amount=completed_order.amount)
+            for completed_order in completed
+        ])
+
+        # Accepted orders ahead of the deliverer and unassigned ones in the open pool
+        Order.objects.bulk_create([
+            order(Order.OrderStatus.ACCEPTED, self.deliverer,
+                  self.now + datetime.timedelta(hours=2, minutes=37 * i))
+            for i in new
+        ] + [
+            order(Order.OrderStatus.PENDING, None,
+                  self.now + datetime.timedelta(hours=3, minutes=11 * i))
+            for i in new
+        ])
+
+        # Bulk inserts bypass Order.save: rebuild loads, stats and rollups
+        DelivererLoadService.rebuild([self.deliverer.id])
+        UserOrderStatsService.rebuild([self.receiver.id, self.deliverer.id])
+        EarningsRollupService.rebuild([self.deliverer.id])
+        cache.clear()
+
+    def create_user(self):
+        """A new receiver with its own department, saved through create_user"""
+        self.users_created = getattr(self, 'users_created', 0) + 1
+        return self._create_user(
+            f'nuevo{self.users_created}@example.com', UserAccount.UserRole.RECEIVER,
+            tower='N', floor=self.users_created
+        )
+
+    def create_order(self, status=Order.OrderStatus.PENDING, deliverer=None, **kwargs):
+        """A new order of the receiver, saved through Order.save"""
+        return Order.objects.create(
+            receiver=self.receiver, deliverer=deliverer, status=status,
+            scheduled_date=kwargs.pop('scheduled_date', self.now + datetime.timedelta(hours=4)),
+            amount=kwargs.pop('amount', Decimal('5.00')), **kwargs
+        )
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class of the query budget suites. assertQueryBudget runs a request
+    at each size in ROWS, after a warm-up call that fills the caches, and
+    checks the measured query counts are equal and within the budget.
+    """
+
+    ROWS = (10, 1000)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = QueryBudgetWorld()
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticated(self, user):
+        """A fresh copy of user, loaded with one query like token authentication does"""
+        return UserAccount.objects.get(pk=user.pk)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(self.authenticated(user))
+        return client
+
+    def call_view(self, viewset, actions, user, method='get', data=None, **kwargs):
+        """Call a viewset action directly, for routes other URL patterns shadow"""
+        factory = APIRequestFactory()
+        if method == 'get':
+            request = factory.get('/', data)
+        else:
+            request = getattr(factory, method)('/', data, format='json')
+        force_authenticate(request, user=self.authenticated(user))
+        response = viewset.as_view(actions)(request, **kwargs)
+        response.render()
+        return response
+
+    def assertQueryBudget(self, budget, request, prepare=None):
+        """
+        request(*prepare()) performs one call and returns its response;
+        prepare, run outside the measurement, creates what a write consumes
+        """
+        counts = []
+        for rows in self.ROWS:
+            self.world.grow(rows)
+            for _ in range(2):
+                args = prepare() if prepare else ()
+                with CaptureQueriesContext(connection) as queries:
+                    response = request(*args)
+                self.assertLess(
+                    response.status_code, 400,
+                    f"{response.status_code}: {getattr(response, 'data', response.content)}"
+                )
+            counts.append(len(queries))
+
+        self.assertEqual(
+            counts[0], counts[-1],
+            f"Queries grow with rows: {dict(zip(self.ROWS, counts))}\n"
+            + "\n".join(query['sql'] for query in queries.captured_queries)
+        )
+        self.assertLessEqual(counts[-1], budget, f"{counts[-1]} queries over a budget of {budget}")
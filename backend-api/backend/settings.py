@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 env = environ.Env()
 environ.Env.read_env()
@@ -95,6 +96,20 @@ DATABASES = {
     }
 }
 
+# Cache (slot occupancy, deliverer roster, slot templates and other shared lookups)
+# Defaults to per-process memory, which is only correct with a single worker:
+# set CACHE_URL (e.g. redis://...) whenever WEB_CONCURRENCY is above 1 so every
+# worker sees the same invalidations
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+if env.int('WEB_CONCURRENCY', default=1) > 1 and CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    raise ImproperlyConfigured(
+        'CACHE_URL debe apuntar a una caché compartida cuando WEB_CONCURRENCY es mayor a 1'
+    )
+
 # Email settings
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -180,6 +195,20 @@ DJOSER = {
     'SOCIAL_AUTH_ALLOWED_REDIRECT_URIS': env('REDIRECT_URLS').split(',')
 }
 
+# Order assignment
+# PROXIMITY_WEIGHT: 0 assigns by fairness only, values up to 1 increasingly
+# prefer deliverers living close to the receiver (same tower, nearby floor)
+# ASYNC: queue new orders for `manage.py run_assignment_worker` instead of
+# assigning them during the request
+# MAX_REASSIGNMENTS: rejections after which an order is left NOT_ASSIGNED
+ORDER_ASSIGNMENT = {
+    'PROXIMITY_WEIGHT': env.float('ORDER_ASSIGNMENT_PROXIMITY_WEIGHT', default=0.0),
+    'ASYNC': env.bool('ORDER_ASSIGNMENT_ASYNC', default=False),
+    'MAX_REASSIGNMENTS': env.int('ORDER_ASSIGNMENT_MAX_REASSIGNMENTS', default=3),
+    'ACCEPTANCE_TIMEOUT': env.int('ORDER_ASSIGNMENT_ACCEPTANCE_TIMEOUT', default=30),
+    'IMMEDIATE_ACCEPTANCE_TIMEOUT': env.int('ORDER_ASSIGNMENT_IMMEDIATE_ACCEPTANCE_TIMEOUT', default=5),
+}
+
 AUTH_COOKIE = 'access'
 AUTH_COOKIE_MAX_AGE = 60 * 60 * 24  # 1 DAY
 AUTH_COOKIE_SECURE = env('AUTH_COOKIE_SECURE') == 'True'
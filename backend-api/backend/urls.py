@@ -16,9 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from users.urls import shadowed_urlpatterns
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/', include(shadowed_urlpatterns)),
     path('api/', include('djoser.urls')),
     path('api/', include('users.urls')),
     path('api/', include('services.urls')),
@@ -9,6 +9,17 @@ class CondominiumAdmin(admin.ModelAdmin):
     list_filter = ('district', 'region')
     search_fields = ('name', 'address', 'district')
     ordering = ('name',)
+    fieldsets = (
+        (None, {'fields': ('name', 'address', 'district', 'region', 'entries')}),
+        ('Horario de entregas', {'fields': (
+            'opening_time', 'closing_time', 'slot_minutes', 'time_zone',
+            'closed_weekdays', 'blackout_dates'
+        )}),
+        ('Aceptación de órdenes', {'fields': (
+            'open_orders_mode', 'acceptance_timeout_minutes',
+            'immediate_acceptance_timeout_minutes'
+        )}),
+    )
 
     def get_departments_count(self, obj):
         """Get count of departments in condominium"""
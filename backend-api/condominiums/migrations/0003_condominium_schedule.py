@@ -0,0 +1,46 @@
+# Generated by Django 5.0.3
+
+import condominiums.models
+import datetime
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominiums', '0002_condominium_created_at_condominium_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='condominium',
+            name='blackout_dates',
+            field=models.JSONField(blank=True, default=list, verbose_name='Fechas sin entregas'),
+        ),
+        migrations.AddField(
+            model_name='condominium',
+            name='closed_weekdays',
+            field=models.JSONField(blank=True, default=list, verbose_name='Días de la semana sin entregas'),
+        ),
+        migrations.AddField(
+            model_name='condominium',
+            name='closing_time',
+            field=models.TimeField(default=datetime.time(20, 0), verbose_name='Hora de cierre'),
+        ),
+        migrations.AddField(
+            model_name='condominium',
+            name='opening_time',
+            field=models.TimeField(default=datetime.time(8, 0), verbose_name='Hora de apertura'),
+        ),
+        migrations.AddField(
+            model_name='condominium',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(5), django.core.validators.MaxValueValidator(240)], verbose_name='Duración del horario (minutos)'),
+        ),
+        migrations.AddField(
+            model_name='condominium',
+            name='time_zone',
+            field=models.CharField(default='UTC', max_length=64, validators=[condominiums.models.validate_time_zone], verbose_name='Zona horaria'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominiums', '0003_condominium_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='condominium',
+            name='acceptance_timeout_minutes',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Minutos para aceptar órdenes programadas'),
+        ),
+        migrations.AddField(
+            model_name='condominium',
+            name='immediate_acceptance_timeout_minutes',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Minutos para aceptar órdenes inmediatas'),
+        ),
+    ]
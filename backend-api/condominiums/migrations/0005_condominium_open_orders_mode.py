@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominiums', '0004_condominium_acceptance_timeouts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='condominium',
+            name='open_orders_mode',
+            field=models.BooleanField(default=False, verbose_name='Órdenes abiertas'),
+        ),
+    ]
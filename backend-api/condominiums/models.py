@@ -1,18 +1,75 @@
-from django.db import models
+import datetime
+import zoneinfo
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import models, transaction
 from django.utils import timezone
 
+
+def validate_time_zone(value):
+    if value not in zoneinfo.available_timezones():
+        raise ValidationError(f"Zona horaria inválida: {value}")
+
+
 class Condominium(models.Model):
     name = models.CharField(max_length=255)
     address = models.CharField(max_length=255)
     district = models.CharField(max_length=255)
     region = models.CharField(max_length=255)
     entries = models.IntegerField()
+
+    # Delivery schedule, compiled into a cached SlotTemplate (see schedule.py)
+    opening_time = models.TimeField(default=datetime.time(8, 0), verbose_name="Hora de apertura")
+    closing_time = models.TimeField(default=datetime.time(20, 0), verbose_name="Hora de cierre")
+    slot_minutes = models.PositiveSmallIntegerField(
+        default=30,
+        validators=[MinValueValidator(5), MaxValueValidator(240)],
+        verbose_name="Duración del horario (minutos)"
+    )
+    time_zone = models.CharField(
+        max_length=64, default='UTC', validators=[validate_time_zone],
+        verbose_name="Zona horaria"
+    )
+    # Weekdays without deliveries, 0 = Monday ... 6 = Sunday
+    closed_weekdays = models.JSONField(default=list, blank=True, verbose_name="Días de la semana sin entregas")
+    # Specific dates without deliveries, as YYYY-MM-DD strings
+    blackout_dates = models.JSONField(default=list, blank=True, verbose_name="Fechas sin entregas")
+
+    # Minutes a deliverer has to accept an order; empty uses ORDER_ASSIGNMENT defaults
+    acceptance_timeout_minutes = models.PositiveSmallIntegerField(
+        null=True, blank=True, validators=[MinValueValidator(1)],
+        verbose_name="Minutos para aceptar órdenes programadas"
+    )
+    immediate_acceptance_timeout_minutes = models.PositiveSmallIntegerField(
+        null=True, blank=True, validators=[MinValueValidator(1)],
+        verbose_name="Minutos para aceptar órdenes inmediatas"
+    )
+    # New orders wait in an open pool for deliverers to claim instead of being pushed
+    open_orders_mode = models.BooleanField(default=False, verbose_name="Órdenes abiertas")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name}"
 
+    def clean(self):
+        if self.opening_time >= self.closing_time:
+            raise ValidationError("La hora de apertura debe ser anterior a la hora de cierre")
+        if any(day not in range(7) for day in self.closed_weekdays):
+            raise ValidationError("Los días de la semana van de 0 (lunes) a 6 (domingo)")
+        try:
+            for blackout_date in self.blackout_dates:
+                datetime.date.fromisoformat(blackout_date)
+        except (TypeError, ValueError):
+            raise ValidationError("Las fechas sin entregas deben tener formato YYYY-MM-DD")
+
+    def save(self, *args, **kwargs):
+        from .schedule import SlotTemplate
+
+        super().save(*args, **kwargs)
+        transaction.on_commit(lambda: SlotTemplate.invalidate(self.pk))
+
 class Department(models.Model):
     condominium = models.ForeignKey(Condominium, on_delete=models.CASCADE, related_name="departments")
     name = models.CharField(max_length=255)
@@ -23,3 +80,41 @@ class Department(models.Model):
 
     def __str__(self):
         return f"{self.name} - {self.condominium.name}"
+
+    # Fields that place the department's deliverers on a condominium's roster
+    ROSTER_FIELDS = ('condominium_id', 'tower', 'floor')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted roster fields to invalidate deliverer rosters on change
+        instance._tracked_roster_state = tuple(
+            instance.__dict__.get(field) for field in cls.ROSTER_FIELDS
+        )
+        return instance
+
+    def _roster_state(self):
+        return tuple(getattr(self, field) for field in self.ROSTER_FIELDS)
+
+    def save(self, *args, **kwargs):
+        from services.roster import DelivererRoster
+        from services.reservations import SlotReservationService
+
+        previous_state = getattr(self, '_tracked_roster_state', None)
+        super().save(*args, **kwargs)
+        # New departments have no residents yet
+        if previous_state is not None and previous_state != self._roster_state():
+            DelivererRoster.invalidate({previous_state[0], self.condominium_id})
+            if previous_state[0] != self.condominium_id:
+                # Its deliverers moved to another condominium's slots
+                SlotReservationService.staffing_changed({previous_state[0], self.condominium_id})
+        self._tracked_roster_state = self._roster_state()
+
+    def delete(self, *args, **kwargs):
+        from services.roster import DelivererRoster
+        from services.reservations import SlotReservationService
+
+        # Residents lose their department without going through UserAccount.save
+        DelivererRoster.invalidate({self.condominium_id})
+        SlotReservationService.staffing_changed({self.condominium_id})
+        return super().delete(*args, **kwargs)
@@ -0,0 +1,116 @@
+"""
+Slot Templates
+Compiles the delivery schedule of a condominium (hours, slot length, time
+zone and days without deliveries) once into a template that is cached and
+reused to generate the slots of any date
+"""
+import datetime
+import zoneinfo
+from django.core.cache import cache
+from users.shifts import ShiftMask
+from .models import Condominium
+
+
+class SlotTemplate:
+    """Compiled delivery schedule of one condominium"""
+
+    # Seconds a compiled template is kept; saving the condominium drops it
+    # from the shared cache, so every worker recompiles it on its next read
+    TIMEOUT = 24 * 60 * 60
+
+    def __init__(self, condominium):
+        self.condominium_id = condominium.id
+        self.time_zone = zoneinfo.ZoneInfo(condominium.time_zone)
+        self.slot_minutes = condominium.slot_minutes
+        self.closed_weekdays = frozenset(condominium.closed_weekdays)
+        self.blackout_dates = frozenset(
+            datetime.date.fromisoformat(blackout_date)
+            for blackout_date in condominium.blackout_dates
+        )
+
+        # Local start time of every slot, e.g. 08:00, 08:30, ... 19:30
+        opening = datetime.datetime.combine(datetime.date.min, condominium.opening_time)
+        closing = datetime.datetime.combine(datetime.date.min, condominium.closing_time)
+        step = datetime.timedelta(minutes=self.slot_minutes)
+        self.local_times = []
+        while opening + step <= closing:
+            self.local_times.append(opening.time())
+            opening += step
+        # Shift bit of every slot, to match against deliverer shift masks
+        self.slot_bits = [ShiftMask.bit_for(local_time) for local_time in self.local_times]
+
+    @property
+    def labels(self):
+        """Slot start times as HH:MM strings"""
+        return [local_time.strftime('%H:%M') for local_time in self.local_times]
+
+    @staticmethod
+    def _key(condominium_id):
+        return f"slot_template:{condominium_id}"
+
+    @staticmethod
+    def for_condominium(condominium):
+        """Get the compiled template of a condominium (instance or id)"""
+        condominium_id = getattr(condominium, 'id', condominium)
+        template = cache.get(SlotTemplate._key(condominium_id))
+        if template is None:
+            if not isinstance(condominium, Condominium):
+                condominium = Condominium.objects.get(pk=condominium_id)
+            template = SlotTemplate(condominium)
+            cache.set(SlotTemplate._key(condominium_id), template, SlotTemplate.TIMEOUT)
+        return template
+
+    @staticmethod
+    def invalidate(condominium_id):
+        """Drop the cached template after the schedule changed"""
+        cache.delete(SlotTemplate._key(condominium_id))
+
+    def is_open(self, date):
+        """Whether deliveries are scheduled on a local date"""
+        return date.weekday() not in self.closed_weekdays and date not in self.blackout_dates
+
+    def slot_times(self, date):
+        """Aware start datetimes of the slots of a local date (none if closed)"""
+        if not self.is_open(date):
+            return []
+        return [
+            datetime.datetime.combine(date, local_time, tzinfo=self.time_zone)
+            for local_time in self.local_times
+        ]
+
+    def slot_shift_keys(self, date):
+        """(weekday, shift bit) of each slot returned by slot_times(date)"""
+        if not self.is_open(date):
+            return []
+        weekday = date.weekday()
+        return [(weekday, slot_bit) for slot_bit in self.slot_bits]
+
+    def slot_start(self, value):
+        """Aware start of the slot containing a datetime, or None outside the schedule"""
+        local_value = self.localize(value)
+        if not self.local_times or not self.is_open(local_value.date()):
+            return None
+        opening = datetime.datetime.combine(
+            local_value.date(), self.local_times[0], tzinfo=self.time_zone
+        )
+        index = (local_value - opening) // datetime.timedelta(minutes=self.slot_minutes)
+        if not 0 <= index < len(self.local_times):
+            return None
+        return datetime.datetime.combine(
+            local_value.date(), self.local_times[index], tzinfo=self.time_zone
+        )
+
+    def day_bounds(self, date):
+        """Aware start and end of a local date"""
+        start = datetime.datetime.combine(date, datetime.time.min, tzinfo=self.time_zone)
+        return start, datetime.datetime.combine(
+            date + datetime.timedelta(days=1), datetime.time.min, tzinfo=self.time_zone
+        )
+
+    def localize(self, value):
+        """Aware datetime converted to the condominium time zone"""
+        return value.astimezone(self.time_zone)
+
+    def today(self):
+        """Current local date of the condominium"""
+        return datetime.datetime.now(self.time_zone).date()
@@ -8,6 +8,10 @@ class CondominiumSerializer(serializers.ModelSerializer):
     class Meta:
         model = Condominium
         fields = ['id', 'name', 'address', 'district', 'region', 'entries',
+                  'opening_time', 'closing_time', 'slot_minutes', 'time_zone',
+                  'closed_weekdays', 'blackout_dates',
+                  'acceptance_timeout_minutes', 'immediate_acceptance_timeout_minutes',
+                  'open_orders_mode',
                   'departments', 'departments_count']
 
     def get_departments(self, obj):
@@ -18,6 +22,9 @@ class CondominiumSerializer(serializers.ModelSerializer):
         return None
 
     def get_departments_count(self, obj):
+        # Annotated by CondominiumViewSet; counted per condominium elsewhere
+        if hasattr(obj, 'departments_total'):
+            return obj.departments_total
         return obj.departments.count()
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -1,3 +1,118 @@
+import datetime
+import zoneinfo
+from django.core.cache import cache
 from django.test import TestCase
+from backend.query_budget import QueryBudgetTestCase, QueryBudgetWorld
+from services.roster import DelivererRoster
+from users.shifts import ShiftMask
+from .models import Condominium, Department
+from .schedule import SlotTemplate
 
-# Create your tests here.
+
+class DepartmentRosterTests(TestCase):
+    """Department edits reach the cached deliverer rosters"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.department = Department.objects.get(pk=self.world.deliverer.department_id)
+
+    def test_tower_change_invalidates_roster(self):
+        condominium_id = self.world.condominium.id
+        self.assertEqual(DelivererRoster.get(condominium_id)[self.world.deliverer.id][:2], ('A', 2))
+        self.department.tower = 'C'
+        self.department.floor = 7
+        self.department.save()
+        self.assertEqual(DelivererRoster.get(condominium_id)[self.world.deliverer.id][:2], ('C', 7))
+        self.assertIn((7, self.world.deliverer.id), DelivererRoster.layout(condominium_id)['C'])
+
+    def test_delete_invalidates_roster(self):
+        condominium_id = self.world.condominium.id
+        self.assertIn(self.world.deliverer.id, DelivererRoster.get(condominium_id))
+        self.department.delete()
+        self.assertNotIn(self.world.deliverer.id, DelivererRoster.get(condominium_id))
+
+
+class SlotTemplateTests(TestCase):
+    """Slots generated from a condominium's delivery schedule"""
+
+    def setUp(self):
+        cache.clear()
+        self.condominium = Condominium.objects.create(
+            name='Condominio Sur', address='Av. Costanera 45', district='Providencia', region='Santiago',
+            entries=1, opening_time=datetime.time(9), closing_time=datetime.time(12), slot_minutes=60,
+            time_zone='America/Santiago', closed_weekdays=[6], blackout_dates=['2030-01-08']
+        )
+        self.template = SlotTemplate.for_condominium(self.condominium)
+        self.local = zoneinfo.ZoneInfo('America/Santiago')
+        self.monday = datetime.date(2030, 1, 7)
+
+    def test_slots_are_local_times(self):
+        slot_times = self.template.slot_times(self.monday)
+        self.assertEqual(slot_times, [
+            datetime.datetime(2030, 1, 7, hour, tzinfo=self.local) for hour in (9, 10, 11)
+        ])
+        # Summer time in Santiago is UTC-3
+        self.assertEqual(slot_times[0], datetime.datetime(2030, 1, 7, 12, tzinfo=datetime.timezone.utc))
+        self.assertEqual(self.template.labels, ['09:00', '10:00', '11:00'])
+        self.assertEqual(self.template.slot_shift_keys(self.monday), [
+            (0, ShiftMask.bit_for(datetime.time(hour))) for hour in (9, 10, 11)
+        ])
+        self.assertEqual(self.template.day_bounds(self.monday), (
+            datetime.datetime(2030, 1, 7, tzinfo=self.local), datetime.datetime(2030, 1, 8, tzinfo=self.local)
+        ))
+
+    def test_closed_days_have_no_slots(self):
+        for date in (datetime.date(2030, 1, 8), datetime.date(2030, 1, 13)):
+            self.assertFalse(self.template.is_open(date))
+            self.assertEqual(self.template.slot_times(date), [])
+            self.assertEqual(self.template.slot_shift_keys(date), [])
+
+    def test_slot_start(self):
+        utc = datetime.timezone.utc
+        self.assertEqual(
+            self.template.slot_start(datetime.datetime(2030, 1, 7, 13, 59, tzinfo=utc)),
+            datetime.datetime(2030, 1, 7, 10, tzinfo=self.local)
+        )
+        # Before opening, at closing time and on a blackout date
+        self.assertIsNone(self.template.slot_start(datetime.datetime(2030, 1, 7, 11, 59, tzinfo=utc)))
+        self.assertIsNone(self.template.slot_start(datetime.datetime(2030, 1, 7, 15, tzinfo=utc)))
+        self.assertIsNone(self.template.slot_start(datetime.datetime(2030, 1, 8, 13, tzinfo=utc)))
+
+    def test_schedule_edits_reach_the_cached_template(self):
+        self.condominium.closing_time = datetime.time(13)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.condominium.save()
+        self.assertEqual(SlotTemplate.for_condominium(self.condominium.id).labels, ['09:00', '10:00', '11:00', '12:00'])
+
+
+class CondominiumQueryBudgetTests(QueryBudgetTestCase):
+    """Query budgets of /api/condominiums/ and /api/departments/"""
+
+    def test_condominium_list(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get('/api/condominiums/'))
+
+    def test_condominium_retrieve(self):
+        # Detail of the condominium every seeded department belongs to
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.receiver).get(
+            f'/api/condominiums/{self.world.condominium.id}/'
+        ))
+
+    def test_department_create(self):
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.staff).post('/api/departments/', {
+            'name': 'C301', 'tower': 'C', 'floor': 3, 'condominium': self.world.condominium.id
+        }, format='json'))
+
+    def test_department_retrieve(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get(
+            f'/api/departments/{self.world.receiver.department_id}/'
+        ))
+
+    def test_department_update(self):
+        self.assertQueryBudget(
+            4,
+            lambda department: self.client_for(self.world.staff).put(f'/api/departments/{department.id}/', {
+                'name': department.name, 'tower': 'C', 'floor': 4, 'condominium': department.condominium_id
+            }, format='json'),
+            prepare=lambda: (Department.objects.get(pk=self.world.receiver.department_id),)
+        )
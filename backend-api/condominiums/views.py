@@ -1,5 +1,6 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 from .models import Department, Condominium
 from .serializers import DepartmentSerializer, CondominiumSerializer
@@ -20,7 +21,7 @@ class DepartmentViewSet(viewsets.ViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def retrieve(self, _request, pk=None):
-        department = get_object_or_404(Department, pk=pk)
+        department = get_object_or_404(Department.objects.select_related('condominium'), pk=pk)
         serializer = DepartmentSerializer(department)
         return Response(serializer.data)
 
@@ -42,7 +43,8 @@ class CondominiumViewSet(viewsets.ReadOnlyModelViewSet):
     - list() → GET /api/condominiums/
     - retrieve() → GET /api/condominiums/1/
     """
-    queryset = Condominium.objects.all()
+    # Department counts come with the rows instead of one COUNT per condominium
+    queryset = Condominium.objects.annotate(departments_total=Count('departments'))
     serializer_class = CondominiumSerializer
     permission_classes = [permissions.IsAuthenticated]
 
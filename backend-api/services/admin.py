@@ -1,6 +1,15 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import TypeOfService, Service, Order, Payment, Review
+from .models import (
+    TypeOfService, Service, Order, Payment, Review, DelivererLoad, AssignmentJob, SlotCapacity,
+    UserOrderStats, DailyEarnings
+)
+from .load import DelivererLoadService
+from .matching import ServiceMatchIndex
+from .stats import UserOrderStatsService
+from .rollups import EarningsRollupService
+from .slot_cache import SlotOccupancyCache
+from .reservations import SlotReservationService
 
 
 @admin.register(TypeOfService)
@@ -24,6 +33,16 @@ class ServiceAdmin(admin.ModelAdmin):
         return obj.orders.count()
     get_orders_count.short_description = 'Órdenes'
 
+    def delete_queryset(self, request, queryset):
+        """Bulk deletes bypass Service.delete, so drop the match indexes here"""
+        condominium_ids = set(
+            queryset.filter(user__department__isnull=False).values_list(
+                'user__department__condominium_id', flat=True
+            )
+        )
+        super().delete_queryset(request, queryset)
+        ServiceMatchIndex.invalidate(condominium_ids)
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -35,7 +54,7 @@ class OrderAdmin(admin.ModelAdmin):
                     'deliverer__first_name')
     ordering = ('-created_at',)
     date_hierarchy = 'scheduled_date'
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('assigned_at', 'created_at', 'updated_at')
 
     fieldsets = (
         ('Información Básica', {
@@ -48,7 +67,7 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': ('scheduled_date', 'is_immediate', 'delivery_notes')
         }),
         ('Fechas', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('assigned_at', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -70,11 +89,38 @@ class OrderAdmin(admin.ModelAdmin):
         )
     status_colored.short_description = 'Estado'
 
+    def _rebuild_stats(self, queryset):
+        """Bulk updates bypass Order.save, so resync the affected users' stats"""
+        user_ids = set()
+        for receiver_id, deliverer_id in queryset.values_list('receiver_id', 'deliverer_id'):
+            user_ids.update(user_id for user_id in (receiver_id, deliverer_id) if user_id)
+        UserOrderStatsService.rebuild(user_ids)
+
+    def _rebuild_rollups(self, queryset):
+        """Bulk updates bypass Order.save, so resync the affected deliverers' earnings rollups"""
+        EarningsRollupService.rebuild(
+            set(queryset.exclude(deliverer__isnull=True).values_list('deliverer_id', flat=True))
+        )
+
+    def _rebuild_loads(self, queryset):
+        """Bulk updates bypass Order.save, so resync the affected deliverers"""
+        deliverers = set(
+            queryset.filter(deliverer__isnull=False).values_list(
+                'deliverer_id', 'deliverer__department__condominium_id'
+            )
+        )
+        if deliverers:
+            DelivererLoadService.rebuild({deliverer_id for deliverer_id, _ in deliverers})
+            SlotOccupancyCache.invalidate(
+                condominium_id for _, condominium_id in deliverers if condominium_id
+            )
+
     def mark_as_accepted(self, request, queryset):
         """Mark selected orders as accepted"""
         updated = queryset.filter(status=Order.OrderStatus.PENDING).update(
             status=Order.OrderStatus.ACCEPTED
         )
+        self._rebuild_stats(queryset)
         self.message_user(request, f'{updated} órdenes marcadas como aceptadas.')
     mark_as_accepted.short_description = "Marcar como Aceptadas"
 
@@ -83,14 +129,23 @@ class OrderAdmin(admin.ModelAdmin):
         updated = queryset.filter(status=Order.OrderStatus.ACCEPTED).update(
             status=Order.OrderStatus.COMPLETED
         )
+        self._rebuild_loads(queryset)
+        self._rebuild_stats(queryset)
+        self._rebuild_rollups(queryset)
         self.message_user(request, f'{updated} órdenes marcadas como completadas.')
     mark_as_completed.short_description = "Marcar como Completadas"
 
     def mark_as_cancelled(self, request, queryset):
         """Mark selected orders as cancelled"""
+        SlotReservationService.release_orders(queryset.exclude(
+            status__in=[Order.OrderStatus.COMPLETED, Order.OrderStatus.CANCELLED]
+        ))
         updated = queryset.exclude(
             status__in=[Order.OrderStatus.COMPLETED, Order.OrderStatus.CANCELLED]
         ).update(status=Order.OrderStatus.CANCELLED)
+        self._rebuild_loads(queryset)
+        self._rebuild_stats(queryset)
+        self._rebuild_rollups(queryset)
         self.message_user(request, f'{updated} órdenes canceladas.')
     mark_as_cancelled.short_description = "Cancelar Órdenes"
 
@@ -98,16 +153,101 @@ class OrderAdmin(admin.ModelAdmin):
         """Auto-assign deliverer to orders without one"""
         from .assignment import OrderAssignmentService
 
-        assigned_count = 0
-        for order in queryset.filter(deliverer__isnull=True):
-            deliverer = OrderAssignmentService.assign_order_to_deliverer(order)
-            if deliverer:
-                assigned_count += 1
+        assigned_count = len(OrderAssignmentService.assign_orders(queryset))
 
         self.message_user(request, f'{assigned_count} órdenes asignadas a repartidores.')
     assign_deliverer.short_description = "Asignar Repartidor Automáticamente"
 
 
+@admin.register(DelivererLoad)
+class DelivererLoadAdmin(admin.ModelAdmin):
+    """Admin configuration for DelivererLoad model"""
+    list_display = ('deliverer', 'active_orders', 'get_recent_count', 'updated_at')
+    search_fields = ('deliverer__email', 'deliverer__first_name', 'deliverer__last_name')
+    ordering = ('-active_orders',)
+    readonly_fields = ('updated_at',)
+    actions = ['rebuild_loads']
+
+    def get_recent_count(self, obj):
+        return DelivererLoadService.recent_count(obj)
+    get_recent_count.short_description = 'Órdenes últimos 7 días'
+
+    def rebuild_loads(self, request, queryset):
+        """Recompute selected load records from order history"""
+        rebuilt = DelivererLoadService.rebuild(queryset.values_list('deliverer_id', flat=True))
+        self.message_user(request, f'{rebuilt} registros de carga recalculados.')
+    rebuild_loads.short_description = "Recalcular carga desde historial"
+
+
+@admin.register(UserOrderStats)
+class UserOrderStatsAdmin(admin.ModelAdmin):
+    """Admin configuration for UserOrderStats model"""
+    list_display = ('user', 'earnings', 'spent', 'rating_count', 'updated_at')
+    search_fields = ('user__email', 'user__first_name', 'user__last_name')
+    readonly_fields = ('updated_at',)
+    actions = ['rebuild_stats']
+
+    def rebuild_stats(self, request, queryset):
+        """Recompute selected stats records from order and review history"""
+        rebuilt = UserOrderStatsService.rebuild(queryset.values_list('user_id', flat=True))
+        self.message_user(request, f'{rebuilt} estadísticas recalculadas.')
+    rebuild_stats.short_description = "Recalcular estadísticas desde historial"
+
+
+@admin.register(DailyEarnings)
+class DailyEarningsAdmin(admin.ModelAdmin):
+    """Admin configuration for DailyEarnings model"""
+    list_display = ('deliverer', 'condominium', 'day', 'completed_orders', 'amount', 'updated_at')
+    list_filter = ('condominium', 'day')
+    search_fields = ('deliverer__email', 'deliverer__first_name', 'deliverer__last_name')
+    date_hierarchy = 'day'
+    readonly_fields = ('updated_at',)
+    actions = ['rebuild_rollups']
+
+    def rebuild_rollups(self, request, queryset):
+        """Recompute the rollups of the selected rows' deliverers from order history"""
+        rebuilt = EarningsRollupService.rebuild(set(queryset.values_list('deliverer_id', flat=True)))
+        self.message_user(request, f'{rebuilt} días de ganancias recalculados.')
+    rebuild_rollups.short_description = "Recalcular ganancias diarias desde historial"
+
+
+@admin.register(AssignmentJob)
+class AssignmentJobAdmin(admin.ModelAdmin):
+    """Admin configuration for AssignmentJob model"""
+    list_display = ('id', 'order', 'status', 'attempts', 'created_at', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('order__id', 'last_error')
+    ordering = ('created_at',)
+    readonly_fields = ('created_at', 'updated_at')
+    actions = ['requeue_jobs']
+
+    def requeue_jobs(self, request, queryset):
+        """Put failed jobs back in the queue"""
+        updated = queryset.filter(status=AssignmentJob.JobStatus.FAILED).update(
+            status=AssignmentJob.JobStatus.QUEUED, attempts=0
+        )
+        self.message_user(request, f'{updated} trabajos reencolados.')
+    requeue_jobs.short_description = "Reencolar trabajos fallidos"
+
+
+@admin.register(SlotCapacity)
+class SlotCapacityAdmin(admin.ModelAdmin):
+    """Admin configuration for SlotCapacity model"""
+    list_display = ('id', 'condominium', 'slot_start', 'reserved', 'capacity')
+    list_filter = ('condominium',)
+    ordering = ('-slot_start',)
+    date_hierarchy = 'slot_start'
+    actions = ['refresh_capacity']
+
+    def refresh_capacity(self, request, queryset):
+        """Recompute upcoming slot capacity from the current deliverer roster"""
+        condominium_ids = set(queryset.values_list('condominium_id', flat=True))
+        for condominium_id in condominium_ids:
+            SlotReservationService.refresh_capacity(condominium_id)
+        self.message_user(request, f'Capacidad recalculada para {len(condominium_ids)} condominios.')
+    refresh_capacity.short_description = "Recalcular capacidad"
+
+
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     """Admin configuration for Payment model"""
@@ -2,30 +2,59 @@
 Order Assignment Service
 Handles fair distribution of orders among available deliverers
 """
-from django.db.models import Count, Q
+import heapq
+import random
+from itertools import islice
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
 from users.models import UserAccount
-from .models import Order
+from users.shifts import ShiftMask
+from condominiums.schedule import SlotTemplate
+from .models import DelivererLoad, Order
+from .load import DelivererLoadService
+from .conf import assignment_setting
+from .matching import ServiceMatchIndex
+from .proximity import DelivererProximityIndex
+from .reservations import SlotReservationService
+from .roster import DelivererRoster
+from .slot_cache import SlotOccupancyCache
+from .stats import UserOrderStatsService
 
 
 class OrderAssignmentService:
     """Service for assigning orders to deliverers with fair distribution"""
 
-    @staticmethod
-    def get_available_deliverers(condominium, exclude_user=None):
-        """Get all available deliverers in a condominium"""
-        queryset = UserAccount.objects.filter(
-            Q(role=UserAccount.UserRole.DELIVERER) |
-            Q(role=UserAccount.UserRole.RECEIVER_AND_DELIVERER),
-            is_available_for_delivery=True,
-            department__condominium=condominium
-        )
+    # Orders that are waiting for a deliverer
+    UNASSIGNED_STATUSES = (Order.OrderStatus.PENDING, Order.OrderStatus.NOT_ASSIGNED)
+
+    # Fresh snapshots taken before waiting on a deliverer's load lock
+    MAX_CLAIM_ATTEMPTS = 3
+
+    # Best ranked deliverers tried per snapshot
+    CLAIM_CANDIDATES = 3
 
-        if exclude_user:
-            queryset = queryset.exclude(id=exclude_user.id)
+    # Backlog orders read per free slot when draining, to skip off-shift ones
+    DRAIN_SCAN_FACTOR = 4
 
-        return queryset
+    @staticmethod
+    def get_available_deliverers(condominium, exclude_user=None, exclude_ids=None,
+                                 type_of_service_id=None):
+        """
+        Get all available deliverers in a condominium (read from the cached
+        roster), only those with an active service of type_of_service_id if given
+        """
+        deliverer_ids = DelivererRoster.ids(condominium, exclude_user, exclude_ids)
+        if type_of_service_id:
+            matching_ids = ServiceMatchIndex.deliverer_ids(condominium, type_of_service_id)
+            deliverer_ids = [deliverer_id for deliverer_id in deliverer_ids if deliverer_id in matching_ids]
+        # The roster can be stale for up to its TIMEOUT: re-check role and availability
+        return UserAccount.objects.filter(
+            id__in=deliverer_ids,
+            role__in=DelivererRoster.DELIVERER_ROLES,
+            is_available_for_delivery=True
+        )
 
     @staticmethod
     def assign_order_to_deliverer(order):
@@ -41,65 +70,545 @@ class OrderAssignmentService:
 
         condominium = receiver.department.condominium
 
-        # Get available deliverers
+        # Get available deliverers offering the order's type of service,
+        # skipping those who already rejected the order
         available_deliverers = OrderAssignmentService.get_available_deliverers(
             condominium,
-            exclude_user=receiver
+            exclude_user=receiver,
+            exclude_ids=order.rejected_deliverer_ids,
+            type_of_service_id=ServiceMatchIndex.order_types([order]).get(order.id)
         )
 
-        if not available_deliverers.exists():
-            return None
+        # Only deliverers on shift at the scheduled time are considered
+        local_time = SlotTemplate.for_condominium(condominium).localize(
+            order.scheduled_date or timezone.now()
+        )
+
+        # Claim a deliverer atomically: the claim only succeeds if the
+        # deliverer's load is unchanged since it was read, so concurrent
+        # creations never pick the same deliverer from the same snapshot
+        for _ in range(OrderAssignmentService.MAX_CLAIM_ATTEMPTS):
+            candidates = OrderAssignmentService._load_candidates(available_deliverers, local_time)
+            if not candidates:
+                return None
+            DelivererLoadService.ensure_loads(candidates)
+
+            ranked = OrderAssignmentService._rank_candidates(
+                candidates, receiver.department, condominium.id
+            )
+            for deliverer in islice(ranked, OrderAssignmentService.CLAIM_CANDIDATES):
+                with transaction.atomic():
+                    if DelivererLoadService.claim(deliverer.delivery_load, order):
+                        # The claim already added the order to the deliverer's load
+                        order.deliverer = deliverer
+                        order.save(load_claimed=True)
+                        return deliverer
+
+        # Under heavy contention fall back to waiting for the load row locks:
+        # the candidates' loads are locked (in id order, so callers can't
+        # deadlock) and ranked as they are now, then the best one is claimed
+        candidates = OrderAssignmentService._load_candidates(available_deliverers, local_time)
+        DelivererLoadService.ensure_loads(candidates)
+        with transaction.atomic():
+            loads = DelivererLoad.objects.select_for_update().filter(
+                deliverer_id__in=[deliverer.id for deliverer in candidates]
+            ).order_by('deliverer_id').in_bulk(field_name='deliverer_id')
+            for deliverer in candidates:
+                deliverer.delivery_load = loads[deliverer.id]
+            for deliverer in OrderAssignmentService._rank_candidates(
+                candidates, receiver.department, condominium.id
+            ):
+                if DelivererLoadService.claim(deliverer.delivery_load, order, skip_locked=False):
+                    order.deliverer = deliverer
+                    order.save(load_claimed=True)
+                    return deliverer
 
-        # Get order counts for fair distribution
-        # Count orders from last 7 days to keep it relevant
-        seven_days_ago = timezone.now() - timedelta(days=7)
-
-        deliverers_with_counts = available_deliverers.annotate(
-            recent_order_count=Count(
-                'deliverer_orders',
-                filter=Q(
-                    deliverer_orders__created_at__gte=seven_days_ago,
-                    deliverer_orders__status__in=[
-                        Order.OrderStatus.PENDING,
-                        Order.OrderStatus.ACCEPTED,
-                        Order.OrderStatus.COMPLETED
-                    ]
+        return None
+
+    @staticmethod
+    def _load_candidates(available_deliverers, local_time):
+        """Fetch candidate deliverers on shift at local_time with their load and department"""
+        candidates = [
+            deliverer
+            for deliverer in available_deliverers.select_related('delivery_load', 'department')
+            if ShiftMask.is_on_shift(deliverer.shift_masks, local_time)
+        ]
+        random.shuffle(candidates)  # Random order for ties
+        return candidates
+
+    @staticmethod
+    def _rank_candidates(candidates, receiver_department, condominium_id):
+        """Yield candidates from most to least suitable for the receiver"""
+        proximity_weight = assignment_setting('PROXIMITY_WEIGHT')
+        if proximity_weight > 0:
+            # Blend fairness with how close the deliverer lives to the receiver
+            deliverers = {deliverer.id: deliverer for deliverer in candidates}
+            index = OrderAssignmentService.build_proximity_index(condominium_id, candidates)
+            while len(index):
+                selected_id = index.select(
+                    receiver_department.tower, receiver_department.floor, proximity_weight
+                )
+                if selected_id is None:
+                    return
+                index.remove(selected_id)
+                yield deliverers[selected_id]
+        else:
+            # Deliverers with least recent orders first
+            yield from sorted(
+                candidates,
+                key=lambda deliverer: DelivererLoadService.recent_count(
+                    DelivererLoadService.get_load(deliverer)
                 )
             )
-        ).order_by('recent_order_count', '?')  # Order by count, then random for ties
 
-        # Assign to deliverer with least recent orders
-        selected_deliverer = deliverers_with_counts.first()
+    @staticmethod
+    def assign_orders(orders, respect_capacity=False):
+        """
+        Assign a batch of unassigned orders (an Order queryset) in as few
+        queries as possible.
+        Orders are grouped by condominium; each deliverer pool and its load
+        counters are loaded once and the orders are distributed in memory,
+        always giving the next (oldest) order to the least loaded deliverer.
+        Results are written with one bulk update per condominium.
+        With respect_capacity, deliverers stop receiving orders once they
+        reach MAX_CONCURRENT_ORDERS active orders.
+        Returns the list of assigned orders.
+        """
+        pending_orders = orders.filter(
+            deliverer__isnull=True,
+            status__in=OrderAssignmentService.UNASSIGNED_STATUSES
+        ).select_related('receiver__department').order_by('created_at', 'id')
+
+        orders_by_condominium = defaultdict(list)
+        for order in pending_orders:
+            department = order.receiver.department
+            if department and department.condominium_id:
+                orders_by_condominium[department.condominium_id].append(order)
 
-        if selected_deliverer:
-            order.deliverer = selected_deliverer
-            order.save()
+        assigned_orders = []
+        for condominium_id, condominium_orders in orders_by_condominium.items():
+            with transaction.atomic():
+                assigned = OrderAssignmentService._distribute_orders(
+                    condominium_id, condominium_orders, respect_capacity
+                )
+                assigned = OrderAssignmentService._write_assignments(assigned, condominium_id)
+            assigned_orders.extend(assigned)
+
+        return assigned_orders
+
+    @staticmethod
+    def _write_assignments(assigned, condominium_id):
+        """
+        Persist orders assigned in memory with one bulk update and sync the
+        load counters and slot occupancy. Must run inside a transaction.
+        Returns the orders written: scheduled orders coming back from
+        NOT_ASSIGNED gave their slot back, so they reserve it again and
+        stay unassigned when it's full.
+        """
+        assigned = OrderAssignmentService._reserve_released_slots(assigned, condominium_id)
+        if not assigned:
+            return assigned
+        for order in assigned:
+            order.assigned_at = order.updated_at
+        Order.objects.bulk_update(assigned, ['deliverer', 'status', 'slot', 'assigned_at', 'updated_at'])
+        DelivererLoadService.record_bulk_assignment(assigned)
+        UserOrderStatsService.record_bulk_orders(assigned)
+        for order in assigned:
+            SlotOccupancyCache.order_changed(
+                order, (order.status, None), condominium_id=condominium_id
+            )
+            order._tracked_state = (order.status, order.deliverer_id)
+        return assigned
+
+    @staticmethod
+    def _reserve_released_slots(orders, condominium_id):
+        """
+        Reserve again the slot of the scheduled orders that were NOT_ASSIGNED
+        (see SlotReservationService.RELEASED_STATUSES). Orders whose slot is
+        full are reset in memory and left out. Returns the orders that can
+        be written.
+        """
+        reserved = []
+        for order in orders:
+            persisted_status = getattr(order, '_tracked_state', (None, None))[0]
+            if (
+                persisted_status == Order.OrderStatus.NOT_ASSIGNED
+                and not order.is_immediate and order.slot_id is None
+            ):
+                slot, _ = SlotReservationService.reserve(condominium_id, order.scheduled_date)
+                if slot is None:
+                    order.deliverer = None
+                    order.status = Order.OrderStatus.NOT_ASSIGNED
+                    continue
+                order.slot = slot
+            reserved.append(order)
+        return reserved
+
+    @staticmethod
+    def drain_backlog(deliverer):
+        """
+        Give a deliverer that just became available the oldest unassigned
+        orders of its condominium it can take (see compatible_backlog), up
+        to its free capacity. Returns the list of assigned orders.
+        """
+        if not deliverer.department_id or deliverer.department.condominium.open_orders_mode:
+            # Open pool condominiums leave the backlog to be claimed
+            return []
+
+        with transaction.atomic():
+            DelivererLoadService.lock_loads([deliverer])
+            free = DelivererLoadService.MAX_CONCURRENT_ORDERS - deliverer.delivery_load.active_orders
+            if free <= 0:
+                return []
+
+            now = timezone.now()
+            assigned = OrderAssignmentService.compatible_backlog(deliverer, free, for_update=True)
+            for order in assigned:
+                order.deliverer = deliverer
+                order.status = Order.OrderStatus.PENDING
+                order.updated_at = now
+
+            assigned = OrderAssignmentService._write_assignments(
+                assigned, deliverer.department.condominium_id
+            )
+
+        return assigned
+
+    @staticmethod
+    def compatible_backlog(deliverer, limit, for_update=False):
+        """
+        Oldest unassigned orders of the deliverer's condominium it could take,
+        up to limit: not its own, not rejected by it, of a type of service it
+        offers and inside its shifts. Reads the backlog through the partial
+        index over unassigned orders per condominium; for_update locks the
+        orders, skipping those locked by concurrent drains.
+        """
+        condominium_id = deliverer.department.condominium_id
+        template = SlotTemplate.for_condominium(condominium_id)
+        now = timezone.now()
+
+        backlog = Order.objects.filter(
+            # Scheduled orders whose time already passed are left to the sweeper
+            Q(is_immediate=True) | Q(scheduled_date__gt=now),
+            condominium_id=condominium_id,
+            deliverer__isnull=True,
+            status__in=OrderAssignmentService.UNASSIGNED_STATUSES
+        ).exclude(
+            receiver=deliverer
+        ).exclude(
+            rejected_deliverer_ids__contains=[deliverer.id]
+        ).order_by('created_at', 'id')
+        if for_update:
+            backlog = backlog.select_for_update(skip_locked=True)
+        backlog = list(backlog[:limit * OrderAssignmentService.DRAIN_SCAN_FACTOR])
+        order_types = ServiceMatchIndex.order_types(backlog)
+        offered_types = ServiceMatchIndex.types_of(condominium_id, deliverer.id) if order_types else set()
+
+        compatible = []
+        for order in backlog:
+            if order.id in order_types and order_types[order.id] not in offered_types:
+                continue
+            if not ShiftMask.is_on_shift(
+                deliverer.shift_masks, template.localize(order.scheduled_date or now)
+            ):
+                continue
+            compatible.append(order)
+            if len(compatible) >= limit:
+                break
+        return compatible
+
+    @staticmethod
+    def open_pool(deliverer):
+        """
+        Orders of the deliverer's condominium waiting in the open pool it
+        could take, oldest first (served by the unassigned backlog index):
+        not its own, not rejected by it and of a type of service it offers.
+        Shifts are checked by open_orders and claim_open_order.
+        """
+        if not deliverer.department_id:
+            return Order.objects.none()
+        condominium_id = deliverer.department.condominium_id
+        return Order.objects.filter(
+            Q(service__isnull=True)
+            | Q(service__type_of_service_id__in=ServiceMatchIndex.types_of(condominium_id, deliverer.id)),
+            condominium_id=condominium_id,
+            deliverer__isnull=True,
+            status=Order.OrderStatus.PENDING
+        ).exclude(
+            receiver=deliverer
+        ).exclude(
+            rejected_deliverer_ids__contains=[deliverer.id]
+        ).order_by('created_at', 'id')
 
-        return selected_deliverer
+    @staticmethod
+    def open_orders(deliverer, limit, pool=None):
+        """
+        Up to limit orders of the open pool the deliverer could take, also
+        inside its shifts like compatible_backlog. Off-shift orders are
+        skipped in memory over at most limit * DRAIN_SCAN_FACTOR rows.
+        pool is open_pool(deliverer) as prepared by the caller (e.g. eager
+        loaded for a serializer).
+        """
+        if pool is None:
+            pool = OrderAssignmentService.open_pool(deliverer)
+        if not deliverer.shift_masks:
+            return list(pool[:limit])
+
+        template = SlotTemplate.for_condominium(deliverer.department.condominium_id)
+        now = timezone.now()
+        return [
+            order for order in pool[:limit * OrderAssignmentService.DRAIN_SCAN_FACTOR]
+            if ShiftMask.is_on_shift(deliverer.shift_masks, template.localize(order.scheduled_date or now))
+        ][:limit]
+
+    @staticmethod
+    def claim_open_order(order_id, deliverer):
+        """
+        Let a deliverer take an order from the open pool. The claim is one
+        conditional UPDATE on the order's own columns that only matches
+        while it is still pending without deliverer, so concurrent claims
+        are settled by the row lock: exactly one succeeds and the others
+        get None. The
+        deliverer's load is locked first, so parallel claims of one
+        deliverer can't go over MAX_CONCURRENT_ORDERS.
+        Claimed orders are accepted right away.
+        Returns (order, message); order is None when it can't be claimed.
+        """
+        if not deliverer.department_id:
+            return None, "La orden ya no está disponible"
+
+        now = timezone.now()
+        with transaction.atomic():
+            DelivererLoadService.lock_loads([deliverer])
+            if not DelivererLoadService.has_capacity(deliverer.delivery_load):
+                return None, "Ya tienes el máximo de órdenes activas"
+
+            # Resolve the type of service match with a plain read: a filter
+            # through the service join would turn the UPDATE into
+            # WHERE id IN (SELECT ...), whose rows aren't re-checked against
+            # concurrent claims, so it must only test the order's own columns
+            rows = list(
+                OrderAssignmentService.open_pool(deliverer).filter(pk=order_id).values_list(
+                    'service_id', 'scheduled_date'
+                )
+            )
+            if not rows:
+                return None, "La orden ya no está disponible"
+            service_id, scheduled_date = rows[0]
+            if deliverer.shift_masks and not ShiftMask.is_on_shift(
+                deliverer.shift_masks,
+                SlotTemplate.for_condominium(deliverer.department.condominium_id).localize(scheduled_date or now)
+            ):
+                return None, "La orden está fuera de tus turnos"
+
+            claimed = Order.objects.filter(
+                pk=order_id,
+                condominium_id=deliverer.department.condominium_id,
+                service_id=service_id,
+                deliverer__isnull=True,
+                status=Order.OrderStatus.PENDING
+            ).update(
+                deliverer=deliverer,
+                status=Order.OrderStatus.ACCEPTED,
+                assigned_at=now,
+                updated_at=now
+            )
+            if not claimed:
+                return None, "La orden ya no está disponible"
+
+            order = Order.objects.get(pk=order_id)
+            DelivererLoadService.record_bulk_assignment([order])
+            UserOrderStatsService.record_order_changes([(
+                (Order.OrderStatus.PENDING, None, order.receiver_id, order.amount),
+                UserOrderStatsService.order_state(order)
+            )])
+            SlotOccupancyCache.order_changed(
+                order, (Order.OrderStatus.PENDING, None), condominium_id=order.condominium_id
+            )
+        return order, "Orden tomada"
+
+    @staticmethod
+    def build_proximity_index(condominium_id, candidates):
+        """
+        Proximity index of candidate deliverers (with their load loaded) over
+        the condominium's cached roster layout, so only the loads are set
+        per assignment
+        """
+        loads = {
+            deliverer.id: DelivererLoadService.recent_count(DelivererLoadService.get_load(deliverer))
+            for deliverer in candidates
+        }
+        layout = DelivererRoster.layout(condominium_id)
+        listed = {deliverer_id for floors in layout.values() for _, deliverer_id in floors}
+        if not listed.issuperset(loads):
+            # The layout outlived the roster the candidates came from
+            return DelivererProximityIndex(
+                (deliverer.id, deliverer.department.tower, deliverer.department.floor, loads[deliverer.id])
+                for deliverer in candidates
+            )
+        return DelivererProximityIndex.from_layout(layout, loads)
+
+    @staticmethod
+    def _distribute_orders(condominium_id, orders, respect_capacity=False):
+        """
+        Distribute orders of one condominium among its deliverer pool in memory.
+        Must run inside a transaction: the pool's load records are locked so
+        concurrent batches and claims see the resulting loads.
+        """
+        candidates = list(
+            OrderAssignmentService.get_available_deliverers(
+                condominium_id
+            ).select_related('department')
+        )
+        DelivererLoadService.lock_loads(candidates)
+        if respect_capacity:
+            candidates = [
+                deliverer for deliverer in candidates
+                if DelivererLoadService.has_capacity(DelivererLoadService.get_load(deliverer))
+            ]
+        if not candidates:
+            return []
+
+        template = SlotTemplate.for_condominium(condominium_id)
+        shift_candidates = [deliverer for deliverer in candidates if deliverer.shift_masks]
+
+        # Deliverers without an active service of each type ordered
+        order_types = ServiceMatchIndex.order_types(orders)
+        candidate_ids = {deliverer.id for deliverer in candidates}
+        unmatched_ids = {
+            type_of_service_id: candidate_ids - ServiceMatchIndex.deliverer_ids(condominium_id, type_of_service_id)
+            for type_of_service_id in set(order_types.values())
+        }
+
+        def excluded_ids(order):
+            # Receivers never deliver their own orders, nor do deliverers
+            # who already rejected them, are off shift at the scheduled time
+            # or don't offer the order's type of service
+            local_time = template.localize(order.scheduled_date or timezone.now())
+            return {
+                order.receiver_id, *order.rejected_deliverer_ids,
+                *unmatched_ids.get(order_types.get(order.id), ()),
+                *(
+                    deliverer.id for deliverer in shift_candidates
+                    if not ShiftMask.is_on_shift(deliverer.shift_masks, local_time)
+                )
+            }
+
+        proximity_weight = assignment_setting('PROXIMITY_WEIGHT')
+        if proximity_weight > 0:
+            return OrderAssignmentService._distribute_by_proximity(
+                condominium_id, candidates, orders, proximity_weight, excluded_ids, respect_capacity
+            )
+
+        # Heap of (recent assignments, random tie breaker, active orders, id, deliverer)
+        heap = []
+        for deliverer in candidates:
+            load = DelivererLoadService.get_load(deliverer)
+            heap.append((
+                DelivererLoadService.recent_count(load), random.random(),
+                load.active_orders, deliverer.id, deliverer
+            ))
+        heapq.heapify(heap)
+
+        now = timezone.now()
+        assigned = []
+        for order in orders:
+            excluded = excluded_ids(order)
+            skipped = []
+            entry = None
+            while heap:
+                entry = heapq.heappop(heap)
+                if entry[3] not in excluded:
+                    break
+                skipped.append(entry)
+                entry = None
+            for skipped_entry in skipped:
+                heapq.heappush(heap, skipped_entry)
+
+            if entry is None:
+                continue
+
+            recent, _, active, deliverer_id, deliverer = entry
+            order.deliverer = deliverer
+            order.status = Order.OrderStatus.PENDING
+            order.updated_at = now
+            assigned.append(order)
+
+            if respect_capacity and active + 1 >= DelivererLoadService.MAX_CONCURRENT_ORDERS:
+                continue
+            heapq.heappush(heap, (recent + 1, random.random(), active + 1, deliverer_id, deliverer))
+
+        return assigned
+
+    @staticmethod
+    def _distribute_by_proximity(condominium_id, candidates, orders, proximity_weight,
+                                 excluded_ids, respect_capacity=False):
+        """
+        Distribute orders using the proximity index, updating loads in memory.
+        excluded_ids(order) returns the deliverers that cannot take an order.
+        """
+        index = OrderAssignmentService.build_proximity_index(condominium_id, candidates)
+        deliverers = {deliverer.id: deliverer for deliverer in candidates}
+        active_orders = {
+            deliverer.id: DelivererLoadService.get_load(deliverer).active_orders
+            for deliverer in candidates
+        }
+
+        now = timezone.now()
+        assigned = []
+        for order in orders:
+            department = order.receiver.department
+            deliverer_id = index.select(
+                department.tower, department.floor, proximity_weight,
+                exclude_ids=excluded_ids(order)
+            )
+            if deliverer_id is None:
+                continue
+
+            order.deliverer = deliverers[deliverer_id]
+            order.status = Order.OrderStatus.PENDING
+            order.updated_at = now
+            assigned.append(order)
+
+            index.set_load(deliverer_id, index.loads[deliverer_id] + 1)
+            active_orders[deliverer_id] += 1
+            if respect_capacity and active_orders[deliverer_id] >= DelivererLoadService.MAX_CONCURRENT_ORDERS:
+                index.remove(deliverer_id)
+
+        return assigned
 
     @staticmethod
     def reassign_order(order):
-        """Reassign an order that was rejected or needs new deliverer"""
-        # Remove current deliverer
+        """
+        Reassign an order that was rejected or needs new deliverer.
+        The current deliverer is added to the order's rejection set so it is
+        never offered the order again. After MAX_REASSIGNMENTS rejections the
+        order is left NOT_ASSIGNED instead of bouncing between deliverers.
+        """
+        # Remove current deliverer and remember the rejection
+        if order.deliverer_id and order.deliverer_id not in order.rejected_deliverer_ids:
+            order.rejected_deliverer_ids = order.rejected_deliverer_ids + [order.deliverer_id]
         order.deliverer = None
-        order.save()
 
-        # Try to assign to a new deliverer
-        return OrderAssignmentService.assign_order_to_deliverer(order)
+        if len(order.rejected_deliverer_ids) >= assignment_setting('MAX_REASSIGNMENTS'):
+            order.status = Order.OrderStatus.NOT_ASSIGNED
+            order.save()
+            return None
+
+        # Try to assign to a new deliverer, saving the order only once
+        new_deliverer = OrderAssignmentService.assign_order_to_deliverer(order)
+        if not new_deliverer:
+            order.save()
+
+        return new_deliverer
 
     @staticmethod
     def check_deliverer_availability(deliverer):
         """Check if a deliverer is truly available considering their current load"""
-        # Maximum concurrent orders a deliverer can handle
-        MAX_CONCURRENT_ORDERS = 5
-
-        # Count active orders
-        active_orders = Order.objects.filter(
-            deliverer=deliverer,
-            status__in=[Order.OrderStatus.PENDING, Order.OrderStatus.ACCEPTED]
-        ).count()
+        # Active orders are read from the deliverer's load record
+        active_orders = DelivererLoadService.get_active_orders(deliverer)
 
-        return active_orders < MAX_CONCURRENT_ORDERS
+        return active_orders < DelivererLoadService.MAX_CONCURRENT_ORDERS
 
     @staticmethod
     def validate_same_condominium(receiver, deliverer):
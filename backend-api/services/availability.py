@@ -3,15 +3,23 @@ Availability Management Service
 Handles deliverer availability and scheduling
 """
 from django.utils import timezone
-from django.db.models import Q, Count
-from datetime import datetime, timedelta
+from datetime import timedelta
 from users.models import UserAccount
-from .models import Order
+from users.shifts import ShiftMask
+from condominiums.schedule import SlotTemplate
+from .models import Order, DelivererLoad
+from .slots import SlotEngine
 
 
 class AvailabilityService:
     """Service for managing deliverer availability and scheduling"""
 
+    # Minutes a delivery keeps its deliverer busy before and after scheduled_date
+    DELIVERY_DURATION = 30
+
+    # Longest range served by get_availability_calendar
+    MAX_CALENDAR_DAYS = 14
+
     @staticmethod
     def toggle_deliverer_availability(user):
         """Toggle availability status for a deliverer"""
@@ -21,10 +29,7 @@ class AvailabilityService:
 
         # Check if deliverer has active orders before disabling
         if user.is_available_for_delivery:
-            active_orders = Order.objects.filter(
-                deliverer=user,
-                status__in=[Order.OrderStatus.PENDING, Order.OrderStatus.ACCEPTED]
-            ).count()
+            active_orders = DelivererLoadService.get_active_orders(user)
 
             if active_orders > 0:
                 return False, f"No puedes desactivar tu disponibilidad con {active_orders} órdenes activas"
@@ -32,8 +37,14 @@ class AvailabilityService:
         user.is_available_for_delivery = not user.is_available_for_delivery
         user.save()
 
-        status = "activada" if user.is_available_for_delivery else "desactivada"
-        return True, f"Disponibilidad {status} exitosamente"
+        if not user.is_available_for_delivery:
+            return True, "Disponibilidad desactivada exitosamente"
+
+        # Take over the oldest orders nobody could be assigned to
+        drained = OrderAssignmentService.drain_backlog(user)
+        if drained:
+            return True, f"Disponibilidad activada exitosamente. {len(drained)} órdenes pendientes asignadas"
+        return True, "Disponibilidad activada exitosamente"
 
     @staticmethod
     def get_deliverer_orders_by_date(deliverer, date=None):
@@ -77,71 +88,172 @@ class AvailabilityService:
         return True, "Horario disponible"
 
     @staticmethod
-    def get_available_time_slots(condominium, date, exclude_user=None):
+    def get_available_time_slots(condominium, date, exclude_user=None, limit=None):
         """
         Get available time slots for a condominium on a specific date
-        Returns a list of time slots with available deliverers count
+        Returns a list of time slots with available deliverers count.
+        The available deliverers (with their shifts) come from the cached
+        DelivererRoster and the day's active orders from SlotOccupancyCache,
+        and they are matched per slot as bitmasks;
+        with limit, only the first limit slots are returned.
         """
-        # Define business hours (8 AM to 8 PM)
-        start_hour = 8
-        end_hour = 20
-        slot_duration = 30  # minutes
+        current_time = timezone.now()
+        template = SlotTemplate.for_condominium(condominium)
+        # Skip past time slots
+        slots = [
+            (slot_time, shift_key)
+            for slot_time, shift_key in zip(template.slot_times(date), template.slot_shift_keys(date))
+            if slot_time >= current_time
+        ][:limit]
+        if not slots:
+            return []
+
+        condominium_id = getattr(condominium, 'id', condominium)
+        occupancy = SlotOccupancyCache.get_day(condominium_id, date)
+        shift_masks = AvailabilityService._roster_shift_masks(condominium, exclude_user)
+
+        slot_times = [slot_time for slot_time, _ in slots]
+        counts = SlotEngine.available_counts(
+            slot_times, [shift_key for _, shift_key in slots], shift_masks,
+            occupancy['orders'].values(), AvailabilityService.DELIVERY_DURATION
+        )
 
         time_slots = []
+        for slot_time, available_count in zip(slot_times, counts):
+            time_slots.append({
+                'time': slot_time,
+                'available_deliverers': available_count,
+                'is_available': available_count > 0
+            })
+
+        return time_slots
+
+    @staticmethod
+    def get_availability_calendar(condominium, start_date, days=7, exclude_user=None):
+        """
+        Get slot availability for consecutive days starting at start_date
+        (at most MAX_CALENDAR_DAYS). The cached deliverer roster and the
+        active orders of the whole range, read with one query, are swept in
+        a single pass, matching deliverer shifts as bitmasks.
+        Returns {'slot_times': ['08:00', ...], 'days': [{'date', 'available'}]}
+        where available holds the available deliverers count of each slot.
+        Past slots count as 0 and days without deliveries have no slots.
+        """
+        template = SlotTemplate.for_condominium(condominium)
+        days = max(1, min(days, AvailabilityService.MAX_CALENDAR_DAYS))
+        dates = [start_date + timedelta(days=offset) for offset in range(days)]
+        slot_times_by_date = [template.slot_times(date) for date in dates]
+        slot_times = [slot_time for day_slots in slot_times_by_date for slot_time in day_slots]
+        shift_keys = [shift_key for date in dates for shift_key in template.slot_shift_keys(date)]
+        if not slot_times:
+            return {
+                'slot_times': template.labels,
+                'days': [{'date': date, 'available': []} for date in dates]
+            }
+
+        shift_masks = AvailabilityService._roster_shift_masks(condominium, exclude_user)
+
+        # One query for every active order that can overlap the range
+        margin = timedelta(minutes=AvailabilityService.DELIVERY_DURATION)
+        order_rows = Order.objects.filter(
+            deliverer_id__in=list(shift_masks),
+            status__in=[Order.OrderStatus.PENDING, Order.OrderStatus.ACCEPTED],
+            scheduled_date__gte=slot_times[0] - margin,
+            scheduled_date__lt=slot_times[-1] + margin
+        ).values_list('deliverer_id', 'scheduled_date') if shift_masks else []
+
         current_time = timezone.now()
+        counts = [
+            count if slot_time >= current_time else 0
+            for slot_time, count in zip(slot_times, SlotEngine.available_counts(
+                slot_times, shift_keys, shift_masks, order_rows,
+                AvailabilityService.DELIVERY_DURATION
+            ))
+        ]
 
-        for hour in range(start_hour, end_hour):
-            for minute in [0, 30]:  # 30-minute slots
-                slot_time = timezone.make_aware(
-                    datetime.combine(date, datetime.min.time().replace(hour=hour, minute=minute))
-                )
-
-                # Skip past time slots
-                if slot_time < current_time:
-                    continue
-
-                # Get available deliverers for this slot
-                available_deliverers = UserAccount.objects.filter(
-                    Q(role=UserAccount.UserRole.DELIVERER) |
-                    Q(role=UserAccount.UserRole.RECEIVER_AND_DELIVERER),
-                    is_available_for_delivery=True,
-                    department__condominium=condominium
-                )
-
-                if exclude_user:
-                    available_deliverers = available_deliverers.exclude(id=exclude_user.id)
-
-                # Check each deliverer's availability for this time slot
-                available_count = 0
-                for deliverer in available_deliverers:
-                    is_available, _ = AvailabilityService.check_time_slot_availability(
-                        deliverer, slot_time, slot_duration
-                    )
-                    if is_available:
-                        available_count += 1
-
-                time_slots.append({
-                    'time': slot_time,
-                    'available_deliverers': available_count,
-                    'is_available': available_count > 0
-                })
+        calendar_days = []
+        offset = 0
+        for date, day_slots in zip(dates, slot_times_by_date):
+            calendar_days.append({
+                'date': date,
+                'available': counts[offset:offset + len(day_slots)]
+            })
+            offset += len(day_slots)
 
-        return time_slots
+        return {
+            'slot_times': template.labels,
+            'days': calendar_days
+        }
+
+    @staticmethod
+    def _roster_shift_masks(condominium, exclude_user=None):
+        """{deliverer_id: shift_masks} of the condominium's available deliverers"""
+        return {
+            deliverer_id: shift_masks
+            for deliverer_id, (_, _, shift_masks) in DelivererRoster.get(condominium).items()
+            if not exclude_user or deliverer_id != exclude_user.id
+        }
+
+    @staticmethod
+    def get_immediate_availability(condominium, exclude_user=None):
+        """
+        Check if any deliverer on shift is under capacity right now.
+        Deliverers come from the cached roster, those at capacity are found
+        with a single query over the load records and the ETA comes from the
+        cached slot occupancy.
+        Returns a dict with:
+        - available: whether any deliverer has spare capacity
+        - spare_capacity_count: deliverers with spare capacity
+        - earliest_eta: when the first of them is free (None if nobody is)
+        """
+        template = SlotTemplate.for_condominium(condominium)
+        now = timezone.now()
+        local_now = template.localize(now)
+        on_shift = [
+            deliverer_id
+            for deliverer_id, shift_masks in AvailabilityService._roster_shift_masks(
+                condominium, exclude_user
+            ).items()
+            if ShiftMask.is_on_shift(shift_masks, local_now)
+        ]
+        at_capacity = set(
+            DelivererLoad.objects.filter(
+                deliverer_id__in=on_shift,
+                active_orders__gte=DelivererLoadService.MAX_CONCURRENT_ORDERS
+            ).values_list('deliverer_id', flat=True)
+        ) if on_shift else set()
+        spare_ids = set(on_shift) - at_capacity
+
+        earliest_eta = None
+        if spare_ids:
+            occupancy = SlotOccupancyCache.get_day(
+                getattr(condominium, 'id', condominium), local_now.date()
+            )
+            intervals = SlotEngine.busy_intervals(
+                (deliverer_id, scheduled_date)
+                for deliverer_id, scheduled_date in occupancy['orders'].values()
+                if deliverer_id in spare_ids
+            )
+            # Each busy deliverer has at most one merged interval covering now
+            busy_until = [end for start, end in intervals if start < now <= end]
+            earliest_eta = now if len(busy_until) < len(spare_ids) else min(busy_until)
+
+        return {
+            'available': bool(spare_ids),
+            'spare_capacity_count': len(spare_ids),
+            'earliest_eta': earliest_eta
+        }
 
     @staticmethod
     def is_immediate_delivery_available(condominium, exclude_user=None):
         """Check if immediate delivery is available (within next 30 minutes)"""
-        available_deliverers = OrderAssignmentService.get_available_deliverers(
+        return AvailabilityService.get_immediate_availability(
             condominium, exclude_user
-        )
-
-        # Check if any deliverer has capacity for immediate delivery
-        for deliverer in available_deliverers:
-            if OrderAssignmentService.check_deliverer_availability(deliverer):
-                return True
-
-        return False
+        )['available']
 
 
 # Import at the end to avoid circular import
 from .assignment import OrderAssignmentService
+from .load import DelivererLoadService
+from .slot_cache import SlotOccupancyCache
+from .roster import DelivererRoster
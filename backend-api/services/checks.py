@@ -0,0 +1,26 @@
+"""
+System checks of the services app
+"""
+from django.conf import settings
+from django.core.checks import Warning, register, Tags
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Slot occupancy, the deliverer roster and slot templates are invalidated
+    through the cache, so a per-process cache leaves other workers stale
+    """
+    if not settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        return []
+    return [
+        Warning(
+            'La caché por defecto es local a cada proceso.',
+            hint=(
+                'Configura CACHE_URL con una caché compartida (p. ej. redis://...) para que '
+                'ocupación de horarios, repartidores y plantillas de horario se invaliden en '
+                'todos los workers.'
+            ),
+            id='services.W001',
+        )
+    ]
@@ -0,0 +1,23 @@
+"""
+Order assignment settings
+Reads the ORDER_ASSIGNMENT dict from Django settings with defaults
+"""
+from django.conf import settings
+
+DEFAULTS = {
+    # 0 = fairness only, 1 = proximity only (see OrderAssignmentService.get_proximity_score)
+    'PROXIMITY_WEIGHT': 0.0,
+    # Queue assignment for run_assignment_worker instead of assigning on create
+    'ASYNC': False,
+    # Rejections after which an order is left NOT_ASSIGNED
+    'MAX_REASSIGNMENTS': 3,
+    # Minutes a deliverer has to accept an order before the sweeper reassigns
+    # it (see sweep_stale_orders); condominiums can override both
+    'ACCEPTANCE_TIMEOUT': 30,
+    'IMMEDIATE_ACCEPTANCE_TIMEOUT': 5,
+}
+
+
+def assignment_setting(name):
+    """Get an ORDER_ASSIGNMENT setting, falling back to its default"""
+    return getattr(settings, 'ORDER_ASSIGNMENT', {}).get(name, DEFAULTS[name])
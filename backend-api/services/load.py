@@ -0,0 +1,309 @@
+"""
+Deliverer Load Service
+Maintains per-deliverer load counters so assignment and capacity checks
+read a single row per deliverer instead of counting order history
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Order, DelivererLoad
+
+
+class DelivererLoadService:
+    """Service for maintaining and reading deliverer load counters"""
+
+    # Maximum concurrent orders a deliverer can handle
+    MAX_CONCURRENT_ORDERS = 5
+
+    # Days of assignment history considered for fair distribution
+    RECENT_WINDOW_DAYS = 7
+
+    # Orders counted against a deliverer's capacity
+    ACTIVE_STATUSES = (Order.OrderStatus.PENDING, Order.OrderStatus.ACCEPTED)
+
+    # Orders counted as recent assignments
+    RECENT_STATUSES = (
+        Order.OrderStatus.PENDING,
+        Order.OrderStatus.ACCEPTED,
+        Order.OrderStatus.COMPLETED
+    )
+
+    @staticmethod
+    def window_start(today=None):
+        """First day still inside the recent assignments window"""
+        today = today or timezone.localdate()
+        return today - timedelta(days=DelivererLoadService.RECENT_WINDOW_DAYS - 1)
+
+    @staticmethod
+    def recent_count(load, today=None):
+        """Number of assignments inside the rolling window for a load record"""
+        start = DelivererLoadService.window_start(today).isoformat()
+        return sum(
+            count for day, count in load.recent_assignments.items()
+            if day >= start
+        )
+
+    @staticmethod
+    def get_load(deliverer):
+        """
+        Get the load record of a deliverer.
+        Uses the prefetched relation when available; returns an empty,
+        unsaved record for deliverers that never had an order.
+        """
+        try:
+            return deliverer.delivery_load
+        except DelivererLoad.DoesNotExist:
+            return DelivererLoad(deliverer=deliverer)
+
+    @staticmethod
+    def get_active_orders(deliverer):
+        """Number of active orders of a deliverer read from its load record"""
+        return DelivererLoad.objects.filter(
+            deliverer=deliverer
+        ).values_list('active_orders', flat=True).first() or 0
+
+    @staticmethod
+    def has_capacity(load):
+        """Check whether a load record is below the concurrent orders limit"""
+        return load.active_orders < DelivererLoadService.MAX_CONCURRENT_ORDERS
+
+    @staticmethod
+    def _contribution(status, deliverer_id):
+        """(active, recent) counters an order in this state adds to its deliverer"""
+        if not deliverer_id or status is None:
+            return 0, 0
+        return (
+            int(status in DelivererLoadService.ACTIVE_STATUSES),
+            int(status in DelivererLoadService.RECENT_STATUSES)
+        )
+
+    @staticmethod
+    def track_order_change(order, previous_state, removed=False, load_claimed=False):
+        """
+        Apply the load difference between the previous and the current state
+        of an order. previous_state is a (status, deliverer_id) tuple or None
+        for new orders; removed=True drops the order's contribution entirely
+        and load_claimed=True skips the new deliverer, already counted by claim().
+        """
+        old_status, old_deliverer_id = previous_state or (None, None)
+        new_status = None if removed else order.status
+        new_deliverer_id = None if removed else order.deliverer_id
+
+        deltas = defaultdict(lambda: [0, 0])
+        old_active, old_recent = DelivererLoadService._contribution(old_status, old_deliverer_id)
+        if old_deliverer_id:
+            deltas[old_deliverer_id][0] -= old_active
+            deltas[old_deliverer_id][1] -= old_recent
+        new_active, new_recent = DelivererLoadService._contribution(new_status, new_deliverer_id)
+        if new_deliverer_id and not load_claimed:
+            deltas[new_deliverer_id][0] += new_active
+            deltas[new_deliverer_id][1] += new_recent
+
+        day = timezone.localdate(order.created_at) if order.created_at else timezone.localdate()
+        for deliverer_id, (active_delta, recent_delta) in deltas.items():
+            if active_delta or recent_delta:
+                DelivererLoadService.apply_delta(deliverer_id, active_delta, day, recent_delta)
+
+    @staticmethod
+    def apply_delta(deliverer_id, active_delta, day, recent_delta):
+        """Update a deliverer's counters, pruning buckets outside the window"""
+        window_start = DelivererLoadService.window_start().isoformat()
+
+        with transaction.atomic():
+            load, _ = DelivererLoad.objects.select_for_update().get_or_create(
+                deliverer_id=deliverer_id
+            )
+            load.active_orders = max(0, load.active_orders + active_delta)
+
+            buckets = {
+                bucket_day: count
+                for bucket_day, count in load.recent_assignments.items()
+                if bucket_day >= window_start
+            }
+            day_key = day.isoformat()
+            if recent_delta and day_key >= window_start:
+                count = buckets.get(day_key, 0) + recent_delta
+                if count > 0:
+                    buckets[day_key] = count
+                else:
+                    buckets.pop(day_key, None)
+            load.recent_assignments = buckets
+            load.version += 1
+            load.save(update_fields=['active_orders', 'recent_assignments', 'version', 'updated_at'])
+
+    @staticmethod
+    def ensure_loads(deliverers):
+        """Create missing load records of deliverers so they can be claimed"""
+        missing = [
+            DelivererLoad(deliverer=deliverer) for deliverer in deliverers
+            if DelivererLoadService.get_load(deliverer)._state.adding
+        ]
+        if missing:
+            DelivererLoad.objects.bulk_create(missing, ignore_conflicts=True)
+            created = DelivererLoad.objects.in_bulk([load.deliverer_id for load in missing])
+            for deliverer in deliverers:
+                if deliverer.id in created:
+                    deliverer.delivery_load = created[deliverer.id]
+
+    @staticmethod
+    def lock_loads(deliverers):
+        """
+        Lock the load records of deliverers (creating missing ones) and attach
+        the fresh records to them. Must run inside a transaction.
+        """
+        if not deliverers:
+            return
+        DelivererLoad.objects.bulk_create(
+            [DelivererLoad(deliverer=deliverer) for deliverer in deliverers],
+            ignore_conflicts=True
+        )
+        loads = DelivererLoad.objects.select_for_update().filter(
+            deliverer_id__in=[deliverer.id for deliverer in deliverers]
+        ).order_by('deliverer_id').in_bulk()
+        for deliverer in deliverers:
+            deliverer.delivery_load = loads[deliverer.id]
+
+    @staticmethod
+    def claim(load, order, skip_locked=True):
+        """
+        Atomically add an order to a deliverer's load, but only if the load
+        record is unchanged since it was read (same version).
+        Must run inside a transaction. With skip_locked a record being
+        claimed by another transaction is skipped instead of waited for.
+        Returns True if the claim succeeded.
+        """
+        locked = DelivererLoad.objects.select_for_update(
+            skip_locked=skip_locked
+        ).filter(deliverer_id=load.deliverer_id, version=load.version).first()
+        if locked is None:
+            return False
+
+        window_start = DelivererLoadService.window_start().isoformat()
+        active, recent = DelivererLoadService._contribution(order.status, load.deliverer_id)
+        buckets = {
+            day: count
+            for day, count in locked.recent_assignments.items()
+            if day >= window_start
+        }
+        day_key = timezone.localdate(order.created_at).isoformat()
+        if recent and day_key >= window_start:
+            buckets[day_key] = buckets.get(day_key, 0) + recent
+
+        locked.active_orders += active
+        locked.recent_assignments = buckets
+        locked.version += 1
+        locked.save(update_fields=['active_orders', 'recent_assignments', 'version', 'updated_at'])
+        return True
+
+    @staticmethod
+    def record_bulk_assignment(orders, removed=False):
+        """
+        Add newly assigned orders to their deliverers' counters with a single
+        locked read and one bulk update. Used when orders are written with
+        bulk_update, which bypasses Order.save.
+        removed=True takes the orders' current contribution off instead
+        (call it before unassigning them).
+        """
+        sign = -1 if removed else 1
+        deltas = defaultdict(lambda: [0, defaultdict(int)])
+        for order in orders:
+            active, recent = DelivererLoadService._contribution(order.status, order.deliverer_id)
+            day = timezone.localdate(order.created_at).isoformat()
+            deltas[order.deliverer_id][0] += sign * active
+            deltas[order.deliverer_id][1][day] += sign * recent
+        if not deltas:
+            return
+
+        window_start = DelivererLoadService.window_start().isoformat()
+        with transaction.atomic():
+            DelivererLoad.objects.bulk_create(
+                [DelivererLoad(deliverer_id=deliverer_id) for deliverer_id in deltas],
+                ignore_conflicts=True
+            )
+            loads = list(
+                DelivererLoad.objects.select_for_update().filter(
+                    deliverer_id__in=list(deltas)
+                ).order_by('deliverer_id')
+            )
+            for load in loads:
+                active_delta, day_deltas = deltas[load.deliverer_id]
+                load.active_orders = max(0, load.active_orders + active_delta)
+                buckets = {
+                    day: count
+                    for day, count in load.recent_assignments.items()
+                    if day >= window_start
+                }
+                for day, count in day_deltas.items():
+                    if count and day >= window_start:
+                        count += buckets.get(day, 0)
+                        if count > 0:
+                            buckets[day] = count
+                        else:
+                            buckets.pop(day, None)
+                load.recent_assignments = buckets
+                load.version += 1
+                load.updated_at = timezone.now()
+            DelivererLoad.objects.bulk_update(
+                loads, ['active_orders', 'recent_assignments', 'version', 'updated_at']
+            )
+
+    @staticmethod
+    def rebuild(deliverer_ids=None):
+        """
+        Recompute load records from order history.
+        Used after bulk updates that bypass Order.save and by the
+        rebuild_deliverer_loads management command.
+        Returns the number of load records written.
+        """
+        orders = Order.objects.filter(deliverer__isnull=False)
+        if deliverer_ids is not None:
+            deliverer_ids = list(deliverer_ids)
+            orders = orders.filter(deliverer_id__in=deliverer_ids)
+
+        active_counts = dict(
+            orders.filter(
+                status__in=DelivererLoadService.ACTIVE_STATUSES
+            ).values('deliverer_id').annotate(
+                count=Count('id')
+            ).values_list('deliverer_id', 'count')
+        )
+
+        window_start = DelivererLoadService.window_start()
+        buckets = defaultdict(dict)
+        recent_rows = orders.filter(
+            Q(status__in=DelivererLoadService.RECENT_STATUSES),
+            created_at__date__gte=window_start
+        ).annotate(
+            day=TruncDate('created_at')
+        ).values('deliverer_id', 'day').annotate(count=Count('id'))
+        for row in recent_rows:
+            buckets[row['deliverer_id']][row['day'].isoformat()] = row['count']
+
+        existing = DelivererLoad.objects.all()
+        if deliverer_ids is not None:
+            existing = existing.filter(deliverer_id__in=deliverer_ids)
+        versions = dict(existing.values_list('deliverer_id', 'version'))
+        if deliverer_ids is None:
+            deliverer_ids = set(versions) | set(active_counts) | set(buckets)
+
+        with transaction.atomic():
+            loads = [
+                DelivererLoad(
+                    deliverer_id=deliverer_id,
+                    active_orders=active_counts.get(deliverer_id, 0),
+                    recent_assignments=buckets.get(deliverer_id, {}),
+                    version=versions.get(deliverer_id, 0) + 1
+                )
+                for deliverer_id in deliverer_ids
+            ]
+            DelivererLoad.objects.bulk_create(
+                loads,
+                update_conflicts=True,
+                unique_fields=['deliverer'],
+                update_fields=['active_orders', 'recent_assignments', 'version', 'updated_at']
+            )
+
+        return len(loads)
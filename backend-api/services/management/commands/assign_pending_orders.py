@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from services.assignment import OrderAssignmentService
+from services.models import Order
+
+
+class Command(BaseCommand):
+    help = "Assign the backlog of orders without deliverer in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--condominium',
+            type=int,
+            help="Only assign orders of the given condominium id"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Number of orders assigned per batch (default: 1000)"
+        )
+        parser.add_argument(
+            '--respect-capacity',
+            action='store_true',
+            help="Do not give deliverers more than the maximum concurrent orders"
+        )
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(
+            deliverer__isnull=True,
+            status__in=OrderAssignmentService.UNASSIGNED_STATUSES
+        )
+        if options['condominium']:
+            orders = orders.filter(receiver__department__condominium_id=options['condominium'])
+
+        batch_size = options['batch_size']
+        total_assigned = 0
+        last_id = 0
+        while True:
+            batch_ids = list(
+                orders.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not batch_ids:
+                break
+            last_id = batch_ids[-1]
+
+            assigned = OrderAssignmentService.assign_orders(
+                Order.objects.filter(id__in=batch_ids),
+                respect_capacity=options['respect_capacity']
+            )
+            total_assigned += len(assigned)
+            self.stdout.write(f"Lote hasta orden {last_id}: {len(assigned)} órdenes asignadas")
+
+        self.stdout.write(self.style.SUCCESS(f"{total_assigned} órdenes asignadas a repartidores"))
@@ -0,0 +1,235 @@
+import datetime
+import json
+import random
+import statistics
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+from condominiums.models import Condominium, Department
+from users.models import UserAccount
+from services.models import Order
+
+# Indexes measured by the benchmark: dropped for the "before" run
+BENCHMARKED_INDEXES = (
+    'order_created_idx',
+    'order_deliverer_schedule_idx',
+    'order_deliverer_status_idx',
+    'order_receiver_schedule_idx',
+    'order_active_schedule_idx',
+)
+
+ACTIVE_STATUSES = [Order.OrderStatus.PENDING, Order.OrderStatus.ACCEPTED]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large order dataset and report the time of the Order hot-path "
+        "queries with and without the composite/partial indexes. Everything "
+        "runs in one transaction that is rolled back; dropping the indexes "
+        "locks the orders table meanwhile, so run it on a non-production database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=200000,
+            help="Orders to seed (default: 200000)"
+        )
+        parser.add_argument(
+            '--deliverers',
+            type=int,
+            default=200,
+            help="Deliverers to seed (default: 200)"
+        )
+        parser.add_argument(
+            '--receivers',
+            type=int,
+            default=2000,
+            help="Receivers to seed (default: 2000)"
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help="Runs per query; the median execution time is reported (default: 5)"
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help="Random seed of the generated dataset (default: 42)"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("El benchmark requiere PostgreSQL")
+
+        with transaction.atomic():
+            condominium, deliverers, receivers = self.seed(options)
+            queries = self.hot_queries(condominium, deliverers, receivers)
+
+            self.analyze()
+            after = {name: self.measure(queryset, options['repeat']) for name, queryset in queries}
+
+            with connection.schema_editor() as schema_editor:
+                for index in Order._meta.indexes:
+                    if index.name in BENCHMARKED_INDEXES:
+                        schema_editor.remove_index(Order, index)
+            self.analyze()
+            before = {name: self.measure(queryset, options['repeat']) for name, queryset in queries}
+
+            self.report(queries, before, after)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Datos de prueba e índices restaurados (rollback)"))
+
+    def seed(self, options):
+        """Create a condominium with deliverers, receivers and a year of orders"""
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+
+        condominium = Condominium.objects.create(
+            name='Benchmark', address='-', district='-', region='-', entries=1
+        )
+        departments = Department.objects.bulk_create([
+            Department(condominium=condominium, name=f'B{i}', tower=f'T{i % 10}', floor=i % 20)
+            for i in range(options['deliverers'] + options['receivers'])
+        ])
+        users = UserAccount.objects.bulk_create([
+            UserAccount(
+                email=f'benchmark-{i}@example.com', first_name='Benchmark', last_name=str(i),
+                password='!', department=department,
+                role=UserAccount.UserRole.DELIVERER if i < options['deliverers'] else UserAccount.UserRole.RECEIVER,
+                is_available_for_delivery=i < options['deliverers']
+            )
+            for i, department in enumerate(departments)
+        ])
+        deliverers, receivers = users[:options['deliverers']], users[options['deliverers']:]
+        self.stdout.write(f"{len(deliverers)} repartidores y {len(receivers)} receptores creados")
+
+        # Mostly completed history over the last year, a small active set around today
+        statuses = (
+            [Order.OrderStatus.COMPLETED] * 80 + [Order.OrderStatus.CANCELLED] * 10
+            + [Order.OrderStatus.NOT_ASSIGNED] * 2 + [Order.OrderStatus.PENDING] * 4
+            + [Order.OrderStatus.ACCEPTED] * 4
+        )
+        batch = []
+        created = 0
+        for _ in range(options['orders']):
+            status = rng.choice(statuses)
+            if status in ACTIVE_STATUSES:
+                scheduled_date = now + datetime.timedelta(minutes=rng.randint(-6 * 60, 7 * 24 * 60))
+            else:
+                scheduled_date = now - datetime.timedelta(minutes=rng.randint(60, 365 * 24 * 60))
+            batch.append(Order(
+                receiver=rng.choice(receivers),
+                deliverer=None if status == Order.OrderStatus.NOT_ASSIGNED else rng.choice(deliverers),
+                condominium=condominium,
+                status=status,
+                scheduled_date=scheduled_date,
+                amount=Decimal(rng.randint(3, 30)),
+            ))
+            if len(batch) == 5000:
+                created += len(Order.objects.bulk_create(batch))
+                batch = []
+        created += len(Order.objects.bulk_create(batch))
+        # auto_now_add stamps every row with now; spread creation before the schedule
+        Order.objects.filter(condominium=condominium).update(
+            created_at=F('scheduled_date') - datetime.timedelta(days=1)
+        )
+        self.stdout.write(f"{created} órdenes creadas")
+        return condominium, deliverers, receivers
+
+    def hot_queries(self, condominium, deliverers, receivers):
+        """(name, queryset) of the Order queries on the hot paths, for one deliverer and receiver"""
+        deliverer, receiver = deliverers[0], receivers[0]
+        now = timezone.now()
+        margin = datetime.timedelta(minutes=30)
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start + datetime.timedelta(days=1)
+        page = 51
+
+        return [
+            ('OrderViewSet.list (staff)', Order.objects.order_by('-created_at', '-id')[:page]),
+            ('OrderViewSet.list (staff, cursor)', Order.objects.filter(
+                created_at__lte=now - datetime.timedelta(days=90)
+            ).order_by('-created_at', '-id')[:page]),
+            ('OrderViewSet.list (receptor)', Order.objects.filter(
+                Q(receiver=receiver) | Q(deliverer=receiver)
+            ).order_by('-created_at', '-id')[:page]),
+            ('OrderViewSet.my_deliveries', Order.objects.filter(
+                deliverer=deliverer
+            ).order_by('-scheduled_date', '-id')[:page]),
+            ('OrderViewSet.my_deliveries?status', Order.objects.filter(
+                deliverer=deliverer, status=Order.OrderStatus.COMPLETED
+            ).order_by('-scheduled_date', '-id')[:page]),
+            ('OrderViewSet.my_requests', Order.objects.filter(
+                receiver=receiver
+            ).order_by('-scheduled_date', '-id')[:page]),
+            ('AvailabilityService.check_time_slot_availability', Order.objects.filter(
+                deliverer=deliverer, status__in=ACTIVE_STATUSES,
+                scheduled_date__gte=now - margin, scheduled_date__lt=now + margin
+            ).values('id')[:1]),
+            ('AvailabilityService.get_deliverer_orders_by_date', Order.objects.filter(
+                deliverer=deliverer, status__in=ACTIVE_STATUSES,
+                scheduled_date__gte=day_start, scheduled_date__lt=day_end
+            ).order_by('scheduled_date')),
+            ('AvailabilityService.get_available_time_slots', Order.objects.filter(
+                deliverer_id__in=[user.id for user in deliverers], status__in=ACTIVE_STATUSES,
+                scheduled_date__gte=day_start - margin, scheduled_date__lt=day_end + margin
+            ).values_list('deliverer_id', 'scheduled_date')),
+            ('SlotOccupancyCache.recompute', Order.objects.filter(
+                deliverer__department__condominium_id=condominium.id, status__in=ACTIVE_STATUSES,
+                scheduled_date__gte=day_start - margin, scheduled_date__lt=day_end + margin
+            ).values_list('id', 'deliverer_id', 'scheduled_date')),
+            ('TripPlanner.plan', Order.objects.filter(
+                deliverer=deliverer, status__in=ACTIVE_STATUSES
+            ).order_by('scheduled_date', 'id')),
+            ('EarningsRollupService.rebuild', Order.objects.filter(
+                deliverer_id__in=[deliverer.id], status=Order.OrderStatus.COMPLETED
+            ).values('deliverer_id').annotate(count=Count('id'), amount=Sum('amount')).order_by()),
+        ]
+
+    def analyze(self):
+        """Refresh planner statistics of the seeded tables"""
+        with connection.cursor() as cursor:
+            for model in (Order, UserAccount, Department):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def measure(self, queryset, repeat):
+        """Median execution time (ms) of a queryset and the indexes its plan uses"""
+        sql, params = queryset.query.sql_with_params()
+        timings = []
+        indexes = set()
+        with connection.cursor() as cursor:
+            for _ in range(repeat):
+                cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                timings.append(plan[0]['Execution Time'])
+                indexes = self.plan_indexes(plan[0]['Plan'])
+        return statistics.median(timings), indexes
+
+    def plan_indexes(self, node):
+        """Names of the indexes scanned by a plan node and its children"""
+        indexes = {node['Index Name']} if 'Index Name' in node else set()
+        for child in node.get('Plans', ()):
+            indexes |= self.plan_indexes(child)
+        return indexes
+
+    def report(self, queries, before, after):
+        self.stdout.write("")
+        self.stdout.write(f"{'Consulta':<52} {'Antes (ms)':>11} {'Después (ms)':>13} {'Mejora':>8}  Índices")
+        for name, _ in queries:
+            before_ms, _ = before[name]
+            after_ms, indexes = after[name]
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            self.stdout.write(
+                f"{name:<52} {before_ms:>11.2f} {after_ms:>13.2f} {speedup:>7.1f}x  "
+                f"{', '.join(sorted(indexes)) or '-'}"
+            )
+        self.stdout.write("")
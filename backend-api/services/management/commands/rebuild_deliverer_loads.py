@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from services.load import DelivererLoadService
+
+
+class Command(BaseCommand):
+    help = "Recompute deliverer load counters from order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deliverer',
+            type=int,
+            action='append',
+            dest='deliverer_ids',
+            help="Only rebuild the given deliverer id (can be repeated)"
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = DelivererLoadService.rebuild(options['deliverer_ids'])
+        self.stdout.write(self.style.SUCCESS(f"{rebuilt} registros de carga recalculados"))
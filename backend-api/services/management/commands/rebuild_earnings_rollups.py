@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from users.models import UserAccount
+from services.models import Order, DailyEarnings
+from services.rollups import EarningsRollupService
+
+
+class Command(BaseCommand):
+    help = "Recompute daily earnings rollups from completed orders in chunks of deliverers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deliverer',
+            type=int,
+            action='append',
+            dest='deliverer_ids',
+            help="Only rebuild the given deliverer id (can be repeated)"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help="Deliverers rebuilt per chunk (default: 200)"
+        )
+
+    def handle(self, *args, **options):
+        if options['deliverer_ids']:
+            deliverers = UserAccount.objects.filter(id__in=options['deliverer_ids'])
+        else:
+            # Deliverers with completed orders, plus any left with stale rollups
+            deliverers = UserAccount.objects.filter(
+                Exists(Order.objects.filter(deliverer=OuterRef('pk'), status=Order.OrderStatus.COMPLETED))
+                | Exists(DailyEarnings.objects.filter(deliverer=OuterRef('pk')))
+            )
+
+        batch_size = options['batch_size']
+        total_rebuilt = 0
+        last_id = 0
+        while True:
+            deliverer_ids = list(
+                deliverers.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not deliverer_ids:
+                break
+            last_id = deliverer_ids[-1]
+
+            rebuilt = EarningsRollupService.rebuild(deliverer_ids)
+            total_rebuilt += rebuilt
+            self.stdout.write(f"Lote hasta repartidor {last_id}: {rebuilt} días de ganancias")
+
+        self.stdout.write(self.style.SUCCESS(f"{total_rebuilt} días de ganancias recalculados"))
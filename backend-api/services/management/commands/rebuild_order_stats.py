@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from users.models import UserAccount
+from services.stats import UserOrderStatsService
+
+
+class Command(BaseCommand):
+    help = "Recompute per-user order statistics from order and review history in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help="Only rebuild the given user id (can be repeated)"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Users rebuilt per chunk (default: 500)"
+        )
+
+    def handle(self, *args, **options):
+        users = UserAccount.objects.all()
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+
+        batch_size = options['batch_size']
+        total_rebuilt = 0
+        last_id = 0
+        while True:
+            user_ids = list(
+                users.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            total_rebuilt += UserOrderStatsService.rebuild(user_ids)
+            self.stdout.write(f"Lote hasta usuario {last_id}: {len(user_ids)} estadísticas recalculadas")
+
+        self.stdout.write(self.style.SUCCESS(f"{total_rebuilt} estadísticas de usuario recalculadas"))
@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from services.queue import AssignmentQueue
+
+
+class Command(BaseCommand):
+    help = "Process queued order assignments (run one or more worker processes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help="Jobs claimed per batch (default: 100)"
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty (default: 1)"
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Drain the queue once and exit"
+        )
+
+    def handle(self, *args, **options):
+        total_processed = 0
+        try:
+            while True:
+                processed = AssignmentQueue.process_batch(options['batch_size'])
+                total_processed += processed
+                if processed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"{total_processed} asignaciones procesadas"))
@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand
+from services.sweeper import StaleOrderSweeper
+
+
+class Command(BaseCommand):
+    help = "Reassign or expire orders not accepted within their acceptance timeout"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=StaleOrderSweeper.CHUNK_SIZE,
+            help=f"Orders read per chunk (default: {StaleOrderSweeper.CHUNK_SIZE})"
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help="Seconds between sweeps (default: 60)"
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Sweep once and exit"
+        )
+
+    def handle(self, *args, **options):
+        total_reassigned = total_unassigned = 0
+        try:
+            while True:
+                reassigned, unassigned = StaleOrderSweeper.sweep(options['chunk_size'])
+                total_reassigned += reassigned
+                total_unassigned += unassigned
+                if reassigned or unassigned:
+                    self.stdout.write(
+                        f"{reassigned} órdenes reasignadas, {unassigned} sin asignar"
+                    )
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_reassigned} órdenes reasignadas y {total_unassigned} sin asignar por falta de aceptación"
+        ))
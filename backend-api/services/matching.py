@@ -0,0 +1,98 @@
+"""
+Service Match Index
+Cached per-condominium index of type of service -> deliverers with an
+ACTIVE Service of that type, so assignment can require a matching service
+without joining services on every order. Service.save/delete and the
+deliverer roster invalidate the condominiums a change touches.
+Orders without a service can be delivered by anyone on the roster.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from .models import Service
+
+
+class ServiceMatchIndex:
+    """Service for the cached (condominium, type of service) -> deliverer ids index"""
+
+    # Seconds before an index is rebuilt even without changes
+    TIMEOUT = 60 * 60
+
+    @staticmethod
+    def _key(condominium_id):
+        return f"service_match:{condominium_id}"
+
+    @staticmethod
+    def get(condominium):
+        """
+        Get the index of a condominium (instance or id):
+        {type_of_service_id: frozenset(deliverer_ids)}
+        """
+        condominium_id = getattr(condominium, 'id', condominium)
+        index = cache.get(ServiceMatchIndex._key(condominium_id))
+        if index is None:
+            matches = {}
+            for type_of_service_id, user_id in Service.objects.filter(
+                status=Service.ServiceStatus.ACTIVE,
+                user__department__condominium_id=condominium_id
+            ).values_list('type_of_service_id', 'user_id'):
+                matches.setdefault(type_of_service_id, set()).add(user_id)
+            index = {
+                type_of_service_id: frozenset(user_ids)
+                for type_of_service_id, user_ids in matches.items()
+            }
+            cache.set(ServiceMatchIndex._key(condominium_id), index, ServiceMatchIndex.TIMEOUT)
+        return index
+
+    @staticmethod
+    def deliverer_ids(condominium, type_of_service_id):
+        """Deliverers of the condominium offering a type of service"""
+        return ServiceMatchIndex.get(condominium).get(type_of_service_id, frozenset())
+
+    @staticmethod
+    def types_of(condominium, deliverer_id):
+        """Types of service a deliverer of the condominium offers"""
+        return {
+            type_of_service_id
+            for type_of_service_id, deliverer_ids in ServiceMatchIndex.get(condominium).items()
+            if deliverer_id in deliverer_ids
+        }
+
+    @staticmethod
+    def order_types(orders):
+        """{order_id: type_of_service_id} of the orders that have a service"""
+        service_ids = {order.service_id for order in orders if order.service_id}
+        if not service_ids:
+            return {}
+        service_types = dict(
+            Service.objects.filter(id__in=service_ids).values_list('id', 'type_of_service_id')
+        )
+        return {
+            order.id: service_types[order.service_id]
+            for order in orders if order.service_id in service_types
+        }
+
+    @staticmethod
+    def service_changed(previous_state, state):
+        """
+        Invalidate the indexes touched by a service change. States are
+        (type_of_service_id, user_id, status); previous_state is None for
+        new services, state is None for deleted ones.
+        """
+        if previous_state == state:
+            return
+
+        from users.models import UserAccount
+
+        user_ids = {current[1] for current in (previous_state, state) if current is not None}
+        ServiceMatchIndex.invalidate(
+            UserAccount.objects.filter(
+                id__in=user_ids, department__isnull=False
+            ).values_list('department__condominium_id', flat=True)
+        )
+
+    @staticmethod
+    def invalidate(condominium_ids):
+        """Drop the indexes of the given condominiums, right away and again on commit"""
+        keys = [ServiceMatchIndex._key(condominium_id) for condominium_id in set(condominium_ids)]
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
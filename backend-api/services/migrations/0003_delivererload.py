@@ -0,0 +1,54 @@
+# Generated by Django 5.0.3
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def populate_deliverer_loads(apps, schema_editor):
+    Order = apps.get_model('services', 'Order')
+    DelivererLoad = apps.get_model('services', 'DelivererLoad')
+
+    # PENDING/ACCEPTED are active, PENDING/ACCEPTED/COMPLETED are recent
+    orders = Order.objects.filter(deliverer__isnull=False)
+    loads = {}
+    for row in orders.filter(status__in=[1, 4]).values('deliverer_id').annotate(count=Count('id')):
+        loads[row['deliverer_id']] = DelivererLoad(
+            deliverer_id=row['deliverer_id'], active_orders=row['count']
+        )
+
+    window_start = timezone.localdate() - timedelta(days=6)
+    recent_rows = orders.filter(
+        status__in=[1, 4, 6], created_at__date__gte=window_start
+    ).annotate(day=TruncDate('created_at')).values('deliverer_id', 'day').annotate(count=Count('id'))
+    for row in recent_rows:
+        load = loads.setdefault(row['deliverer_id'], DelivererLoad(deliverer_id=row['deliverer_id']))
+        load.recent_assignments[row['day'].isoformat()] = row['count']
+
+    DelivererLoad.objects.bulk_create(loads.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0002_auto_20250125'),
+        ('users', '0003_useraccount_date_joined_alter_useraccount_department'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DelivererLoad',
+            fields=[
+                ('deliverer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='delivery_load', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_orders', models.PositiveIntegerField(default=0)),
+                ('recent_assignments', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_deliverer_loads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0003_delivererload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivererload',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0004_delivererload_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.IntegerField(choices=[(1, 'En cola'), (2, 'Fallido')], default=1)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='assignment_job', to='services.order')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 1)), fields=['created_at', 'id'], name='assignment_job_queued_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0005_assignmentjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='rejected_deliverer_ids',
+            field=models.JSONField(blank=True, default=list, verbose_name='Repartidores que rechazaron'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.3
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominiums', '0003_condominium_schedule'),
+        ('services', '0006_order_rejected_deliverer_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_start', models.DateTimeField(verbose_name='Inicio del horario')),
+                ('capacity', models.PositiveIntegerField(default=0, verbose_name='Capacidad')),
+                ('reserved', models.PositiveIntegerField(default=0, verbose_name='Reservados')),
+                ('condominium', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_capacities', to='condominiums.condominium')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='services.slotcapacity', verbose_name='Horario reservado'),
+        ),
+        migrations.AddConstraint(
+            model_name='slotcapacity',
+            constraint=models.UniqueConstraint(fields=('condominium', 'slot_start'), name='slot_capacity_condominium_slot_unique'),
+        ),
+    ]
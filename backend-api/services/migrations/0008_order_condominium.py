@@ -0,0 +1,39 @@
+# Generated by Django 5.0.3
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_order_condominium(apps, schema_editor):
+    """Copy each order's receiver condominium into the new column"""
+    Order = apps.get_model('services', 'Order')
+    UserAccount = apps.get_model('users', 'UserAccount')
+
+    Order.objects.filter(condominium__isnull=True).update(
+        condominium_id=Subquery(
+            UserAccount.objects.filter(id=OuterRef('receiver_id')).values('department__condominium_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominiums', '0003_condominium_schedule'),
+        ('services', '0007_slotcapacity'),
+        ('users', '0004_useraccount_shift_masks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='condominium',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='condominiums.condominium', verbose_name='Condominio'),
+        ),
+        migrations.RunPython(populate_order_condominium, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('deliverer__isnull', True), ('status__in', [1, 3])), fields=['condominium', 'created_at', 'id'], name='order_unassigned_backlog_idx'),
+        ),
+    ]
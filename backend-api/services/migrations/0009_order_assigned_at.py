@@ -0,0 +1,30 @@
+# Generated by Django 5.0.3
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_assigned_at(apps, schema_editor):
+    """Start the acceptance timeout of orders already waiting from their last update"""
+    Order = apps.get_model('services', 'Order')
+    Order.objects.filter(deliverer__isnull=False, status=1).update(assigned_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0008_order_condominium'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='assigned_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Asignada el'),
+        ),
+        migrations.RunPython(populate_assigned_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('deliverer__isnull', False), ('status', 1)), fields=['assigned_at', 'id'], name='order_awaiting_acceptance_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.3
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_order_assigned_at'),
+        ('users', '0004_useraccount_shift_masks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserOrderStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('delivery_counts', models.JSONField(blank=True, default=dict)),
+                ('request_counts', models.JSONField(blank=True, default=dict)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('spent', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_distribution', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
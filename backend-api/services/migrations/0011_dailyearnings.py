@@ -0,0 +1,36 @@
+# Generated by Django 5.0.3
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominiums', '0005_condominium_open_orders_mode'),
+        ('services', '0010_userorderstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEarnings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Día')),
+                ('completed_orders', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('condominium', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_earnings', to='condominiums.condominium', verbose_name='Condominio')),
+                ('deliverer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_earnings', to=settings.AUTH_USER_MODEL, verbose_name='Repartidor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['deliverer', 'day'], name='daily_earnings_series_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyearnings',
+            constraint=models.UniqueConstraint(fields=('deliverer', 'condominium', 'day'), name='daily_earnings_unique_day', nulls_distinct=False),
+        ),
+    ]
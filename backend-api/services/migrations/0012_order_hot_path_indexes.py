@@ -0,0 +1,36 @@
+# Generated by Django 5.0.3
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking the orders table for writes
+    atomic = False
+
+    dependencies = [
+        ('services', '0011_dailyearnings'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['deliverer', 'scheduled_date', 'id'], name='order_deliverer_schedule_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['deliverer', 'status', 'scheduled_date'], name='order_deliverer_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['receiver', 'scheduled_date', 'id'], name='order_receiver_schedule_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', [1, 4])), fields=['deliverer', 'scheduled_date', 'id'], name='order_active_deliverer_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', [1, 4])), fields=['scheduled_date'], name='order_active_schedule_idx'),
+        ),
+    ]
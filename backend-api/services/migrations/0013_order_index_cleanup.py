@@ -0,0 +1,46 @@
+# Generated by Django 5.0.3
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Change the indexes without locking the orders table for writes
+    atomic = False
+
+    dependencies = [
+        ('services', '0012_order_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Same key as order_deliverer_schedule_idx, just partial
+        RemoveIndexConcurrently(
+            model_name='order',
+            name='order_active_deliverer_idx',
+        ),
+        # The deliverer FK index is a prefix of order_deliverer_schedule_idx.
+        # Only the index is dropped: altering the field would also drop and
+        # re-validate the foreign key constraint
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='deliverer',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deliverer_orders', to=settings.AUTH_USER_MODEL, verbose_name='Repartidor'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "services_order_deliverer_id_876b4e3e";',
+                    reverse_sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS "services_order_deliverer_id_876b4e3e" ON "services_order" ("deliverer_id");',
+                ),
+            ],
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ),
+    ]
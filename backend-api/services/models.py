@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -37,6 +37,34 @@ class Service(models.Model):
     def __str__(self):
         return f"{self.type_of_service.name} - {self.user.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted match fields to invalidate the service match index
+        instance._tracked_match_state = instance._match_state()
+        return instance
+
+    def _match_state(self):
+        return (
+            self.__dict__.get('type_of_service_id'),
+            self.__dict__.get('user_id'),
+            self.__dict__.get('status')
+        )
+
+    def save(self, *args, **kwargs):
+        from .matching import ServiceMatchIndex
+
+        previous_state = getattr(self, '_tracked_match_state', None)
+        super().save(*args, **kwargs)
+        ServiceMatchIndex.service_changed(previous_state, self._match_state())
+        self._tracked_match_state = self._match_state()
+
+    def delete(self, *args, **kwargs):
+        from .matching import ServiceMatchIndex
+
+        ServiceMatchIndex.service_changed(getattr(self, '_tracked_match_state', None), None)
+        return super().delete(*args, **kwargs)
+
 class Order(models.Model):
     class OrderStatus(models.IntegerChoices):
         PENDING = 1, _('Pendiente')
@@ -59,18 +87,275 @@ class Order(models.Model):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, null=True, blank=True, related_name="orders")
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     receiver = models.ForeignKey('users.UserAccount', on_delete=models.CASCADE, related_name="receiver_orders", verbose_name="Receptor")
-    deliverer = models.ForeignKey('users.UserAccount', on_delete=models.SET_NULL, null=True, blank=True, related_name="deliverer_orders", verbose_name="Repartidor")
+    # Indexed as the prefix of order_deliverer_schedule_idx
+    deliverer = models.ForeignKey('users.UserAccount', on_delete=models.SET_NULL, null=True, blank=True, db_index=False, related_name="deliverer_orders", verbose_name="Repartidor")
+    rejected_deliverer_ids = models.JSONField(default=list, blank=True, verbose_name="Repartidores que rechazaron")
+    slot = models.ForeignKey('SlotCapacity', on_delete=models.SET_NULL, null=True, blank=True, related_name="orders", verbose_name="Horario reservado")
+    # Receiver's condominium when the order was created, to index the unassigned backlog
+    condominium = models.ForeignKey('condominiums.Condominium', on_delete=models.SET_NULL, null=True, blank=True, related_name="orders", verbose_name="Condominio")
+    # When the current deliverer got the order, to time out unanswered assignments
+    assigned_at = models.DateTimeField(null=True, blank=True, verbose_name="Asignada el")
+
+    class Meta:
+        indexes = [
+            # Unassigned backlog of a condominium, oldest first
+            models.Index(
+                fields=['condominium', 'created_at', 'id'],
+                name='order_unassigned_backlog_idx',
+                condition=models.Q(deliverer__isnull=True, status__in=[1, 3])
+            ),
+            # Assigned orders still waiting for the deliverer to accept, oldest first
+            models.Index(
+                fields=['assigned_at', 'id'],
+                name='order_awaiting_acceptance_idx',
+                condition=models.Q(deliverer__isnull=False, status=1)
+            ),
+            # Every order, newest first (staff OrderViewSet.list pages)
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='order_created_idx'
+            ),
+            # A deliverer's orders by date, newest first (my_deliveries pages),
+            # also scanned for active orders (time slot overlaps, calendars, trips)
+            models.Index(
+                fields=['deliverer', 'scheduled_date', 'id'],
+                name='order_deliverer_schedule_idx'
+            ),
+            # A deliverer's orders in a status (status filters, stats and rollup rebuilds)
+            models.Index(
+                fields=['deliverer', 'status', 'scheduled_date'],
+                name='order_deliverer_status_idx'
+            ),
+            # A receiver's orders by date, newest first (my_requests pages)
+            models.Index(
+                fields=['receiver', 'scheduled_date', 'id'],
+                name='order_receiver_schedule_idx'
+            ),
+            # Active orders of a time range, for slot occupancy of a condominium day
+            models.Index(
+                fields=['scheduled_date'],
+                name='order_active_schedule_idx',
+                condition=models.Q(status__in=[1, 4])
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.status} - {self.scheduled_date} - {self.receiver.email}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted status/deliverer to keep load counters in sync
+        instance._tracked_state = (
+            instance.__dict__.get('status'),
+            instance.__dict__.get('deliverer_id')
+        )
+        instance._tracked_scheduled_date = instance.__dict__.get('scheduled_date')
+        # And what it adds to its participants' order statistics
+        instance._tracked_stats_state = (
+            *instance._tracked_state,
+            instance.__dict__.get('receiver_id'),
+            instance.__dict__.get('amount')
+        )
+        instance._tracked_rollup_state = (
+            *instance._tracked_state,
+            instance.__dict__.get('condominium_id'),
+            instance.__dict__.get('scheduled_date'),
+            instance.__dict__.get('amount')
+        )
+        return instance
+
     def clean(self):
         if self.deliverer and self.receiver == self.deliverer:
             raise ValidationError("El receptor y el repartidor no pueden ser el mismo usuario.")
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, load_claimed=False, **kwargs):
+        """
+        load_claimed=True means the new deliverer's load was already updated
+        by an assignment claim, so only the previous deliverer is adjusted.
+        """
+        if self.condominium_id is None and self.receiver_id and self.receiver.department_id:
+            self.condominium_id = self.receiver.department.condominium_id
         self.full_clean()
-        super().save(*args, **kwargs)
+        from .load import DelivererLoadService
+        from .slot_cache import SlotOccupancyCache
+        from .reservations import SlotReservationService
+        from .stats import UserOrderStatsService
+        from .rollups import EarningsRollupService
+
+        previous_state = getattr(self, '_tracked_state', None)
+        previous_stats_state = getattr(self, '_tracked_stats_state', None)
+        previous_rollup_state = getattr(self, '_tracked_rollup_state', None)
+        previous_scheduled_date = getattr(self, '_tracked_scheduled_date', None)
+        if self.deliverer_id != (previous_state[1] if previous_state else None):
+            self.assigned_at = timezone.now() if self.deliverer_id else None
+        with transaction.atomic():
+            if self.slot_id and self.status in SlotReservationService.RELEASED_STATUSES:
+                # Cancelled or unassignable orders give their slot back
+                SlotReservationService.release(self.slot_id)
+                self.slot = None
+            super().save(*args, **kwargs)
+            DelivererLoadService.track_order_change(
+                self, previous_state, load_claimed=load_claimed
+            )
+            SlotOccupancyCache.order_changed(self, previous_state, previous_scheduled_date)
+            UserOrderStatsService.record_order_changes([
+                (previous_stats_state, UserOrderStatsService.order_state(self))
+            ])
+            UserOrderStatsService.record_rated_order_change(
+                self.pk, previous_stats_state, UserOrderStatsService.order_state(self)
+            )
+            EarningsRollupService.record_order_changes([
+                (previous_rollup_state, EarningsRollupService.order_state(self))
+            ])
+        self._tracked_state = (self.status, self.deliverer_id)
+        self._tracked_scheduled_date = self.scheduled_date
+        self._tracked_stats_state = UserOrderStatsService.order_state(self)
+        self._tracked_rollup_state = EarningsRollupService.order_state(self)
+
+    def delete(self, *args, **kwargs):
+        from .load import DelivererLoadService
+        from .slot_cache import SlotOccupancyCache
+        from .reservations import SlotReservationService
+        from .stats import UserOrderStatsService
+        from .rollups import EarningsRollupService
+
+        previous_state = getattr(self, '_tracked_state', None)
+        with transaction.atomic():
+            if self.slot_id:
+                SlotReservationService.release(self.slot_id)
+            DelivererLoadService.track_order_change(self, previous_state, removed=True)
+            previous_stats_state = getattr(self, '_tracked_stats_state', None)
+            UserOrderStatsService.record_order_changes([(previous_stats_state, None)])
+            UserOrderStatsService.record_rated_order_change(self.pk, previous_stats_state, None)
+            EarningsRollupService.record_order_changes([
+                (getattr(self, '_tracked_rollup_state', None), None)
+            ])
+            self.status = self.OrderStatus.CANCELLED
+            SlotOccupancyCache.order_changed(self, previous_state)
+            return super().delete(*args, **kwargs)
+
+class DelivererLoad(models.Model):
+    """
+    Running load counters for a deliverer, kept up to date as orders change
+    status so assignment doesn't have to count order history.
+    recent_assignments maps ISO dates to the number of orders assigned that day.
+    version is bumped on every write so assignment can claim a deliverer
+    only if its load didn't change since it was read.
+    """
+    deliverer = models.OneToOneField('users.UserAccount', on_delete=models.CASCADE, primary_key=True, related_name="delivery_load")
+    active_orders = models.PositiveIntegerField(default=0)
+    recent_assignments = models.JSONField(default=dict, blank=True)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Load {self.deliverer_id} - {self.active_orders} activas"
+
+class UserOrderStats(models.Model):
+    """
+    Running order statistics of a user, kept up to date as orders change
+    and reviews are written, so profile and dashboard endpoints read one
+    row instead of aggregating the whole history.
+    delivery_counts / request_counts map order statuses to the number of
+    orders the user delivers / requested in that status; ratings are those
+    of reviews on completed orders the user delivered.
+    """
+    user = models.OneToOneField('users.UserAccount', on_delete=models.CASCADE, primary_key=True, related_name="order_stats")
+    delivery_counts = models.JSONField(default=dict, blank=True)
+    request_counts = models.JSONField(default=dict, blank=True)
+    earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_distribution = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats {self.user_id}"
+
+class DailyEarnings(models.Model):
+    """
+    Completed orders and earnings of a deliverer in a condominium on one
+    day (local to the condominium), kept up to date as orders are completed
+    so earnings windows and series sum a few rollup rows instead of
+    scanning order history.
+    """
+    deliverer = models.ForeignKey('users.UserAccount', on_delete=models.CASCADE, related_name="daily_earnings", verbose_name="Repartidor")
+    condominium = models.ForeignKey('condominiums.Condominium', on_delete=models.CASCADE, null=True, blank=True, related_name="daily_earnings", verbose_name="Condominio")
+    day = models.DateField(verbose_name="Día")
+    completed_orders = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['deliverer', 'condominium', 'day'],
+                name='daily_earnings_unique_day',
+                nulls_distinct=False
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['deliverer', 'day'], name='daily_earnings_series_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ganancias {self.deliverer_id} - {self.day}"
+
+class SlotCapacity(models.Model):
+    """
+    Bookable capacity of one delivery slot of a condominium. Scheduled
+    orders reserve a unit with a conditional UPDATE (reserved < capacity)
+    on the unique (condominium, slot_start) row, so checking and reserving
+    is a single indexed operation that holds under concurrent requests.
+    """
+    condominium = models.ForeignKey('condominiums.Condominium', on_delete=models.CASCADE, related_name="slot_capacities")
+    slot_start = models.DateTimeField(verbose_name="Inicio del horario")
+    capacity = models.PositiveIntegerField(default=0, verbose_name="Capacidad")
+    reserved = models.PositiveIntegerField(default=0, verbose_name="Reservados")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['condominium', 'slot_start'],
+                name='slot_capacity_condominium_slot_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Slot {self.condominium_id} - {self.slot_start} - {self.reserved}/{self.capacity}"
+
+class AssignmentJob(models.Model):
+    """
+    Queued assignment of an order to a deliverer, processed asynchronously
+    by the run_assignment_worker command. Jobs are deleted once processed.
+    """
+    class JobStatus(models.IntegerChoices):
+        QUEUED = 1, _('En cola')
+        FAILED = 2, _('Fallido')
+
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name="assignment_job")
+    status = models.IntegerField(
+        choices=JobStatus.choices,
+        default=JobStatus.QUEUED
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['created_at', 'id'],
+                name='assignment_job_queued_idx',
+                condition=models.Q(status=1)
+            ),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} - Order {self.order_id} - {self.status}"
 
 class Payment(models.Model):
     class PaymentStatus(models.IntegerChoices):
@@ -111,3 +396,31 @@ class Review(models.Model):
 
     def __str__(self):
         return f"Review {self.id} - {self.user.email} - {self.order.id}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted order/rating to keep the deliverer's stats in sync
+        instance._tracked_rating_state = (
+            instance.__dict__.get('order_id'),
+            instance.__dict__.get('rating')
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        from .stats import UserOrderStatsService
+
+        previous_state = getattr(self, '_tracked_rating_state', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            UserOrderStatsService.record_review_change(previous_state, (self.order_id, self.rating))
+        self._tracked_rating_state = (self.order_id, self.rating)
+
+    def delete(self, *args, **kwargs):
+        from .stats import UserOrderStatsService
+
+        with transaction.atomic():
+            UserOrderStatsService.record_review_change(
+                getattr(self, '_tracked_rating_state', None), None
+            )
+            return super().delete(*args, **kwargs)
@@ -0,0 +1,105 @@
+"""
+Keyset Pagination
+Pages through a list newest first by (field, id), with an opaque cursor
+holding the last row's values. Every page is a range read on that key, so
+no COUNT(*) is issued and deep pages cost the same as the first one.
+?paginate=false returns the whole unpaginated list.
+"""
+import base64
+import binascii
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a (datetime field, id) key, descending"""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    opt_out_query_param = 'paginate'
+    page_size = 50
+    max_page_size = 200
+
+    # Datetime field paged on together with id
+    ordering_field = 'created_at'
+
+    def __init__(self, ordering_field=None):
+        if ordering_field:
+            self.ordering_field = ordering_field
+
+    def is_disabled(self, request):
+        """Whether the client asked for the unpaginated list"""
+        return request.query_params.get(self.opt_out_query_param, '').lower() == 'false'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "El tamaño de página debe ser un número"})
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, instance):
+        value = getattr(instance, self.ordering_field).isoformat()
+        return base64.urlsafe_b64encode(f"{value}|{instance.pk}".encode()).decode()
+
+    def decode_cursor(self, request):
+        """(value, id) of the last row of the previous page, or None"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = base64.urlsafe_b64decode(encoded.encode()).decode().rsplit('|', 1)
+            value, pk = parse_datetime(value), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            value = None
+        if value is None:
+            raise ValidationError({self.cursor_query_param: "Cursor inválido"})
+        return value, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_disabled(request):
+            return None
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        field = self.ordering_field
+        queryset = queryset.order_by(f'-{field}', '-id')
+
+        cursor = self.decode_cursor(request)
+        if cursor:
+            value, pk = cursor
+            # Rows after (value, pk); the redundant upper bound keeps it a range scan
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}),
+                **{f'{field}__lte': value}
+            )
+
+        # One extra row tells whether there is a next page without counting
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,143 @@
+"""
+Deliverer Proximity Index
+Per-condominium index of available deliverers keyed by tower and sorted by
+floor, used to find the closest low-load deliverer without scoring every
+candidate. The tower layout comes cached with the deliverer roster (see
+DelivererRoster.layout); only the candidates' loads are set per assignment.
+"""
+import heapq
+from bisect import bisect_left
+from collections import defaultdict
+
+
+class DelivererProximityIndex:
+    """
+    Index of candidate deliverers of one condominium.
+    Distances follow OrderAssignmentService.get_proximity_score: floor
+    difference inside the same tower, 100 + floor difference across towers.
+    Distance and load are normalised to 0..1 before they are blended.
+    """
+
+    OTHER_TOWER_PENALTY = 100
+
+    def __init__(self, entries):
+        """entries: iterable of (deliverer_id, tower, floor, load)"""
+        towers = defaultdict(list)
+        loads = {}
+        for deliverer_id, tower, floor, load in entries:
+            towers[tower].append((floor, deliverer_id))
+            loads[deliverer_id] = load
+        for floors in towers.values():
+            floors.sort()
+        self._index(dict(towers), loads)
+
+    @classmethod
+    def from_layout(cls, layout, loads):
+        """
+        Index over a prebuilt layout {tower: [(floor, deliverer_id), ...]
+        sorted by floor}, shared and never modified. Only deliverers in
+        loads ({deliverer_id: load}) are candidates.
+        """
+        index = cls.__new__(cls)
+        index._index(layout, loads)
+        return index
+
+    def _index(self, towers, loads):
+        self.towers = towers
+        self.loads = dict(loads)
+
+        # Scales of the blended terms: the widest distance of the layout and
+        # the highest load seen
+        floors = [floor for tower_floors in towers.values() for floor, _ in tower_floors]
+        floor_span = max(floors) - min(floors) if floors else 0
+        self.distance_scale = max(
+            1, floor_span + (self.OTHER_TOWER_PENALTY if len(towers) > 1 else 0)
+        )
+        self.load_scale = max(1, max(self.loads.values(), default=0))
+
+        # Lazy min-heap of loads, stale entries are skipped on read
+        self._load_heap = [(load, deliverer_id) for deliverer_id, load in self.loads.items()]
+        heapq.heapify(self._load_heap)
+
+    def __len__(self):
+        return len(self.loads)
+
+    def min_load(self):
+        """Lowest load among the indexed deliverers"""
+        while self._load_heap:
+            load, deliverer_id = self._load_heap[0]
+            if self.loads.get(deliverer_id) == load:
+                return load
+            heapq.heappop(self._load_heap)
+        return None
+
+    def set_load(self, deliverer_id, load):
+        """Update the load of an indexed deliverer"""
+        self.loads[deliverer_id] = load
+        self.load_scale = max(self.load_scale, load)
+        heapq.heappush(self._load_heap, (load, deliverer_id))
+
+    def remove(self, deliverer_id):
+        """Drop a deliverer from the index (e.g. when it reaches capacity)"""
+        self.loads.pop(deliverer_id, None)
+
+    @staticmethod
+    def _iter_tower(floors, floor, base):
+        """Yield (distance, deliverer_id) of one tower expanding out from floor"""
+        low = bisect_left(floors, (floor,)) - 1
+        high = low + 1
+        while low >= 0 or high < len(floors):
+            low_distance = floor - floors[low][0] if low >= 0 else None
+            high_distance = floors[high][0] - floor if high < len(floors) else None
+            if high_distance is None or (low_distance is not None and low_distance <= high_distance):
+                yield base + low_distance, floors[low][1]
+                low -= 1
+            else:
+                yield base + high_distance, floors[high][1]
+                high += 1
+
+    def iter_by_proximity(self, tower, floor):
+        """Yield (distance, deliverer_id) of indexed deliverers, closest first"""
+        streams = [
+            self._iter_tower(
+                floors, floor,
+                0 if tower_name == tower else self.OTHER_TOWER_PENALTY
+            )
+            for tower_name, floors in self.towers.items()
+        ]
+        for distance, deliverer_id in heapq.merge(*streams):
+            if deliverer_id in self.loads:
+                yield distance, deliverer_id
+
+    def cost(self, distance, load, weight):
+        """Blended cost of a deliverer, both terms normalised to 0..1"""
+        return (
+            weight * distance / self.distance_scale
+            + (1 - weight) * load / self.load_scale
+        )
+
+    def select(self, tower, floor, weight, exclude_ids=()):
+        """
+        Pick the deliverer with the lowest blended cost
+        weight * distance + (1 - weight) * load (see cost).
+        Candidates are visited closest first, so the search stops as soon as
+        no remaining deliverer can beat the best cost found.
+        Returns the deliverer id or None.
+        """
+        min_load = self.min_load()
+        if min_load is None:
+            return None
+
+        best_id = None
+        best_cost = None
+        for distance, deliverer_id in self.iter_by_proximity(tower, floor):
+            lower_bound = self.cost(distance, min_load, weight)
+            if best_cost is not None and lower_bound >= best_cost:
+                break
+            if deliverer_id in exclude_ids:
+                continue
+            cost = self.cost(distance, self.loads[deliverer_id], weight)
+            if best_cost is None or cost < best_cost:
+                best_id, best_cost = deliverer_id, cost
+
+        return best_id
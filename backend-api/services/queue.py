@@ -0,0 +1,82 @@
+"""
+Assignment Queue
+Database backed queue of pending order assignments. Workers claim jobs with
+SKIP LOCKED, so any number of worker processes can run side by side.
+"""
+import logging
+from django.db import transaction
+from django.db.models import F
+from .models import Order, AssignmentJob
+from .assignment import OrderAssignmentService
+
+logger = logging.getLogger(__name__)
+
+
+class AssignmentQueue:
+    """Service for queueing and processing asynchronous order assignments"""
+
+    # Attempts before a job is marked as failed
+    MAX_ATTEMPTS = 3
+
+    @staticmethod
+    def enqueue(order):
+        """Queue an order for asynchronous assignment"""
+        job, _ = AssignmentJob.objects.get_or_create(order=order)
+        return job
+
+    @staticmethod
+    def process_batch(batch_size=100):
+        """
+        Claim up to batch_size queued jobs and assign their orders with the
+        batch assignment engine. Jobs are locked with SKIP LOCKED so other
+        workers pick different jobs, and deleted once processed. If the batch
+        raises, its orders are retried one by one so only the jobs that fail
+        on their own count an attempt.
+        Returns the number of jobs processed.
+        """
+        job_ids = []
+        failed = {}
+        try:
+            with transaction.atomic():
+                jobs = list(
+                    AssignmentJob.objects.select_for_update(skip_locked=True).filter(
+                        status=AssignmentJob.JobStatus.QUEUED
+                    ).order_by('created_at', 'id').values_list('id', 'order_id')[:batch_size]
+                )
+                if not jobs:
+                    return 0
+
+                job_ids = [job_id for job_id, _ in jobs]
+                order_ids = [order_id for _, order_id in jobs]
+                try:
+                    with transaction.atomic():
+                        OrderAssignmentService.assign_orders(Order.objects.filter(id__in=order_ids))
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Error procesando lote de asignaciones, reintentando orden por orden")
+                    # Each order in its own savepoint, keeping the jobs locked
+                    for job_id, order_id in jobs:
+                        try:
+                            with transaction.atomic():
+                                OrderAssignmentService.assign_orders(Order.objects.filter(id=order_id))
+                        except Exception as err:  # pylint: disable=broad-except
+                            logger.exception("Error asignando la orden %s", order_id)
+                            failed[job_id] = str(err)
+                AssignmentJob.objects.filter(id__in=job_ids).exclude(id__in=failed).delete()
+        except Exception as err:  # pylint: disable=broad-except
+            logger.exception("Error procesando lote de asignaciones")
+            AssignmentQueue._record_failure(job_ids, str(err))
+            return 0
+
+        for job_id, error in failed.items():
+            AssignmentQueue._record_failure([job_id], error)
+        return len(job_ids) - len(failed)
+
+    @staticmethod
+    def _record_failure(job_ids, error):
+        """Count a failed attempt on jobs that raised"""
+        with transaction.atomic():
+            jobs = AssignmentJob.objects.filter(id__in=job_ids)
+            jobs.update(attempts=F('attempts') + 1, last_error=error)
+            jobs.filter(attempts__gte=AssignmentQueue.MAX_ATTEMPTS).update(
+                status=AssignmentJob.JobStatus.FAILED
+            )
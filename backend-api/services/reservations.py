@@ -0,0 +1,135 @@
+"""
+Slot Reservation Service
+Reserves capacity in a condominium's delivery slots for scheduled orders,
+so a slot can't be booked beyond the deliverers whose shifts cover it
+"""
+from collections import Counter
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from users.models import UserAccount
+from users.shifts import ShiftMask
+from condominiums.schedule import SlotTemplate
+from .models import Order, SlotCapacity
+from .roster import DelivererRoster
+
+
+class SlotReservationService:
+    """Service for reserving and releasing slot capacity"""
+
+    # Orders in these statuses no longer hold a slot
+    RELEASED_STATUSES = (Order.OrderStatus.CANCELLED, Order.OrderStatus.NOT_ASSIGNED)
+
+    @staticmethod
+    def _staffed_shifts(condominium_id):
+        """
+        Shift masks of every deliverer of the condominium, whether or not
+        their delivery availability is on: capacity follows who works each
+        slot, not who happens to be toggled on when it's first booked
+        """
+        return list(UserAccount.objects.filter(
+            role__in=DelivererRoster.DELIVERER_ROLES,
+            department__condominium_id=condominium_id
+        ).values_list('shift_masks', flat=True))
+
+    @staticmethod
+    def _slot_capacity(staffed_shifts, template, slot_start):
+        """Deliverers whose shifts cover a slot"""
+        local_start = template.localize(slot_start)
+        return sum(
+            1 for shift_masks in staffed_shifts
+            if ShiftMask.is_on_shift(shift_masks, local_start)
+        )
+
+    @staticmethod
+    def reserve(condominium, scheduled_date, held_slot_id=None):
+        """
+        Reserve one unit of the slot containing scheduled_date.
+        The slot row is created on first use with the deliverers whose shifts
+        cover it as capacity; the reservation itself is one conditional UPDATE.
+        held_slot_id is the slot the order already holds, if any, which is
+        kept without reserving again.
+        Returns (slot, message); slot is None when it can't be reserved.
+        """
+        condominium_id = getattr(condominium, 'id', condominium)
+        template = SlotTemplate.for_condominium(condominium)
+        slot_start = template.slot_start(scheduled_date)
+        if slot_start is None:
+            return None, "La fecha programada está fuera del horario de entregas del condominio"
+
+        slot = SlotCapacity.objects.filter(
+            condominium_id=condominium_id, slot_start=slot_start
+        ).first()
+        if slot is None:
+            capacity = SlotReservationService._slot_capacity(
+                SlotReservationService._staffed_shifts(condominium_id), template, slot_start
+            )
+            if not capacity:
+                # Not persisted: the slot is sized again once someone covers it
+                return None, "No hay repartidores en turno en ese horario"
+            SlotCapacity.objects.bulk_create([
+                SlotCapacity(condominium_id=condominium_id, slot_start=slot_start, capacity=capacity)
+            ], ignore_conflicts=True)
+            slot = SlotCapacity.objects.get(condominium_id=condominium_id, slot_start=slot_start)
+
+        if slot.pk == held_slot_id:
+            return slot, "Horario reservado"
+
+        reserved = SlotCapacity.objects.filter(
+            pk=slot.pk, reserved__lt=F('capacity')
+        ).update(reserved=F('reserved') + 1)
+        if not reserved:
+            return None, "No quedan cupos disponibles en ese horario"
+
+        return slot, "Horario reservado"
+
+    @staticmethod
+    def release(slot_id, count=1):
+        """Give back units of a slot"""
+        SlotCapacity.objects.filter(pk=slot_id, reserved__gte=count).update(
+            reserved=F('reserved') - count
+        )
+
+    @staticmethod
+    def release_orders(orders):
+        """Release the slots held by an Order queryset (for bulk updates that bypass save)"""
+        held = orders.filter(slot__isnull=False)
+        for slot_id, count in Counter(held.values_list('slot_id', flat=True)).items():
+            SlotReservationService.release(slot_id, count)
+        held.update(slot=None)
+
+    @staticmethod
+    def staffing_changed(condominium_ids):
+        """
+        Refresh the capacity of the condominiums' upcoming slots once the
+        transaction commits, after deliverers joined or left them or changed
+        their shifts
+        """
+        condominium_ids = set(condominium_ids) - {None}
+
+        def refresh():
+            for condominium_id in condominium_ids:
+                SlotReservationService.refresh_capacity(condominium_id)
+
+        if condominium_ids:
+            transaction.on_commit(refresh)
+
+    @staticmethod
+    def refresh_capacity(condominium_id):
+        """
+        Recompute the capacity of the condominium's upcoming slots after its
+        deliverer roster or their shifts changed. Existing reservations are
+        kept; a slot whose capacity drops below them just stops taking more.
+        """
+        template = SlotTemplate.for_condominium(condominium_id)
+        slots = list(SlotCapacity.objects.filter(
+            condominium_id=condominium_id, slot_start__gte=timezone.now()
+        ))
+        if not slots:
+            return
+        staffed_shifts = SlotReservationService._staffed_shifts(condominium_id)
+        for slot in slots:
+            slot.capacity = SlotReservationService._slot_capacity(
+                staffed_shifts, template, slot.slot_start
+            )
+        SlotCapacity.objects.bulk_update(slots, ['capacity'])
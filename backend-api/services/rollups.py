@@ -0,0 +1,223 @@
+"""
+Earnings Rollup Service
+Maintains DailyEarnings rollups (completed orders and amount per deliverer,
+condominium and local day) as orders are completed or reopened, and reads
+earnings windows and daily/weekly/monthly series from them, so a series
+sums at most a few hundred rollup rows instead of scanning order history
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateField, DateTimeField, F, Func, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, TruncMonth, TruncWeek
+from django.utils import timezone
+from condominiums.schedule import SlotTemplate
+from .models import Order, DailyEarnings
+
+
+class EarningsRollupService:
+    """Service for maintaining and reading deliverer earnings rollups"""
+
+    # Series granularities and how rollup days are grouped into them
+    PERIODS = ('day', 'week', 'month')
+
+    # Most points a series can have
+    MAX_POINTS = 366
+
+    @staticmethod
+    def order_state(order):
+        """(status, deliverer_id, condominium_id, scheduled_date, amount) of an order, as tracked for rollups"""
+        return (order.status, order.deliverer_id, order.condominium_id, order.scheduled_date, order.amount)
+
+    @staticmethod
+    def local_day(condominium_id, value):
+        """Day of a datetime in the condominium's time zone (the project's one without condominium)"""
+        if condominium_id is None:
+            return timezone.localtime(value).date()
+        return SlotTemplate.for_condominium(condominium_id).localize(value).date()
+
+    @staticmethod
+    def today(user):
+        """Current day for a user, in its condominium's time zone"""
+        if user.department_id:
+            return SlotTemplate.for_condominium(user.department.condominium_id).today()
+        return timezone.localdate()
+
+    @staticmethod
+    def _add_order(deltas, state, sign):
+        """Add (sign=1) or remove (sign=-1) what an order in state counts for its deliverer's day"""
+        if state is None:
+            return
+        status, deliverer_id, condominium_id, scheduled_date, amount = state
+        if status != Order.OrderStatus.COMPLETED or not deliverer_id:
+            return
+        key = (deliverer_id, condominium_id, EarningsRollupService.local_day(condominium_id, scheduled_date))
+        deltas[key][0] += sign
+        deltas[key][1] += sign * amount
+
+    @staticmethod
+    def record_order_changes(changes):
+        """
+        Apply order changes given as (previous_state, state) pairs of
+        order_state() tuples; previous_state is None for new orders and
+        state is None for deleted ones
+        """
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+        for previous_state, state in changes:
+            if previous_state == state:
+                continue
+            EarningsRollupService._add_order(deltas, previous_state, -1)
+            EarningsRollupService._add_order(deltas, state, 1)
+
+        deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            DailyEarnings.objects.bulk_create(
+                [
+                    DailyEarnings(deliverer_id=deliverer_id, condominium_id=condominium_id, day=day)
+                    for deliverer_id, condominium_id, day in deltas
+                ],
+                ignore_conflicts=True
+            )
+            rollups = list(
+                DailyEarnings.objects.select_for_update().filter(reduce(or_, (
+                    Q(deliverer_id=deliverer_id, condominium_id=condominium_id, day=day)
+                    for deliverer_id, condominium_id, day in deltas
+                ))).order_by('id')
+            )
+            now = timezone.now()
+            emptied = []
+            for rollup in rollups:
+                completed_orders, amount = deltas[(rollup.deliverer_id, rollup.condominium_id, rollup.day)]
+                rollup.completed_orders = max(0, rollup.completed_orders + completed_orders)
+                rollup.amount += amount
+                rollup.updated_at = now
+                if not rollup.completed_orders:
+                    emptied.append(rollup.id)
+            DailyEarnings.objects.bulk_update(rollups, ['completed_orders', 'amount', 'updated_at'])
+            if emptied:
+                DailyEarnings.objects.filter(id__in=emptied).delete()
+
+    @staticmethod
+    def rebuild(deliverer_ids):
+        """
+        Recompute the rollups of the given deliverers from their completed
+        orders, grouping by local day in the database.
+        Used after bulk updates that bypass Order.save and by the
+        rebuild_earnings_rollups management command.
+        Returns the number of rollup rows written.
+        """
+        deliverer_ids = list(deliverer_ids)
+        # scheduled_date as a local date of the order's condominium
+        local_day = Cast(
+            Func(
+                Coalesce(F('condominium__time_zone'), Value(settings.TIME_ZONE)),
+                F('scheduled_date'),
+                function='timezone',
+                output_field=DateTimeField()
+            ),
+            DateField()
+        )
+        rows = Order.objects.filter(
+            deliverer_id__in=deliverer_ids,
+            status=Order.OrderStatus.COMPLETED
+        ).annotate(day=local_day).values(
+            'deliverer_id', 'condominium_id', 'day'
+        ).annotate(completed_orders=Count('id'), amount=Sum('amount')).order_by()
+
+        with transaction.atomic():
+            DailyEarnings.objects.filter(deliverer_id__in=deliverer_ids).delete()
+            rollups = DailyEarnings.objects.bulk_create(
+                [DailyEarnings(**row) for row in rows], batch_size=1000
+            )
+        return len(rollups)
+
+    @staticmethod
+    def total(deliverer, date_from=None, date_to=None):
+        """{'completed_orders', 'amount'} of a deliverer between two days (inclusive, open-ended when None)"""
+        rollups = DailyEarnings.objects.filter(deliverer=deliverer)
+        if date_from:
+            rollups = rollups.filter(day__gte=date_from)
+        if date_to:
+            rollups = rollups.filter(day__lte=date_to)
+        totals = rollups.aggregate(completed_orders=Sum('completed_orders'), amount=Sum('amount'))
+        return {
+            'completed_orders': totals['completed_orders'] or 0,
+            'amount': totals['amount'] or Decimal('0'),
+        }
+
+    @staticmethod
+    def period_start(period, day):
+        """First day of the day/week (Monday)/month containing day"""
+        if period == 'week':
+            return day - datetime.timedelta(days=day.weekday())
+        if period == 'month':
+            return day.replace(day=1)
+        return day
+
+    @staticmethod
+    def next_period(period, start):
+        """First day of the period after the one starting on start"""
+        if period == 'week':
+            return start + datetime.timedelta(weeks=1)
+        if period == 'month':
+            return (start + datetime.timedelta(days=32)).replace(day=1)
+        return start + datetime.timedelta(days=1)
+
+    @staticmethod
+    def period_count(period, date_from, date_to):
+        """Number of periods covering date_from..date_to, without listing them"""
+        if period == 'week':
+            weeks = EarningsRollupService.period_start(period, date_to) - EarningsRollupService.period_start(period, date_from)
+            return weeks.days // 7 + 1
+        if period == 'month':
+            return (date_to.year - date_from.year) * 12 + date_to.month - date_from.month + 1
+        return (date_to - date_from).days + 1
+
+    @staticmethod
+    def period_starts(period, date_from, date_to):
+        """Start days of the periods covering date_from..date_to"""
+        starts = []
+        start = EarningsRollupService.period_start(period, date_from)
+        while start <= date_to:
+            starts.append(start)
+            start = EarningsRollupService.next_period(period, start)
+        return starts
+
+    @staticmethod
+    def series(deliverer, period, date_from, date_to):
+        """
+        Completed orders and amount of a deliverer per day, week or month
+        between two days (inclusive), periods without orders included.
+        Returns [{'start', 'completed_orders', 'amount'}, ...] oldest first.
+        """
+        rollups = DailyEarnings.objects.filter(
+            deliverer=deliverer, day__gte=date_from, day__lte=date_to
+        )
+        if period == 'week':
+            rollups = rollups.annotate(start=TruncWeek('day', output_field=DateField()))
+        elif period == 'month':
+            rollups = rollups.annotate(start=TruncMonth('day', output_field=DateField()))
+        else:
+            rollups = rollups.annotate(start=F('day'))
+        totals = {
+            row['start']: row
+            for row in rollups.values('start').annotate(
+                completed_orders=Sum('completed_orders'), amount=Sum('amount')
+            ).order_by()
+        }
+
+        return [
+            {
+                'start': start,
+                'completed_orders': totals[start]['completed_orders'] if start in totals else 0,
+                'amount': totals[start]['amount'] if start in totals else Decimal('0'),
+            }
+            for start in EarningsRollupService.period_starts(period, date_from, date_to)
+        ]
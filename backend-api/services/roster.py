@@ -0,0 +1,137 @@
+"""
+Deliverer Roster
+Cached per-condominium roster of available deliverers with their tower,
+floor and shifts, so callers don't re-run the role/availability/condominium
+join, and the roster's tower/floor layout for the proximity index.
+UserAccount.save invalidates the rosters a change touches.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from users.models import UserAccount
+from .matching import ServiceMatchIndex
+
+
+class DelivererRoster:
+    """Service for the cached roster of available deliverers per condominium"""
+
+    # Seconds before a roster is rebuilt even without changes
+    TIMEOUT = 60 * 60
+
+    DELIVERER_ROLES = (UserAccount.UserRole.DELIVERER, UserAccount.UserRole.RECEIVER_AND_DELIVERER)
+
+    @staticmethod
+    def _key(condominium_id):
+        return f"deliverer_roster:{condominium_id}"
+
+    @staticmethod
+    def _layout_key(condominium_id):
+        return f"deliverer_roster:{condominium_id}:layout"
+
+    @staticmethod
+    def get(condominium):
+        """
+        Get the roster of a condominium (instance or id):
+        {deliverer_id: (tower, floor, shift_masks)}
+        """
+        condominium_id = getattr(condominium, 'id', condominium)
+        roster = cache.get(DelivererRoster._key(condominium_id))
+        if roster is None:
+            roster = {
+                deliverer_id: (tower, floor, shift_masks)
+                for deliverer_id, tower, floor, shift_masks in UserAccount.objects.filter(
+                    role__in=DelivererRoster.DELIVERER_ROLES,
+                    is_available_for_delivery=True,
+                    department__condominium_id=condominium_id
+                ).values_list('id', 'department__tower', 'department__floor', 'shift_masks')
+            }
+            cache.set(DelivererRoster._key(condominium_id), roster, DelivererRoster.TIMEOUT)
+        return roster
+
+    @staticmethod
+    def layout(condominium):
+        """
+        Get the roster's deliverers by tower, sorted by floor:
+        {tower: [(floor, deliverer_id), ...]}, cached and invalidated with the roster
+        """
+        condominium_id = getattr(condominium, 'id', condominium)
+        layout = cache.get(DelivererRoster._layout_key(condominium_id))
+        if layout is None:
+            towers = {}
+            for deliverer_id, (tower, floor, _) in DelivererRoster.get(condominium_id).items():
+                towers.setdefault(tower, []).append((floor, deliverer_id))
+            layout = {tower: sorted(floors) for tower, floors in towers.items()}
+            cache.set(DelivererRoster._layout_key(condominium_id), layout, DelivererRoster.TIMEOUT)
+        return layout
+
+    @staticmethod
+    def ids(condominium, exclude_user=None, exclude_ids=None):
+        """Ids of the condominium's available deliverers"""
+        excluded = set(exclude_ids or ())
+        if exclude_user:
+            excluded.add(exclude_user.id)
+        return [
+            deliverer_id for deliverer_id in DelivererRoster.get(condominium)
+            if deliverer_id not in excluded
+        ]
+
+    @staticmethod
+    def is_staffed(state):
+        """Whether a roster state is a deliverer of a condominium, available or not"""
+        role, _, department_id, _ = state
+        return bool(department_id) and role in DelivererRoster.DELIVERER_ROLES
+
+    @staticmethod
+    def user_changed(previous_state, state):
+        """
+        Invalidate the rosters touched by a user change. States are
+        (role, is_available_for_delivery, department_id, shift_masks);
+        previous_state is None for new users, state is None for deleted ones.
+        Deliverers count even while unavailable, since their shifts size
+        the condominium's slots; those are only resized when a deliverer's
+        role, department or shifts change, not its availability.
+        """
+        if previous_state == state:
+            return
+
+        from condominiums.models import Department
+
+        department_ids = {
+            current[2] for current in (previous_state, state)
+            if current is not None and DelivererRoster.is_staffed(current)
+        }
+        if not department_ids:
+            return
+        condominium_ids = set(
+            Department.objects.filter(id__in=department_ids).values_list('condominium_id', flat=True)
+        )
+        DelivererRoster.invalidate(condominium_ids)
+        if DelivererRoster._staffing(previous_state) != DelivererRoster._staffing(state):
+            # Import here to avoid circular import
+            from .reservations import SlotReservationService
+
+            SlotReservationService.staffing_changed(condominium_ids)
+
+    @staticmethod
+    def _staffing(state):
+        """What a roster state adds to its condominium's slot capacity: department and shifts"""
+        if state is None or not DelivererRoster.is_staffed(state):
+            return None
+        _, _, department_id, shift_masks = state
+        return department_id, shift_masks
+
+    @staticmethod
+    def invalidate(condominium_ids):
+        """
+        Drop the rosters of the given condominiums, right away and again once
+        the transaction commits, so no reader keeps the old roster
+        """
+        condominium_ids = set(condominium_ids)
+        keys = [
+            key for condominium_id in condominium_ids
+            for key in (DelivererRoster._key(condominium_id), DelivererRoster._layout_key(condominium_id))
+        ]
+        cache.delete_many(keys)
+        # Deliverers moving between condominiums take their services along
+        ServiceMatchIndex.invalidate(condominium_ids)
+
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -10,6 +10,8 @@ class ServiceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Service
         fields = ['id', 'type_of_service', 'type_of_service_name', 'user', 'user_email', 'status', 'status_display']
+        # Relations read per row, loaded up front by EagerLoadingMixin viewsets
+        select_related = ('type_of_service', 'user')
 
     def validate(self, data):
         user = self.context['request'].user
@@ -34,6 +36,7 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'status_display', 'receiver_name', 'receiver_email',
                            'deliverer_name', 'deliverer_email', 'service_info',
                            'created_at', 'updated_at']
+        select_related = ('receiver', 'deliverer', 'service__type_of_service', 'service__user')
 
     def get_service_info(self, obj):
         if obj.service:
@@ -92,6 +95,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         fields = ['id', 'order', 'amount', 'status', 'status_display',
                   'payment_method', 'payment_method_display', 'order_status']
         read_only_fields = ['id', 'status_display', 'payment_method_display', 'order_status']
+        select_related = ('order',)
 
     def validate_amount(self, value):
         if value <= 0:
@@ -109,6 +113,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_name', 'user_email', 'order', 'rating',
                   'comment', 'service', 'service_name']
         read_only_fields = ['id', 'user', 'user_name', 'user_email', 'service_name']
+        select_related = ('user', 'service__type_of_service')
 
     def validate_rating(self, value):
         if value < 1 or value > 5:
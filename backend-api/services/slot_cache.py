@@ -0,0 +1,245 @@
+"""
+Slot Occupancy Cache
+Keeps, per condominium and day, the active orders that occupy deliverer
+time, so availability is answered from the cache together with the
+DelivererRoster. A cached day is a snapshot taken at a version plus the
+per-order deltas written after it: an order change takes the next version
+of the days it touches with an atomic cache increment and stores its delta
+under that version with cache.add, so deltas are never overwritten and
+concurrent changes can't be lost. Readers apply the deltas newer than the
+snapshot and fold them into a new snapshot once there are enough of them;
+a full recompute only happens when the snapshot or a delta is missing or
+expired. Bulk updates bump a generation of the condominium instead, moving
+readers to fresh keys. Everything lives in the shared cache (see the CACHES
+setting), so every worker sees the same days.
+"""
+from datetime import timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from users.models import UserAccount
+from condominiums.schedule import SlotTemplate
+from .models import Order
+
+
+class SlotOccupancyCache:
+    """Service for the per-condominium, per-day slot occupancy cache"""
+
+    # Seconds before a snapshot or delta is dropped and the day recomputed
+    TIMEOUT = 15 * 60
+
+    # Deltas applied on a read before the result is cached as the new snapshot
+    COMPACT_AFTER = 32
+
+    # Orders keep their deliverer busy this long before and after scheduled_date
+    MARGIN = timedelta(minutes=30)
+
+    ACTIVE_STATUSES = (Order.OrderStatus.PENDING, Order.OrderStatus.ACCEPTED)
+
+    @staticmethod
+    def _key(condominium_id, date, generation):
+        return f"slot_occupancy:{condominium_id}:{date.isoformat()}:{generation}"
+
+    @staticmethod
+    def _version_key(condominium_id, date, generation):
+        return f"{SlotOccupancyCache._key(condominium_id, date, generation)}:version"
+
+    @staticmethod
+    def _delta_key(condominium_id, date, generation, version):
+        return f"{SlotOccupancyCache._key(condominium_id, date, generation)}:delta:{version}"
+
+    @staticmethod
+    def _generation_key(condominium_id):
+        return f"slot_occupancy:{condominium_id}:generation"
+
+    @staticmethod
+    def _generation(condominium_id):
+        """Generation of a condominium's cached days, 0 when never bumped"""
+        return cache.get(SlotOccupancyCache._generation_key(condominium_id), 0)
+
+    @staticmethod
+    def _bump(keys):
+        """Atomically increment generation keys, which never expire"""
+        for key in keys:
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Evicted between add and incr: any new value moves readers off old entries
+                cache.set(key, 1, timeout=None)
+
+    # Widest UTC offset of a condominium time zone, used to find the local
+    # days an order can fall on before knowing its condominium
+    MAX_UTC_OFFSET = timedelta(hours=14)
+
+    @staticmethod
+    def _days_for(scheduled_date):
+        """Days whose occupancy an order scheduled at this time can affect"""
+        reach = SlotOccupancyCache.MARGIN + SlotOccupancyCache.MAX_UTC_OFFSET
+        first = timezone.localdate(scheduled_date - reach, dt_timezone.utc)
+        last = timezone.localdate(scheduled_date + reach, dt_timezone.utc)
+        return {first + timedelta(days=offset) for offset in range((last - first).days + 1)}
+
+    @staticmethod
+    def get_day(condominium_id, date):
+        """
+        Get the occupancy of a condominium for a day:
+        {'bounds': (day_start, day_end) in the condominium time zone,
+         'orders': {order_id: (deliverer_id, scheduled_date)}}
+        """
+        generation = SlotOccupancyCache._generation(condominium_id)
+        key = SlotOccupancyCache._key(condominium_id, date, generation)
+        version_key = SlotOccupancyCache._version_key(condominium_id, date, generation)
+        cached = cache.get_many([key, version_key])
+        snapshot = cached.get(key)
+        version = cached.get(version_key, 0)
+
+        # Snapshots cached before a schedule edit cover the old day bounds,
+        # and one newer than the version means the version key was reset
+        bounds = SlotTemplate.for_condominium(condominium_id).day_bounds(date)
+        if snapshot is None or snapshot['bounds'] != bounds or snapshot['version'] > version:
+            return SlotOccupancyCache.recompute(condominium_id, date, generation)
+
+        if version > snapshot['version']:
+            delta_keys = [
+                SlotOccupancyCache._delta_key(condominium_id, date, generation, delta_version)
+                for delta_version in range(snapshot['version'] + 1, version + 1)
+            ]
+            deltas = cache.get_many(delta_keys)
+            if len(deltas) < len(delta_keys):
+                # A delta expired or is still being written
+                return SlotOccupancyCache.recompute(condominium_id, date, generation)
+            SlotOccupancyCache._apply(snapshot, [deltas[delta_key] for delta_key in delta_keys])
+            snapshot['version'] = version
+            if len(delta_keys) >= SlotOccupancyCache.COMPACT_AFTER:
+                cache.set(key, snapshot, SlotOccupancyCache.TIMEOUT)
+
+        return {'bounds': snapshot['bounds'], 'orders': snapshot['orders']}
+
+    @staticmethod
+    def _apply(snapshot, deltas):
+        """
+        Add, move or drop orders of a snapshot, in version order. A delta
+        older than one already applied to the same order is skipped, in case
+        two changes of an order took their versions out of commit order.
+        """
+        day_start, day_end = snapshot['bounds']
+        stamps = snapshot['stamps']
+        for order_id, entry, stamp in deltas:
+            if order_id in stamps and stamp < stamps[order_id]:
+                continue
+            stamps[order_id] = stamp
+            snapshot['orders'].pop(order_id, None)
+            if entry and day_start - SlotOccupancyCache.MARGIN <= entry[1] < day_end + SlotOccupancyCache.MARGIN:
+                snapshot['orders'][order_id] = entry
+
+    @staticmethod
+    def recompute(condominium_id, date, generation=None):
+        """
+        Rebuild the occupancy of a day from the database and cache it as a
+        snapshot at the version read before the query, so changes that
+        commit meanwhile are applied on top of it as deltas
+        """
+        if generation is None:
+            generation = SlotOccupancyCache._generation(condominium_id)
+        version = cache.get(SlotOccupancyCache._version_key(condominium_id, date, generation), 0)
+        day_start, day_end = SlotTemplate.for_condominium(condominium_id).day_bounds(date)
+        orders = Order.objects.filter(
+            deliverer__department__condominium_id=condominium_id,
+            status__in=SlotOccupancyCache.ACTIVE_STATUSES,
+            scheduled_date__gte=day_start - SlotOccupancyCache.MARGIN,
+            scheduled_date__lt=day_end + SlotOccupancyCache.MARGIN
+        ).values_list('id', 'deliverer_id', 'scheduled_date')
+
+        snapshot = {
+            'bounds': (day_start, day_end),
+            'orders': {
+                order_id: (deliverer_id, scheduled_date)
+                for order_id, deliverer_id, scheduled_date in orders
+            },
+            'stamps': {},
+            'version': version,
+        }
+        cache.set(
+            SlotOccupancyCache._key(condominium_id, date, generation),
+            snapshot, SlotOccupancyCache.TIMEOUT
+        )
+        return {'bounds': snapshot['bounds'], 'orders': snapshot['orders']}
+
+    @staticmethod
+    def order_changed(order, previous_state=None, previous_scheduled_date=None, condominium_id=None):
+        """
+        Record a delta on the cached days an order occupies after it was
+        created, assigned, accepted, cancelled or completed. previous_state
+        is the (status, deliverer_id) the order had before. Runs once the
+        transaction commits.
+        """
+        previous_status, previous_deliverer_id = previous_state or (None, None)
+        was_active = bool(previous_deliverer_id) and previous_status in SlotOccupancyCache.ACTIVE_STATUSES
+        is_active = bool(order.deliverer_id) and order.status in SlotOccupancyCache.ACTIVE_STATUSES
+        moved = previous_scheduled_date and previous_scheduled_date != order.scheduled_date
+        if not was_active and not is_active:
+            return
+        if was_active and is_active and previous_deliverer_id == order.deliverer_id and not moved:
+            return
+
+        order_id = order.id
+        deliverer_id = order.deliverer_id
+        entry = (deliverer_id, order.scheduled_date) if is_active else None
+        # Taken after the order's row was written: changes of one order are
+        # serialized by its row lock, so later changes get later stamps
+        stamp = timezone.now()
+        days = SlotOccupancyCache._days_for(order.scheduled_date)
+        if moved:
+            days |= SlotOccupancyCache._days_for(previous_scheduled_date)
+
+        def update_cache():
+            if condominium_id:
+                entries = {condominium_id: entry}
+            else:
+                deliverer_condominiums = dict(
+                    UserAccount.objects.filter(
+                        id__in={previous_deliverer_id, deliverer_id} - {None},
+                        department__isnull=False
+                    ).values_list('id', 'department__condominium_id')
+                )
+                # The order leaves the previous deliverer's condominium if it changed
+                entries = {
+                    cached_condominium_id: entry
+                    if deliverer_condominiums.get(deliverer_id) == cached_condominium_id else None
+                    for cached_condominium_id in deliverer_condominiums.values()
+                }
+            for cached_condominium_id, condominium_entry in entries.items():
+                SlotOccupancyCache._record_delta(
+                    cached_condominium_id, days, (order_id, condominium_entry, stamp)
+                )
+
+        transaction.on_commit(update_cache)
+
+    @staticmethod
+    def _record_delta(condominium_id, days, delta):
+        """Store a delta under the next version of each day"""
+        generation = SlotOccupancyCache._generation(condominium_id)
+        for date in days:
+            version_key = SlotOccupancyCache._version_key(condominium_id, date, generation)
+            cache.add(version_key, 0, timeout=None)
+            try:
+                version = cache.incr(version_key)
+            except ValueError:
+                version = None
+            if version is None or not cache.add(
+                SlotOccupancyCache._delta_key(condominium_id, date, generation, version),
+                delta, SlotOccupancyCache.TIMEOUT
+            ):
+                # The version key was evicted and restarted over existing
+                # deltas: move every reader of the condominium to fresh keys
+                SlotOccupancyCache.invalidate([condominium_id])
+                return
+
+    @staticmethod
+    def invalidate(condominium_ids):
+        """Expire every cached day of the given condominiums (after bulk updates)"""
+        SlotOccupancyCache._bump([
+            SlotOccupancyCache._generation_key(condominium_id)
+            for condominium_id in set(condominium_ids)
+        ])
@@ -0,0 +1,119 @@
+"""
+Slot Engine
+Computes deliverer occupancy per time slot in memory with a sweep line over
+the active orders of a condominium, instead of probing the database per
+slot and per deliverer. Deliverer shifts are matched as bitmasks: each
+deliverer gets one bit, so who is free in a slot is a bitwise AND and a
+popcount.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+
+class SlotEngine:
+    """Sweep line helpers for time slot occupancy"""
+
+    @staticmethod
+    def busy_intervals(order_rows, duration_minutes=30):
+        """
+        Build the merged busy intervals of each deliverer.
+        order_rows: iterable of (deliverer_id, scheduled_date).
+        As in check_time_slot_availability, an order scheduled at s keeps its
+        deliverer busy for every slot t in (s - duration, s + duration].
+        Returns a list of (start, end) pairs, disjoint per deliverer.
+        """
+        return [
+            interval
+            for intervals in SlotEngine.busy_intervals_by_deliverer(
+                order_rows, duration_minutes
+            ).values()
+            for interval in intervals
+        ]
+
+    @staticmethod
+    def busy_intervals_by_deliverer(order_rows, duration_minutes=30):
+        """Same as busy_intervals, as {deliverer_id: [(start, end), ...]}"""
+        duration = timedelta(minutes=duration_minutes)
+        by_deliverer = defaultdict(list)
+        for deliverer_id, scheduled_date in order_rows:
+            by_deliverer[deliverer_id].append(scheduled_date)
+
+        intervals = {}
+        for deliverer_id, scheduled_dates in by_deliverer.items():
+            scheduled_dates.sort()
+            merged = intervals[deliverer_id] = []
+            start = end = None
+            for scheduled_date in scheduled_dates:
+                if end is not None and scheduled_date - duration <= end:
+                    end = scheduled_date + duration
+                    continue
+                if end is not None:
+                    merged.append((start, end))
+                start, end = scheduled_date - duration, scheduled_date + duration
+            if end is not None:
+                merged.append((start, end))
+
+        return intervals
+
+    @staticmethod
+    def sweep_masks(slot_times, intervals_by_bit):
+        """
+        Yield (slot_time, busy_mask) for sorted slot_times, where busy_mask
+        has the bit of every deliverer busy in that slot.
+        intervals_by_bit: {deliverer_bit: [(start, end), ...]} with disjoint
+        intervals per deliverer, open at the start and closed at the end.
+        """
+        events = sorted(
+            (time, is_end, bit)
+            for bit, intervals in intervals_by_bit.items()
+            for start, end in intervals
+            for time, is_end in ((start, False), (end, True))
+        )
+        busy_mask = 0
+        position = 0
+        for slot_time in slot_times:
+            while position < len(events) and events[position][0] < slot_time:
+                _, is_end, bit = events[position]
+                busy_mask = busy_mask & ~bit if is_end else busy_mask | bit
+                position += 1
+            yield slot_time, busy_mask
+
+    @staticmethod
+    def available_counts(slot_times, slot_shift_keys, shift_masks, order_rows, duration_minutes=30):
+        """
+        Count the free, on-shift deliverers of each slot.
+        slot_times: sorted aware datetimes; slot_shift_keys: per slot, the
+        (weekday, shift bit) of its local start; shift_masks: {deliverer_id:
+        daily shift masks, empty when the deliverer has no shifts};
+        order_rows: iterable of (deliverer_id, scheduled_date).
+        Returns a list with one count per slot.
+        """
+        deliverer_bits = {
+            deliverer_id: 1 << position
+            for position, deliverer_id in enumerate(shift_masks)
+        }
+
+        # Bitmask of the deliverers on shift, per (weekday, shift bit)
+        rosters = {}
+        for key in slot_shift_keys:
+            if key in rosters:
+                continue
+            weekday, shift_bit = key
+            roster = 0
+            for deliverer_id, masks in shift_masks.items():
+                if not masks or masks[weekday] & shift_bit:
+                    roster |= deliverer_bits[deliverer_id]
+            rosters[key] = roster
+
+        intervals_by_bit = {
+            deliverer_bits[deliverer_id]: intervals
+            for deliverer_id, intervals in SlotEngine.busy_intervals_by_deliverer(
+                (row for row in order_rows if row[0] in deliverer_bits), duration_minutes
+            ).items()
+        }
+        return [
+            (rosters[key] & ~busy_mask).bit_count()
+            for key, (_, busy_mask) in zip(
+                slot_shift_keys, SlotEngine.sweep_masks(slot_times, intervals_by_bit)
+            )
+        ]
@@ -0,0 +1,264 @@
+"""
+User Order Stats Service
+Maintains per-user order statistics (counts by status, earnings, spend and
+ratings) as orders and reviews change, so endpoints read one row instead of
+aggregating order and review history
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from .models import Order, Review, UserOrderStats
+
+
+class UserOrderStatsService:
+    """Service for maintaining and reading user order statistics"""
+
+    @staticmethod
+    def get(user):
+        """
+        Get the stats record of a user.
+        Uses the prefetched relation when available; returns an empty,
+        unsaved record for users without orders.
+        """
+        try:
+            return user.order_stats
+        except UserOrderStats.DoesNotExist:
+            return UserOrderStats(user=user)
+
+    @staticmethod
+    def order_state(order):
+        """(status, deliverer_id, receiver_id, amount) of an order, as tracked for stats"""
+        return (order.status, order.deliverer_id, order.receiver_id, order.amount)
+
+    @staticmethod
+    def _new_delta():
+        return {
+            'delivery_counts': Counter(), 'request_counts': Counter(), 'ratings': Counter(),
+            'earnings': Decimal('0'), 'spent': Decimal('0')
+        }
+
+    @staticmethod
+    def _add_order(deltas, state, sign):
+        """Add (sign=1) or remove (sign=-1) what an order in state counts for its users"""
+        if state is None:
+            return
+        status, deliverer_id, receiver_id, amount = state
+        key = str(int(status))
+        completed = status == Order.OrderStatus.COMPLETED
+        if deliverer_id:
+            deltas[deliverer_id]['delivery_counts'][key] += sign
+            if completed:
+                deltas[deliverer_id]['earnings'] += sign * amount
+        if receiver_id:
+            deltas[receiver_id]['request_counts'][key] += sign
+            if completed:
+                deltas[receiver_id]['spent'] += sign * amount
+
+    @staticmethod
+    def record_order_changes(changes):
+        """
+        Apply order changes given as (previous_state, state) pairs of
+        order_state() tuples; previous_state is None for new orders and
+        state is None for deleted ones
+        """
+        deltas = defaultdict(UserOrderStatsService._new_delta)
+        for previous_state, state in changes:
+            if previous_state == state:
+                continue
+            UserOrderStatsService._add_order(deltas, previous_state, -1)
+            UserOrderStatsService._add_order(deltas, state, 1)
+        UserOrderStatsService._apply(deltas)
+
+    @staticmethod
+    def record_bulk_orders(orders):
+        """Apply the changes of orders written with bulk_update, which bypasses Order.save"""
+        UserOrderStatsService.record_order_changes(
+            (getattr(order, '_tracked_stats_state', None), UserOrderStatsService.order_state(order))
+            for order in orders
+        )
+        for order in orders:
+            order._tracked_stats_state = UserOrderStatsService.order_state(order)
+
+    @staticmethod
+    def record_review_change(previous_state, state):
+        """
+        Apply a review change given as (order_id, rating) states; previous_state
+        is None for new reviews and state is None for deleted ones. Ratings
+        count for the deliverer of the reviewed order once it is completed.
+        """
+        if previous_state == state:
+            return
+        order_ids = {current[0] for current in (previous_state, state) if current is not None}
+        deliverers = dict(
+            Order.objects.filter(
+                id__in=order_ids, status=Order.OrderStatus.COMPLETED, deliverer__isnull=False
+            ).values_list('id', 'deliverer_id')
+        )
+
+        deltas = defaultdict(UserOrderStatsService._new_delta)
+        for current, sign in ((previous_state, -1), (state, 1)):
+            if current is not None and current[0] in deliverers:
+                deltas[deliverers[current[0]]]['ratings'][str(current[1])] += sign
+        UserOrderStatsService._apply(deltas)
+
+    @staticmethod
+    def record_rated_order_change(order_id, previous_state, state):
+        """
+        Move the ratings of an order's reviews when the order stops or
+        starts counting them: it is completed or reopened, its deliverer
+        changes after completion, or it is deleted (state None). New orders
+        (previous_state None) have no reviews yet.
+        """
+        if previous_state is None:
+            return
+
+        def rated_deliverer(current):
+            if current is None or current[0] != Order.OrderStatus.COMPLETED:
+                return None
+            return current[1]
+
+        previous_deliverer, deliverer = rated_deliverer(previous_state), rated_deliverer(state)
+        if previous_deliverer == deliverer:
+            return
+        ratings = Counter(dict(
+            Review.objects.filter(order_id=order_id).values('rating').annotate(
+                count=Count('id')
+            ).values_list('rating', 'count')
+        ))
+        if not ratings:
+            return
+
+        deltas = defaultdict(UserOrderStatsService._new_delta)
+        for deliverer_id, sign in ((previous_deliverer, -1), (deliverer, 1)):
+            if deliverer_id:
+                for rating, count in ratings.items():
+                    deltas[deliverer_id]['ratings'][str(rating)] += sign * count
+        UserOrderStatsService._apply(deltas)
+
+    @staticmethod
+    def _apply(deltas):
+        """Add deltas to the users' records with a single locked read and one bulk update"""
+        deltas = {
+            user_id: delta for user_id, delta in deltas.items()
+            if any(delta['delivery_counts'].values()) or any(delta['request_counts'].values())
+            or any(delta['ratings'].values()) or delta['earnings'] or delta['spent']
+        }
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            UserOrderStats.objects.bulk_create(
+                [UserOrderStats(user_id=user_id) for user_id in deltas],
+                ignore_conflicts=True
+            )
+            records = list(
+                UserOrderStats.objects.select_for_update().filter(
+                    user_id__in=list(deltas)
+                ).order_by('user_id')
+            )
+            now = timezone.now()
+            for record in records:
+                delta = deltas[record.user_id]
+                record.delivery_counts = UserOrderStatsService._merge(
+                    record.delivery_counts, delta['delivery_counts']
+                )
+                record.request_counts = UserOrderStatsService._merge(
+                    record.request_counts, delta['request_counts']
+                )
+                record.rating_distribution = UserOrderStatsService._merge(
+                    record.rating_distribution, delta['ratings']
+                )
+                record.rating_sum = max(0, record.rating_sum + sum(
+                    int(rating) * count for rating, count in delta['ratings'].items()
+                ))
+                record.rating_count = max(0, record.rating_count + sum(delta['ratings'].values()))
+                record.earnings += delta['earnings']
+                record.spent += delta['spent']
+                record.updated_at = now
+            UserOrderStats.objects.bulk_update(records, [
+                'delivery_counts', 'request_counts', 'rating_distribution',
+                'rating_sum', 'rating_count', 'earnings', 'spent', 'updated_at'
+            ])
+
+    @staticmethod
+    def _merge(counts, delta):
+        """Add a Counter of deltas to a stored {key: count} dict, dropping zeros"""
+        merged = Counter(counts)
+        merged.update(delta)
+        return {key: count for key, count in merged.items() if count > 0}
+
+    @staticmethod
+    def delivery_summary(stats):
+        """Totals of the orders a user delivers, shaped like the my_deliveries aggregate"""
+        counts = stats.delivery_counts
+        return {
+            'total_orders': sum(counts.values()),
+            'completed_orders': counts.get(str(Order.OrderStatus.COMPLETED.value), 0),
+            'pending_orders': counts.get(str(Order.OrderStatus.PENDING.value), 0),
+            'accepted_orders': counts.get(str(Order.OrderStatus.ACCEPTED.value), 0),
+            'total_earnings': stats.earnings,
+        }
+
+    @staticmethod
+    def request_summary(stats):
+        """Totals of the orders a user requested, shaped like the my_requests aggregate"""
+        counts = stats.request_counts
+        return {
+            'total_orders': sum(counts.values()),
+            'completed_orders': counts.get(str(Order.OrderStatus.COMPLETED.value), 0),
+            'pending_orders': counts.get(str(Order.OrderStatus.PENDING.value), 0),
+            'cancelled_orders': counts.get(str(Order.OrderStatus.CANCELLED.value), 0),
+            'total_spent': stats.spent,
+        }
+
+    @staticmethod
+    def average_rating(stats):
+        """Average rating of a user as deliverer, 0 without reviews"""
+        return stats.rating_sum / stats.rating_count if stats.rating_count else 0
+
+    @staticmethod
+    def rebuild(user_ids):
+        """
+        Recompute the stats of the given users from order and review history.
+        Used after bulk updates that bypass Order.save and by the
+        rebuild_order_stats management command.
+        Returns the number of records written.
+        """
+        user_ids = list(user_ids)
+        records = {user_id: UserOrderStats(user_id=user_id) for user_id in user_ids}
+
+        for user_field, counts_field, amount_field in (
+            ('deliverer_id', 'delivery_counts', 'earnings'),
+            ('receiver_id', 'request_counts', 'spent'),
+        ):
+            rows = Order.objects.filter(**{f'{user_field}__in': user_ids}).values(
+                user_field, 'status'
+            ).annotate(count=Count('id'), amount=Sum('amount'))
+            for row in rows:
+                record = records[row[user_field]]
+                getattr(record, counts_field)[str(row['status'])] = row['count']
+                if row['status'] == Order.OrderStatus.COMPLETED:
+                    setattr(record, amount_field, row['amount'] or Decimal('0'))
+
+        ratings = Review.objects.filter(
+            order__deliverer_id__in=user_ids,
+            order__status=Order.OrderStatus.COMPLETED
+        ).values('order__deliverer_id', 'rating').annotate(count=Count('id'))
+        for row in ratings:
+            record = records[row['order__deliverer_id']]
+            record.rating_distribution[str(row['rating'])] = row['count']
+            record.rating_sum += row['rating'] * row['count']
+            record.rating_count += row['count']
+
+        UserOrderStats.objects.bulk_create(
+            records.values(),
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[
+                'delivery_counts', 'request_counts', 'rating_distribution',
+                'rating_sum', 'rating_count', 'earnings', 'spent', 'updated_at'
+            ]
+        )
+        return len(records)
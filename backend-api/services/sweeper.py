@@ -0,0 +1,171 @@
+"""
+Stale Order Sweeper
+Finds assigned orders the deliverer never accepted within the acceptance
+timeout of their condominium and hands them to someone else, or leaves
+them NOT_ASSIGNED when they were rejected too often or their scheduled
+time already passed. Orders are read in (assigned_at, id) chunks through
+the partial index over orders awaiting acceptance, so a sweep only touches
+orders older than the shortest timeout.
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from condominiums.models import Condominium
+from .models import Order
+from .assignment import OrderAssignmentService
+from .conf import assignment_setting
+from .load import DelivererLoadService
+from .reservations import SlotReservationService
+from .slot_cache import SlotOccupancyCache
+from .stats import UserOrderStatsService
+
+
+class StaleOrderSweeper:
+    """Service for reassigning or expiring orders nobody accepted in time"""
+
+    # Orders read and locked per chunk
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def default_timeouts():
+        """(scheduled, immediate) acceptance timeouts from ORDER_ASSIGNMENT"""
+        return (
+            timedelta(minutes=assignment_setting('ACCEPTANCE_TIMEOUT')),
+            timedelta(minutes=assignment_setting('IMMEDIATE_ACCEPTANCE_TIMEOUT'))
+        )
+
+    @staticmethod
+    def shortest_timeout():
+        """Shortest acceptance timeout of any condominium, bounding the scan"""
+        overrides = Condominium.objects.aggregate(
+            scheduled=Min('acceptance_timeout_minutes'),
+            immediate=Min('immediate_acceptance_timeout_minutes')
+        )
+        return min(
+            *StaleOrderSweeper.default_timeouts(),
+            *(timedelta(minutes=minutes) for minutes in overrides.values() if minutes)
+        )
+
+    @staticmethod
+    def condominium_timeouts(condominium_ids):
+        """{condominium_id: (scheduled, immediate)} acceptance timeouts"""
+        scheduled_default, immediate_default = StaleOrderSweeper.default_timeouts()
+        return {
+            condominium_id: (
+                timedelta(minutes=scheduled) if scheduled else scheduled_default,
+                timedelta(minutes=immediate) if immediate else immediate_default
+            )
+            for condominium_id, scheduled, immediate in Condominium.objects.filter(
+                id__in=condominium_ids
+            ).values_list('id', 'acceptance_timeout_minutes', 'immediate_acceptance_timeout_minutes')
+        }
+
+    @staticmethod
+    def sweep(chunk_size=None, now=None):
+        """
+        Sweep every order waiting for acceptance longer than its timeout.
+        Returns (reassigned, unassigned) counts.
+        """
+        chunk_size = chunk_size or StaleOrderSweeper.CHUNK_SIZE
+        now = now or timezone.now()
+        cutoff = now - StaleOrderSweeper.shortest_timeout()
+        awaiting = Order.objects.filter(
+            deliverer__isnull=False,
+            status=Order.OrderStatus.PENDING,
+            assigned_at__lte=cutoff
+        )
+
+        timeouts = {}
+        total_reassigned = total_unassigned = 0
+        last = None
+        while True:
+            chunk = awaiting
+            if last:
+                chunk = chunk.filter(
+                    Q(assigned_at__gt=last[0]) | Q(assigned_at=last[0], id__gt=last[1])
+                )
+            rows = list(
+                chunk.order_by('assigned_at', 'id').values_list(
+                    'id', 'assigned_at', 'condominium_id', 'is_immediate'
+                )[:chunk_size]
+            )
+            if not rows:
+                break
+            last = rows[-1][1], rows[-1][0]
+
+            missing = {row[2] for row in rows} - set(timeouts)
+            if missing:
+                timeouts.update(StaleOrderSweeper.condominium_timeouts(missing))
+            default = StaleOrderSweeper.default_timeouts()
+            stale_ids = [
+                order_id for order_id, assigned_at, condominium_id, is_immediate in rows
+                if assigned_at + timeouts.get(condominium_id, default)[is_immediate] <= now
+            ]
+            if stale_ids:
+                reassigned, unassigned = StaleOrderSweeper.release_orders(stale_ids, cutoff, now)
+                total_reassigned += reassigned
+                total_unassigned += unassigned
+            if len(rows) < chunk_size:
+                break
+
+        return total_reassigned, total_unassigned
+
+    @staticmethod
+    def release_orders(order_ids, cutoff, now):
+        """
+        Take a chunk of stale orders away from their deliverers with one bulk
+        update and offer them to the rest of the pool. Orders accepted or
+        locked by someone else meanwhile are skipped.
+        Returns (reassigned, unassigned) counts.
+        """
+        max_reassignments = assignment_setting('MAX_REASSIGNMENTS')
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update(skip_locked=True).filter(
+                    id__in=order_ids,
+                    deliverer__isnull=False,
+                    status=Order.OrderStatus.PENDING,
+                    assigned_at__lte=cutoff
+                )
+            )
+            if not orders:
+                return 0, 0
+            DelivererLoadService.record_bulk_assignment(orders, removed=True)
+
+            retry_ids = []
+            expired_ids = []
+            for order in orders:
+                previous_state = (order.status, order.deliverer_id)
+                # The silent deliverer counts as a rejection, like reassign_order
+                if order.deliverer_id not in order.rejected_deliverer_ids:
+                    order.rejected_deliverer_ids = order.rejected_deliverer_ids + [order.deliverer_id]
+                order.deliverer = None
+                order.assigned_at = None
+                order.updated_at = now
+                if (
+                    len(order.rejected_deliverer_ids) >= max_reassignments
+                    or (not order.is_immediate and order.scheduled_date <= now)
+                ):
+                    order.status = Order.OrderStatus.NOT_ASSIGNED
+                    expired_ids.append(order.id)
+                else:
+                    retry_ids.append(order.id)
+                SlotOccupancyCache.order_changed(
+                    order, previous_state, condominium_id=order.condominium_id
+                )
+                order._tracked_state = (order.status, order.deliverer_id)
+
+            Order.objects.bulk_update(
+                orders, ['deliverer', 'status', 'rejected_deliverer_ids', 'assigned_at', 'updated_at']
+            )
+            UserOrderStatsService.record_bulk_orders(orders)
+            if expired_ids:
+                SlotReservationService.release_orders(Order.objects.filter(id__in=expired_ids))
+
+        # Orders of open pool condominiums just go back to the pool
+        reassigned = OrderAssignmentService.assign_orders(
+            Order.objects.filter(id__in=retry_ids).exclude(condominium__open_orders_mode=True),
+            respect_capacity=True
+        ) if retry_ids else []
+        return len(reassigned), len(orders) - len(reassigned)
@@ -1,3 +1,1447 @@
-from django.test import TestCase
+import base64
+import io
+import threading
+from unittest import mock
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from backend.query_budget import QueryBudgetTestCase, QueryBudgetWorld
+from condominiums.models import Condominium, Department
+from condominiums.schedule import SlotTemplate
+from users.models import UserAccount
+from users.shifts import ShiftMask
+from users.views import UserAccountViewSet
+from .assignment import OrderAssignmentService
+from .availability import AvailabilityService
+from .load import DelivererLoadService
+from .matching import ServiceMatchIndex
+from .models import AssignmentJob, Order, DailyEarnings, DelivererLoad, Payment, Review, Service, SlotCapacity, TypeOfService, UserOrderStats
+from .proximity import DelivererProximityIndex
+from .queue import AssignmentQueue
+from .reservations import SlotReservationService
+from .rollups import EarningsRollupService
+from .roster import DelivererRoster
+from .slot_cache import SlotOccupancyCache
+from .slots import SlotEngine
+from .stats import UserOrderStatsService
+from .trips import TripPlanner
+from .sweeper import StaleOrderSweeper
 
-# Create your tests here.
+
+class ConcurrentAssignmentTests(TransactionTestCase):
+    """Burst order creation from many threads against one condominium"""
+
+    DELIVERERS = 10
+    THREADS = 20
+    ORDERS_PER_THREAD = 15
+
+    def setUp(self):
+        condominium = Condominium.objects.create(
+            name='Condominio', address='Av. Siempre Viva 123', district='Centro',
+            region='Lima', entries=1
+        )
+        self.receiver = UserAccount.objects.create_user(
+            email='receptor@example.com', password='secret', first_name='Ana',
+            last_name='Receptora', role=UserAccount.UserRole.RECEIVER,
+            department=Department.objects.create(
+                condominium=condominium, name='101', tower='A', floor=1
+            )
+        )
+        self.deliverers = [
+            UserAccount.objects.create_user(
+                email=f'repartidor{i}@example.com', password='secret',
+                first_name='Repartidor', last_name=str(i),
+                role=UserAccount.UserRole.DELIVERER, is_available_for_delivery=True,
+                department=Department.objects.create(
+                    condominium=condominium, name=f'{i + 2}01', tower='A', floor=i + 2
+                )
+            )
+            for i in range(self.DELIVERERS)
+        ]
+
+    def _create_orders(self, errors):
+        try:
+            for _ in range(self.ORDERS_PER_THREAD):
+                order = Order.objects.create(
+                    receiver=self.receiver,
+                    amount=Decimal('5.00'),
+                    scheduled_date=timezone.now() + timedelta(hours=2)
+                )
+                OrderAssignmentService.assign_order_to_deliverer(order)
+        except Exception as err:  # pylint: disable=broad-except
+            errors.append(err)
+        finally:
+            connection.close()
+
+    def test_burst_creation_stays_balanced(self):
+        errors = []
+        threads = [
+            threading.Thread(target=self._create_orders, args=(errors,))
+            for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+        total_orders = self.THREADS * self.ORDERS_PER_THREAD
+        self.assertEqual(Order.objects.filter(deliverer__isnull=False).count(), total_orders)
+
+        per_deliverer = [
+            Order.objects.filter(deliverer=deliverer).count()
+            for deliverer in self.deliverers
+        ]
+        self.assertLessEqual(max(per_deliverer) - min(per_deliverer), 2)
+
+        # Load counters agree with the orders actually assigned
+        loads = dict(DelivererLoad.objects.values_list('deliverer_id', 'active_orders'))
+        for deliverer, count in zip(self.deliverers, per_deliverer):
+            self.assertEqual(loads[deliverer.id], count)
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    """Parallel claims from the open pool of one condominium"""
+
+    THREADS = 8
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.world.condominium.open_orders_mode = True
+        self.world.condominium.save()
+
+    def _claim_in_parallel(self, claims):
+        """Run (order_id, deliverer_id) claims at once; returns the claimed orders"""
+        barrier = threading.Barrier(len(claims))
+        claimed, errors = [], []
+
+        def claim(order_id, deliverer_id):
+            try:
+                deliverer = UserAccount.objects.get(pk=deliverer_id)
+                barrier.wait()
+                order, _ = OrderAssignmentService.claim_open_order(order_id, deliverer)
+                if order is not None:
+                    claimed.append(order)
+            except Exception as err:  # pylint: disable=broad-except
+                errors.append(err)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=claim, args=args) for args in claims]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return claimed
+
+    def test_claims_stop_at_max_concurrent_orders(self):
+        DelivererLoad.objects.update_or_create(
+            deliverer=self.world.claimer,
+            defaults={'active_orders': DelivererLoadService.MAX_CONCURRENT_ORDERS - 1}
+        )
+        orders = [self.world.create_order() for _ in range(self.THREADS)]
+
+        claimed = self._claim_in_parallel([(order.id, self.world.claimer.id) for order in orders])
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(Order.objects.filter(deliverer=self.world.claimer).count(), 1)
+        self.assertEqual(
+            DelivererLoad.objects.get(deliverer=self.world.claimer).active_orders,
+            DelivererLoadService.MAX_CONCURRENT_ORDERS
+        )
+
+    def test_one_claim_wins_an_order(self):
+        # Deliverers offering the order's type of service, so the claim checks it
+        deliverers = [
+            UserAccount.objects.create_user(
+                email=f'reclamador{i}@example.com', password='secret', first_name='Repartidor',
+                last_name=str(i), role=UserAccount.UserRole.DELIVERER, is_available_for_delivery=True,
+                department=Department.objects.create(
+                    condominium=self.world.condominium, name=f'C{i}', tower='C', floor=i
+                )
+            )
+            for i in range(self.THREADS)
+        ]
+        Service.objects.bulk_create([
+            Service(type_of_service=self.world.type_of_service, user=deliverer) for deliverer in deliverers
+        ])
+        order = self.world.create_order(service=self.world.service)
+
+        claimed = self._claim_in_parallel([(order.id, deliverer.id) for deliverer in deliverers])
+        self.assertEqual(len(claimed), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.deliverer_id, claimed[0].deliverer_id)
+        self.assertEqual(order.status, Order.OrderStatus.ACCEPTED)
+        self.assertEqual(
+            sum(DelivererLoad.objects.filter(deliverer__in=deliverers).values_list('active_orders', flat=True)), 1
+        )
+
+
+class DelivererProximityIndexTests(SimpleTestCase):
+    """Blended proximity/load selection"""
+
+    LAYOUT = {'A': [(1, 1), (2, 2)], 'B': [(1, 3)]}
+
+    def test_terms_are_normalised(self):
+        # Raw terms would let 100 floors of tower penalty swamp the load
+        index = DelivererProximityIndex.from_layout(self.LAYOUT, {2: 10, 3: 0})
+        self.assertEqual(index.select('A', 1, 0.5), 3)
+        self.assertEqual(index.select('A', 1, 0.9), 2)
+
+    def test_layout_deliverers_without_load_are_not_candidates(self):
+        index = DelivererProximityIndex.from_layout(self.LAYOUT, {3: 4})
+        self.assertEqual(index.select('A', 1, 1), 3)
+        index.remove(3)
+        self.assertIsNone(index.select('A', 1, 1))
+
+
+class ImmediateAvailabilityTests(TestCase):
+    """Spare capacity and ETA of immediate deliveries"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.now = timezone.now()
+
+    def availability(self, **kwargs):
+        with mock.patch('django.utils.timezone.now', return_value=self.now):
+            return AvailabilityService.get_immediate_availability(self.world.condominium, **kwargs)
+
+    def test_free_deliverers_are_available_now(self):
+        self.assertEqual(self.availability(), {
+            'available': True, 'spare_capacity_count': 2, 'earliest_eta': self.now
+        })
+        self.assertEqual(self.availability(exclude_user=self.world.claimer)['spare_capacity_count'], 1)
+
+    def test_eta_is_the_first_busy_deliverer_to_finish(self):
+        self.world.create_order(deliverer=self.world.deliverer, scheduled_date=self.now + timedelta(minutes=10))
+        self.world.create_order(deliverer=self.world.claimer, scheduled_date=self.now - timedelta(minutes=10))
+        self.assertEqual(self.availability(), {
+            'available': True, 'spare_capacity_count': 2, 'earliest_eta': self.now + timedelta(minutes=20)
+        })
+
+    def test_deliverers_at_capacity_or_off_shift_are_excluded(self):
+        DelivererLoad.objects.update_or_create(
+            deliverer=self.world.claimer,
+            defaults={'active_orders': DelivererLoadService.MAX_CONCURRENT_ORDERS}
+        )
+        self.assertEqual(self.availability()['spare_capacity_count'], 1)
+
+        self.world.deliverer.shift_masks = [0] * 7
+        with self.captureOnCommitCallbacks(execute=True):
+            self.world.deliverer.save()
+        self.assertEqual(self.availability(), {
+            'available': False, 'spare_capacity_count': 0, 'earliest_eta': None
+        })
+
+
+class AvailabilityCalendarTests(TestCase):
+    """Per-day slot counts of the availability calendar"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.today = timezone.localdate(self.world.now, dt_timezone.utc)
+        self.noon = datetime.combine(self.today, time(12), tzinfo=dt_timezone.utc)
+
+    def calendar(self, start_date, days):
+        with mock.patch('django.utils.timezone.now', return_value=self.noon):
+            return AvailabilityService.get_availability_calendar(self.world.condominium, start_date, days)
+
+    def test_counts_per_day(self):
+        tomorrow = self.today + timedelta(days=1)
+        self.world.create_order(
+            deliverer=self.world.deliverer, scheduled_date=datetime.combine(tomorrow, time(10), tzinfo=dt_timezone.utc)
+        )
+        self.world.condominium.closed_weekdays = [(tomorrow + timedelta(days=1)).weekday()]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.world.condominium.save()
+
+        calendar = self.calendar(self.today, 3)
+        labels = calendar['slot_times']
+        self.assertEqual((labels[0], labels[-1], len(labels)), ('08:00', '19:30', 24))
+        self.assertEqual([day['date'] for day in calendar['days']], [self.today + timedelta(days=offset) for offset in range(3)])
+
+        # Past slots count as 0
+        today, tomorrow, closed = [day['available'] for day in calendar['days']]
+        self.assertEqual(today, [0] * labels.index('12:00') + [2] * (24 - labels.index('12:00')))
+        # The order keeps its deliverer busy in the 10:00 and 10:30 slots only
+        self.assertEqual(tomorrow, [1 if label in ('10:00', '10:30') else 2 for label in labels])
+        self.assertEqual(closed, [])
+
+    def test_days_are_capped(self):
+        calendar = self.calendar(self.today, AvailabilityService.MAX_CALENDAR_DAYS + 5)
+        self.assertEqual(len(calendar['days']), AvailabilityService.MAX_CALENDAR_DAYS)
+
+
+class ServiceMatchTests(TestCase):
+    """Orders only go to deliverers offering their type of service"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        # The claimer only has an inactive service of another type
+        self.other_type = TypeOfService.objects.create(
+            name='Compras', description='Compras del supermercado', price=Decimal('8.00')
+        )
+        self.other_service = Service.objects.create(
+            type_of_service=self.other_type, user=self.world.claimer, status=Service.ServiceStatus.INACTIVE
+        )
+
+    def test_index(self):
+        condominium = self.world.condominium
+        self.assertEqual(
+            ServiceMatchIndex.deliverer_ids(condominium, self.world.type_of_service.id), {self.world.deliverer.id}
+        )
+        self.assertEqual(ServiceMatchIndex.deliverer_ids(condominium, self.other_type.id), frozenset())
+        self.assertEqual(ServiceMatchIndex.types_of(condominium, self.world.claimer.id), set())
+
+    def test_orders_skip_deliverers_without_the_type(self):
+        # The claimer is less loaded but doesn't offer the type of service
+        self.world.create_order(deliverer=self.world.deliverer)
+        order = self.world.create_order(service=self.world.service)
+        self.assertEqual(OrderAssignmentService.assign_order_to_deliverer(order), self.world.deliverer)
+
+        orders = [self.world.create_order(service=self.world.service) for _ in range(3)]
+        assigned = OrderAssignmentService.assign_orders(Order.objects.filter(id__in=[order.id for order in orders]))
+        self.assertEqual({order.deliverer_id for order in assigned}, {self.world.deliverer.id})
+        self.assertEqual(len(assigned), 3)
+
+    def test_unoffered_types_wait_until_a_service_is_activated(self):
+        order = self.world.create_order(service=self.other_service)
+        self.assertIsNone(OrderAssignmentService.assign_order_to_deliverer(order))
+        self.assertEqual(OrderAssignmentService.assign_orders(Order.objects.filter(pk=order.pk)), [])
+
+        self.other_service.status = Service.ServiceStatus.ACTIVE
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_service.save()
+        self.assertEqual(OrderAssignmentService.assign_order_to_deliverer(order), self.world.claimer)
+
+
+class TripPlannerTests(TestCase):
+    """Runs group orders by time window and walk to the closest stop"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.deliverer = self.world.deliverer  # Lives in A-2
+        tomorrow = timezone.localdate(self.world.now, dt_timezone.utc) + timedelta(days=1)
+        self.ten = datetime.combine(tomorrow, time(10), tzinfo=dt_timezone.utc)
+
+    def order(self, tower, floor, minutes, deliverer=None, status=Order.OrderStatus.PENDING):
+        receiver = self.world.receiver
+        if (tower, floor) != ('A', 1):
+            receiver = self.world._create_user(f'{tower}{floor}@example.com', UserAccount.UserRole.RECEIVER, tower, floor)
+        return Order.objects.create(
+            receiver=receiver, deliverer=deliverer, status=status, amount=Decimal('5.00'),
+            scheduled_date=self.ten + timedelta(minutes=minutes)
+        )
+
+    def test_runs_by_window_and_closest_stop(self):
+        far = self.order('B', 5, 5, self.deliverer)
+        near = self.order('A', 1, 20, self.deliverer)
+        upstairs = self.order('A', 4, 10, self.deliverer)
+        later = self.order('A', 1, 60, self.deliverer)
+        self.order('A', 3, 15, self.deliverer, status=Order.OrderStatus.CANCELLED)
+        suggestion = self.order('A', 1, 70)
+
+        runs = TripPlanner.plan(self.deliverer)
+        self.assertEqual([(run['window_start'], run['window_end']) for run in runs], [
+            (self.ten, self.ten + timedelta(minutes=30)),
+            (self.ten + timedelta(hours=1), self.ten + timedelta(minutes=90)),
+        ])
+        # A-2 -> A-1 (1) -> A-4 (3) -> B-5 (101)
+        self.assertEqual(runs[0]['orders'], [near, upstairs, far])
+        self.assertEqual(runs[0]['distance'], 105)
+        self.assertEqual((runs[1]['orders'], runs[1]['distance']), ([later], 1))
+
+        runs = TripPlanner.plan(self.deliverer, include_unassigned=True)
+        self.assertEqual(runs[1]['orders'], [later, suggestion])
+        self.assertEqual([order.suggested for order in runs[1]['orders']], [False, True])
+        self.assertEqual(runs[1]['distance'], 1)
+
+
+class SlotEngineTests(SimpleTestCase):
+    """The sweep line matches the per-slot overlap query it replaced"""
+
+    DURATION = timedelta(minutes=30)
+
+    def setUp(self):
+        day = datetime(2030, 1, 7, 8, tzinfo=dt_timezone.utc)
+        # Every 5 minutes, so slots land exactly on s - d and s + d
+        self.slot_times = [day + timedelta(minutes=5 * step) for step in range(49)]
+        self.shift_keys = [(slot_time.weekday(), ShiftMask.bit_for(slot_time)) for slot_time in self.slot_times]
+        morning = ShiftMask.from_window(time(8), time(10))
+        self.shift_masks = {1: [], 2: [], 3: [morning] * 7, 4: []}
+        self.order_rows = [
+            # Overlapping orders of one deliverer
+            (1, day + timedelta(hours=1)),
+            (1, day + timedelta(hours=1, minutes=20)),
+            (1, day + timedelta(hours=1, minutes=50)),
+            (2, day + timedelta(hours=2)),
+            (3, day + timedelta(minutes=45)),
+            # Orders of deliverers outside the roster are ignored
+            (5, day + timedelta(hours=2)),
+        ]
+
+    def busy(self, deliverer_id, slot_time):
+        # check_time_slot_availability: scheduled_date in [t - d, t + d)
+        return any(
+            row_deliverer_id == deliverer_id and slot_time - self.DURATION <= scheduled_date < slot_time + self.DURATION
+            for row_deliverer_id, scheduled_date in self.order_rows
+        )
+
+    def test_available_counts_match_per_slot_overlap(self):
+        expected = [
+            sum(
+                1 for deliverer_id, masks in self.shift_masks.items()
+                if (not masks or masks[weekday] & shift_bit) and not self.busy(deliverer_id, slot_time)
+            )
+            for slot_time, (weekday, shift_bit) in zip(self.slot_times, self.shift_keys)
+        ]
+        counts = SlotEngine.available_counts(self.slot_times, self.shift_keys, self.shift_masks, self.order_rows)
+        self.assertEqual(counts, expected)
+
+    def test_busy_intervals_match_per_slot_overlap(self):
+        intervals = SlotEngine.busy_intervals_by_deliverer(self.order_rows)
+        # Overlapping orders are merged into one interval
+        self.assertEqual(len(intervals[1]), 1)
+        for deliverer_id in (1, 2, 3):
+            for slot_time in self.slot_times:
+                self.assertEqual(
+                    any(start < slot_time <= end for start, end in intervals[deliverer_id]),
+                    self.busy(deliverer_id, slot_time),
+                    (deliverer_id, slot_time)
+                )
+        self.assertEqual(
+            sorted(SlotEngine.busy_intervals(self.order_rows)),
+            sorted(interval for deliverer_intervals in intervals.values() for interval in deliverer_intervals)
+        )
+
+
+class SlotOccupancyCacheTests(TestCase):
+    """Cached days follow order changes through versioned deltas"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.scheduled_date = self.world.now + timedelta(days=1)
+        template = SlotTemplate.for_condominium(self.world.condominium.id)
+        self.day = template.localize(self.scheduled_date).date()
+
+    def test_order_changes_reach_cached_day(self):
+        condominium_id = self.world.condominium.id
+        self.assertEqual(SlotOccupancyCache.get_day(condominium_id, self.day)['orders'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.world.create_order(
+                Order.OrderStatus.ACCEPTED, self.world.deliverer, scheduled_date=self.scheduled_date
+            )
+        # Applied from the delta, without going back to the database
+        with self.assertNumQueries(0):
+            self.assertIn(order.id, SlotOccupancyCache.get_day(condominium_id, self.day)['orders'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = Order.OrderStatus.CANCELLED
+            order.save()
+        with self.assertNumQueries(0):
+            cached = SlotOccupancyCache.get_day(condominium_id, self.day)
+        self.assertEqual(cached, SlotOccupancyCache.recompute(condominium_id, self.day))
+        self.assertNotIn(order.id, cached['orders'])
+
+    def test_deltas_are_compacted_into_the_snapshot(self):
+        condominium_id = self.world.condominium.id
+        SlotOccupancyCache.get_day(condominium_id, self.day)
+        with self.captureOnCommitCallbacks(execute=True):
+            orders = [
+                self.world.create_order(
+                    Order.OrderStatus.ACCEPTED, self.world.deliverer, scheduled_date=self.scheduled_date
+                )
+                for _ in range(SlotOccupancyCache.COMPACT_AFTER)
+            ]
+        self.assertEqual(
+            set(SlotOccupancyCache.get_day(condominium_id, self.day)['orders']), {order.id for order in orders}
+        )
+        key = SlotOccupancyCache._key(condominium_id, self.day, SlotOccupancyCache._generation(condominium_id))
+        self.assertEqual(cache.get(key)['version'], SlotOccupancyCache.COMPACT_AFTER)
+
+    def test_recompute_racing_a_change_is_caught_up(self):
+        condominium_id = self.world.condominium.id
+        generation = SlotOccupancyCache._generation(condominium_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.world.create_order(
+                Order.OrderStatus.ACCEPTED, self.world.deliverer, scheduled_date=self.scheduled_date
+            )
+        # What a recompute that read the version before the change would write
+        bounds = SlotTemplate.for_condominium(condominium_id).day_bounds(self.day)
+        cache.set(
+            SlotOccupancyCache._key(condominium_id, self.day, generation),
+            {'bounds': bounds, 'orders': {}, 'stamps': {}, 'version': 0}, SlotOccupancyCache.TIMEOUT
+        )
+        self.assertIn(order.id, SlotOccupancyCache.get_day(condominium_id, self.day)['orders'])
+
+    def test_missing_delta_recomputes_day(self):
+        condominium_id = self.world.condominium.id
+        generation = SlotOccupancyCache._generation(condominium_id)
+        SlotOccupancyCache.get_day(condominium_id, self.day)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.world.create_order(
+                Order.OrderStatus.ACCEPTED, self.world.deliverer, scheduled_date=self.scheduled_date
+            )
+        cache.delete(SlotOccupancyCache._delta_key(condominium_id, self.day, generation, 1))
+        self.assertIn(order.id, SlotOccupancyCache.get_day(condominium_id, self.day)['orders'])
+
+    def test_schedule_edit_recomputes_day(self):
+        condominium = self.world.condominium
+        before = SlotOccupancyCache.get_day(condominium.id, self.day)['bounds']
+        with self.captureOnCommitCallbacks(execute=True):
+            condominium.time_zone = 'America/Lima'
+            condominium.save()
+        after = SlotOccupancyCache.get_day(condominium.id, self.day)['bounds']
+        self.assertNotEqual(before, after)
+        self.assertEqual(after, SlotTemplate.for_condominium(condominium.id).day_bounds(self.day))
+
+
+class SlotReservationTests(TestCase):
+    """Slot capacity from shift coverage, reservations and their release"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        # 10:00 UTC tomorrow, inside the default 08:00-20:00 UTC schedule
+        self.slot_time = (self.world.now + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.world.receiver)
+
+    def create_scheduled_order(self):
+        response = self.client.post('/api/orders/', {
+            'scheduled_date': self.slot_time.isoformat(), 'amount': '5.00',
+            'receiver': self.world.receiver.id
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Order.objects.get(pk=response.data['id'])
+
+    def test_reserve_up_to_capacity_and_release(self):
+        condominium_id = self.world.condominium.id
+        # The deliverer and the claimer have no shifts, so both cover every slot
+        for _ in range(2):
+            slot, _ = SlotReservationService.reserve(condominium_id, self.slot_time)
+            self.assertIsNotNone(slot)
+        slot, message = SlotReservationService.reserve(condominium_id, self.slot_time)
+        self.assertIsNone(slot)
+        self.assertEqual(message, "No quedan cupos disponibles en ese horario")
+
+        held = SlotCapacity.objects.get(condominium_id=condominium_id)
+        self.assertEqual((held.capacity, held.reserved), (2, 2))
+        SlotReservationService.release(held.id)
+        slot, _ = SlotReservationService.reserve(condominium_id, self.slot_time)
+        self.assertEqual(slot.pk, held.pk)
+
+    def test_capacity_ignores_availability_toggle(self):
+        UserAccount.objects.filter(
+            pk__in=[self.world.deliverer.pk, self.world.claimer.pk]
+        ).update(is_available_for_delivery=False)
+        slot, _ = SlotReservationService.reserve(self.world.condominium.id, self.slot_time)
+        self.assertEqual(slot.capacity, 2)
+
+    def test_capacity_is_refreshed_on_shift_changes_only(self):
+        slot, _ = SlotReservationService.reserve(self.world.condominium.id, self.slot_time)
+        deliverer = UserAccount.objects.get(pk=self.world.deliverer.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            deliverer.is_available_for_delivery = False
+            deliverer.save()
+        # Only cache drops: no slot is rewritten
+        with self.assertNumQueries(0):
+            for callback in callbacks:
+                callback()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deliverer.shift_masks = ShiftMask.compile([
+                {'weekdays': list(range(7)), 'start': '18:00', 'end': '20:00'}
+            ])
+            deliverer.save()
+        slot.refresh_from_db()
+        self.assertEqual(slot.capacity, 1)
+
+    def test_uncovered_slot_is_not_persisted(self):
+        evenings = ShiftMask.compile([{'weekdays': list(range(7)), 'start': '18:00', 'end': '20:00'}])
+        UserAccount.objects.filter(
+            pk__in=[self.world.deliverer.pk, self.world.claimer.pk]
+        ).update(shift_masks=evenings)
+        slot, _ = SlotReservationService.reserve(self.world.condominium.id, self.slot_time)
+        self.assertIsNone(slot)
+        self.assertFalse(SlotCapacity.objects.exists())
+
+    def test_switch_to_immediate_releases_slot(self):
+        order = self.create_scheduled_order()
+        slot_id = order.slot_id
+        response = self.client.patch(f'/api/orders/{order.id}/', {'is_immediate': True}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        order.refresh_from_db()
+        self.assertIsNone(order.slot_id)
+        self.assertEqual(SlotCapacity.objects.get(pk=slot_id).reserved, 0)
+
+    def test_reschedule_without_department_is_rejected(self):
+        order = self.create_scheduled_order()
+        UserAccount.objects.filter(pk=self.world.receiver.pk).update(department=None)
+        self.world.receiver.refresh_from_db()
+        response = self.client.patch(f'/api/orders/{order.id}/', {
+            'scheduled_date': (self.slot_time + timedelta(hours=1)).isoformat()
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AvailableDeliverersTests(TestCase):
+    """Deliverers read from a stale roster are re-checked against the database"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+
+    def test_stale_roster_entries_are_filtered(self):
+        condominium = self.world.condominium
+        self.assertIn(self.world.claimer.id, DelivererRoster.get(condominium))
+        # Bulk updates bypass UserAccount.save, leaving the cached roster stale
+        UserAccount.objects.filter(pk=self.world.claimer.pk).update(is_available_for_delivery=False)
+        UserAccount.objects.filter(pk=self.world.deliverer.pk).update(role=UserAccount.UserRole.RECEIVER)
+        self.assertIn(self.world.claimer.id, DelivererRoster.get(condominium))
+        self.assertFalse(OrderAssignmentService.get_available_deliverers(condominium).exists())
+
+
+class BatchAssignmentTests(TestCase):
+    """assign_orders spreads a backlog by load and keeps derived state exact"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.deliverers = [self.world.deliverer, self.world.claimer] + [
+            self.world._create_user(
+                f'lote{i}@example.com', UserAccount.UserRole.DELIVERER, tower='C', floor=i,
+                is_available_for_delivery=True
+            )
+            for i in range(2)
+        ]
+
+    def test_batch_levels_loads_and_matches_rebuild(self):
+        # The deliverer starts two assignments ahead of the rest
+        for _ in range(2):
+            self.world.create_order(deliverer=self.world.deliverer)
+        orders = [self.world.create_order() for _ in range(10)]
+
+        assigned = OrderAssignmentService.assign_orders(Order.objects.filter(id__in=[order.id for order in orders]))
+        self.assertEqual(len(assigned), 10)
+        per_deliverer = {
+            deliverer.id: Order.objects.filter(deliverer=deliverer).count() for deliverer in self.deliverers
+        }
+        self.assertEqual(per_deliverer, {deliverer.id: 3 for deliverer in self.deliverers})
+
+        loads = {
+            load.deliverer_id: (load.active_orders, load.recent_assignments)
+            for load in DelivererLoad.objects.all()
+        }
+        stats = {
+            row['user_id']: row for row in UserOrderStats.objects.values(
+                'user_id', 'delivery_counts', 'request_counts', 'earnings', 'spent'
+            )
+        }
+        DelivererLoadService.rebuild()
+        UserOrderStatsService.rebuild([self.world.receiver.id] + [deliverer.id for deliverer in self.deliverers])
+        self.assertEqual(loads, {
+            load.deliverer_id: (load.active_orders, load.recent_assignments)
+            for load in DelivererLoad.objects.all()
+        })
+        self.assertEqual(stats, {
+            row['user_id']: row for row in UserOrderStats.objects.values(
+                'user_id', 'delivery_counts', 'request_counts', 'earnings', 'spent'
+            )
+        })
+
+
+class DrainBacklogTests(TestCase):
+    """Orders handed to a deliverer that becomes available"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.deliverer = UserAccount.objects.get(pk=self.world.claimer.pk)
+        self.tomorrow = (self.world.now + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+    def drained_ids(self):
+        return [order.id for order in OrderAssignmentService.drain_backlog(self.deliverer)]
+
+    def test_drain_up_to_capacity_skipping_rejections(self):
+        orders = [self.world.create_order() for _ in range(7)]
+        Order.objects.filter(pk=orders[1].pk).update(rejected_deliverer_ids=[self.deliverer.id])
+
+        expected = [orders[i].id for i in (0, 2, 3, 4, 5)]
+        self.assertEqual(len(expected), DelivererLoadService.MAX_CONCURRENT_ORDERS)
+        self.assertEqual(self.drained_ids(), expected)
+        self.assertEqual(DelivererLoad.objects.get(deliverer=self.deliverer).active_orders, len(expected))
+        # At capacity, nothing more is drained
+        self.assertEqual(self.drained_ids(), [])
+
+    def test_drain_only_orders_inside_shifts(self):
+        self.deliverer.shift_masks = ShiftMask.compile([
+            {'weekdays': list(range(7)), 'start': '18:00', 'end': '20:00'}
+        ])
+        self.deliverer.save()
+        self.world.create_order(scheduled_date=self.tomorrow.replace(hour=10))
+        evening = self.world.create_order(scheduled_date=self.tomorrow.replace(hour=19))
+        self.assertEqual(self.drained_ids(), [evening.id])
+
+    def test_drain_skips_scheduled_orders_already_due(self):
+        self.world.create_order(scheduled_date=self.world.now - timedelta(minutes=10))
+        immediate = self.world.create_order(
+            scheduled_date=self.world.now - timedelta(minutes=10), is_immediate=True
+        )
+        upcoming = self.world.create_order()
+        self.assertEqual(self.drained_ids(), [immediate.id, upcoming.id])
+
+    def unassigned_order(self):
+        """A scheduled order that held a slot until it became NOT_ASSIGNED"""
+        slot, _ = SlotReservationService.reserve(self.world.condominium.id, self.tomorrow.replace(hour=10))
+        order = self.world.create_order(scheduled_date=self.tomorrow.replace(hour=10), slot=slot)
+        order.status = Order.OrderStatus.NOT_ASSIGNED
+        order.save()
+        slot.refresh_from_db()
+        self.assertEqual((order.slot_id, slot.reserved), (None, 0))
+        return order, slot
+
+    def test_drained_unassigned_orders_reserve_their_slot_again(self):
+        order, slot = self.unassigned_order()
+        self.assertEqual(self.drained_ids(), [order.id])
+        order.refresh_from_db()
+        slot.refresh_from_db()
+        self.assertEqual((order.status, order.slot_id), (Order.OrderStatus.PENDING, slot.id))
+        self.assertEqual(slot.reserved, 1)
+
+    def test_unassigned_orders_with_a_full_slot_are_not_drained(self):
+        order, slot = self.unassigned_order()
+        # Both deliverers cover the slot, so two reservations fill it
+        for _ in range(2):
+            SlotReservationService.reserve(self.world.condominium.id, order.scheduled_date)
+        self.assertEqual(self.drained_ids(), [])
+        self.assertEqual(OrderAssignmentService.assign_orders(Order.objects.filter(pk=order.pk)), [])
+        order.refresh_from_db()
+        slot.refresh_from_db()
+        self.assertEqual(
+            (order.status, order.deliverer_id, order.slot_id), (Order.OrderStatus.NOT_ASSIGNED, None, None)
+        )
+        self.assertEqual(slot.reserved, slot.capacity)
+
+
+class ClaimFallbackTests(TestCase):
+    """Assignment after every non-blocking claim lost the race"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.order = self.world.create_order()
+        self.claim = DelivererLoadService.claim
+
+    def contended_claim(self, load, order, skip_locked=True):
+        return False if skip_locked else self.claim(load, order, skip_locked)
+
+    def test_fallback_claims_the_load(self):
+        self.world.create_order(deliverer=self.world.deliverer)
+        with mock.patch.object(DelivererLoadService, 'claim', side_effect=self.contended_claim) as claim:
+            self.assertEqual(OrderAssignmentService.assign_order_to_deliverer(self.order), self.world.claimer)
+        self.assertIs(claim.call_args.kwargs['skip_locked'], False)
+        load = DelivererLoad.objects.get(deliverer=self.world.claimer)
+        self.assertEqual((load.active_orders, load.version), (1, 1))
+
+    def test_fallback_never_assigns_without_a_claim(self):
+        with mock.patch.object(DelivererLoadService, 'claim', return_value=False):
+            self.assertIsNone(OrderAssignmentService.assign_order_to_deliverer(self.order))
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.deliverer_id)
+        self.assertFalse(DelivererLoad.objects.filter(active_orders__gt=0).exists())
+
+
+class ReassignOrderTests(TestCase):
+    """Rejected orders go to someone else, never back, and stop after MAX_REASSIGNMENTS"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.third = self.world._create_user(
+            'tercero@example.com', UserAccount.UserRole.DELIVERER, tower='C', floor=1,
+            is_available_for_delivery=True
+        )
+        self.order = self.world.create_order(deliverer=self.world.deliverer)
+
+    def test_rejecting_deliverers_are_excluded(self):
+        first = OrderAssignmentService.reassign_order(self.order)
+        self.assertIn(first.id, {self.world.claimer.id, self.third.id})
+        second = OrderAssignmentService.reassign_order(self.order)
+        # The only deliverer that hasn't rejected it yet
+        self.assertEqual({first.id, second.id}, {self.world.claimer.id, self.third.id})
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.deliverer_id, second.id)
+        self.assertEqual(self.order.rejected_deliverer_ids, [self.world.deliverer.id, first.id])
+        self.assertEqual(DelivererLoad.objects.get(deliverer=self.world.deliverer).active_orders, 0)
+
+    @override_settings(ORDER_ASSIGNMENT={'MAX_REASSIGNMENTS': 2})
+    def test_order_is_left_unassigned_after_max_reassignments(self):
+        self.assertIsNotNone(OrderAssignmentService.reassign_order(self.order))
+        self.assertIsNone(OrderAssignmentService.reassign_order(self.order))
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.OrderStatus.NOT_ASSIGNED)
+        self.assertIsNone(self.order.deliverer_id)
+        self.assertEqual(len(self.order.rejected_deliverer_ids), 2)
+        # A deliverer was still free, but the order stopped bouncing
+        self.assertEqual(sum(DelivererLoad.objects.values_list('active_orders', flat=True)), 0)
+
+
+class OpenOrdersTests(TestCase):
+    """Orders a deliverer can list and claim from the open pool"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.world.condominium.open_orders_mode = True
+        self.world.condominium.save()
+        self.deliverer = UserAccount.objects.get(pk=self.world.claimer.pk)
+        self.client = APIClient()
+        self.client.force_authenticate(self.deliverer)
+        self.tomorrow = (self.world.now + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+    def listed_ids(self):
+        response = self.client.get('/api/orders/open/')
+        self.assertEqual(response.status_code, 200)
+        return [order['id'] for order in response.data]
+
+    def test_rejected_orders_cant_be_listed_or_claimed_back(self):
+        rejected = self.world.create_order(rejected_deliverer_ids=[self.deliverer.id])
+        other = self.world.create_order()
+        self.assertEqual(self.listed_ids(), [other.id])
+        self.assertEqual(self.client.post(f'/api/orders/{rejected.id}/claim/').status_code, 409)
+        rejected.refresh_from_db()
+        self.assertIsNone(rejected.deliverer_id)
+
+    def test_only_orders_inside_shifts(self):
+        self.deliverer.shift_masks = ShiftMask.compile([
+            {'weekdays': list(range(7)), 'start': '18:00', 'end': '20:00'}
+        ])
+        self.deliverer.save()
+        morning = self.world.create_order(scheduled_date=self.tomorrow.replace(hour=10))
+        evening = self.world.create_order(scheduled_date=self.tomorrow.replace(hour=19))
+        self.assertEqual(self.listed_ids(), [evening.id])
+        self.assertEqual(self.client.post(f'/api/orders/{morning.id}/claim/').status_code, 409)
+        self.assertEqual(self.client.post(f'/api/orders/{evening.id}/claim/').status_code, 200)
+
+    def test_claim_of_a_malformed_id_is_not_found(self):
+        self.assertEqual(self.client.post('/api/orders/abc/claim/').status_code, 404)
+
+
+class AssignmentQueueTests(TestCase):
+    """Queued assignments processed by run_assignment_worker"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.orders = [self.world.create_order() for _ in range(3)]
+        for order in self.orders:
+            AssignmentQueue.enqueue(order)
+
+    def test_worker_assigns_queued_orders(self):
+        call_command('run_assignment_worker', '--once', stdout=io.StringIO())
+        self.assertFalse(AssignmentJob.objects.exists())
+        for order in self.orders:
+            order.refresh_from_db()
+            self.assertIn(order.deliverer_id, {self.world.deliverer.id, self.world.claimer.id})
+
+    def test_failing_jobs_retry_up_to_max_attempts(self):
+        with mock.patch.object(OrderAssignmentService, 'assign_orders', side_effect=RuntimeError('sin conexión')):
+            for attempt in range(1, AssignmentQueue.MAX_ATTEMPTS + 1):
+                with self.assertLogs('services.queue', level='ERROR'):
+                    self.assertEqual(AssignmentQueue.process_batch(), 0)
+                job = AssignmentJob.objects.get(order=self.orders[0])
+                self.assertEqual((job.attempts, job.last_error), (attempt, 'sin conexión'))
+        self.assertEqual(
+            set(AssignmentJob.objects.values_list('status', flat=True)), {AssignmentJob.JobStatus.FAILED}
+        )
+        # Failed jobs are no longer claimed
+        self.assertEqual(AssignmentQueue.process_batch(), 0)
+        self.assertFalse(Order.objects.filter(deliverer__isnull=False).exists())
+
+    def test_a_poison_order_only_fails_its_own_job(self):
+        poison = self.orders[1]
+        assign_orders = OrderAssignmentService.assign_orders
+
+        def failing_assign_orders(orders, *args, **kwargs):
+            if orders.filter(pk=poison.pk).exists():
+                raise RuntimeError('orden corrupta')
+            return assign_orders(orders, *args, **kwargs)
+
+        with mock.patch.object(OrderAssignmentService, 'assign_orders', side_effect=failing_assign_orders):
+            with self.assertLogs('services.queue', level='ERROR'):
+                self.assertEqual(AssignmentQueue.process_batch(), 2)
+
+        job = AssignmentJob.objects.get()
+        self.assertEqual(
+            (job.order_id, job.attempts, job.last_error, job.status),
+            (poison.id, 1, 'orden corrupta', AssignmentJob.JobStatus.QUEUED)
+        )
+        for order in self.orders:
+            order.refresh_from_db()
+        self.assertEqual([order.deliverer_id is not None for order in self.orders], [True, False, True])
+
+
+class ConcurrentAssignmentQueueTests(TransactionTestCase):
+    """Workers skip the jobs another worker has locked"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.orders = [self.world.create_order() for _ in range(4)]
+        self.jobs = [AssignmentQueue.enqueue(order) for order in self.orders]
+
+    def test_workers_skip_locked_jobs(self):
+        locked = threading.Event()
+        release = threading.Event()
+        locked_ids = [job.id for job in self.jobs[:2]]
+
+        def other_worker():
+            # Holds the first jobs like a worker in the middle of its batch
+            try:
+                with transaction.atomic():
+                    list(AssignmentJob.objects.select_for_update().filter(id__in=locked_ids))
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertEqual(AssignmentQueue.process_batch(), 2)
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(sorted(AssignmentJob.objects.values_list('id', flat=True)), locked_ids)
+        self.assertEqual(
+            set(Order.objects.filter(deliverer__isnull=False).values_list('id', flat=True)),
+            {order.id for order in self.orders[2:]}
+        )
+
+
+class StaleOrderSweeperTests(TestCase):
+    """Orders nobody accepted in time are reassigned or expired"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+
+    def assigned_order(self, **kwargs):
+        return self.world.create_order(deliverer=self.world.deliverer, **kwargs)
+
+    def assertLoadsMatchRebuild(self):
+        loads = dict(DelivererLoad.objects.values_list('deliverer_id', 'active_orders'))
+        DelivererLoadService.rebuild()
+        self.assertEqual(loads, dict(DelivererLoad.objects.values_list('deliverer_id', 'active_orders')))
+
+    def test_orders_within_timeout_or_accepted_are_kept(self):
+        fresh = self.assigned_order()
+        accepted = self.assigned_order(status=Order.OrderStatus.ACCEPTED)
+        self.assertEqual(StaleOrderSweeper.sweep(now=self.world.now + timedelta(minutes=10)), (0, 0))
+        self.assertEqual(StaleOrderSweeper.sweep(now=self.world.now + timedelta(hours=1)), (1, 0))
+        accepted.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(accepted.deliverer_id, self.world.deliverer.id)
+        self.assertNotEqual(fresh.deliverer_id, self.world.deliverer.id)
+
+    def test_timeout_reassigns_to_another_deliverer(self):
+        self.world.condominium.immediate_acceptance_timeout_minutes = 2
+        self.world.condominium.save()
+        immediate = self.assigned_order(is_immediate=True)
+        scheduled = self.assigned_order()
+
+        self.assertEqual(StaleOrderSweeper.sweep(now=timezone.now() + timedelta(minutes=3)), (1, 0))
+        immediate.refresh_from_db()
+        scheduled.refresh_from_db()
+        self.assertEqual(immediate.deliverer_id, self.world.claimer.id)
+        self.assertEqual(immediate.rejected_deliverer_ids, [self.world.deliverer.id])
+        self.assertEqual(scheduled.deliverer_id, self.world.deliverer.id)
+        self.assertLoadsMatchRebuild()
+
+    def test_overdue_and_rejected_orders_expire(self):
+        # Inside the 08:00-20:00 schedule whatever the time the suite runs
+        scheduled_date = datetime.combine(
+            timezone.localdate(self.world.now, dt_timezone.utc) + timedelta(days=1), time(10), tzinfo=dt_timezone.utc
+        )
+        slot, _ = SlotReservationService.reserve(self.world.condominium.id, scheduled_date)
+        overdue = self.assigned_order(slot=slot, scheduled_date=scheduled_date)
+        rejected = self.assigned_order(
+            scheduled_date=scheduled_date + timedelta(days=1),
+            rejected_deliverer_ids=[self.world.claimer.id, self.world.staff.id]
+        )
+
+        self.assertEqual(StaleOrderSweeper.sweep(now=scheduled_date + timedelta(hours=1)), (0, 2))
+        for order in (overdue, rejected):
+            order.refresh_from_db()
+            self.assertEqual(order.status, Order.OrderStatus.NOT_ASSIGNED)
+            self.assertIsNone(order.deliverer_id)
+        slot.refresh_from_db()
+        self.assertEqual(slot.reserved, 0)
+        self.assertIsNone(overdue.slot_id)
+        self.assertLoadsMatchRebuild()
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages of the order lists"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.client = APIClient()
+        self.client.force_authenticate(self.world.receiver)
+
+    def walk(self, url, results='results'):
+        """Ids of every page, following next links"""
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            seen += [order['id'] for order in response.data[results]]
+            url = response.data['next']
+        return seen
+
+    def test_pages_continue_across_ties_and_new_rows(self):
+        orders = [self.world.create_order() for _ in range(7)]
+        # Every order shares created_at, so pages are split by id alone
+        Order.objects.update(created_at=self.world.now)
+
+        first = self.client.get('/api/orders/?page_size=3').data
+        newer = self.world.create_order()
+        seen = [order['id'] for order in first['results']] + self.walk(first['next'])
+        self.assertEqual(seen, sorted((order.id for order in orders), reverse=True))
+        self.assertNotIn(newer.id, seen)
+
+    def test_scheduled_date_pages(self):
+        for hours in (5, 2, 9, 2, 7):
+            self.world.create_order(scheduled_date=self.world.now + timedelta(hours=hours))
+        self.assertEqual(
+            self.walk('/api/orders/my_requests/?page_size=2', results='orders'),
+            list(Order.objects.order_by('-scheduled_date', '-id').values_list('id', flat=True))
+        )
+
+    def test_invalid_cursor(self):
+        not_a_date = base64.urlsafe_b64encode(b'ayer|12').decode()
+        no_id = base64.urlsafe_b64encode(self.world.now.isoformat().encode()).decode()
+        for cursor in ('zz', not_a_date, no_id):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/orders/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.data)
+
+
+class UserOrderStatsTests(TestCase):
+    """Incremental order statistics agree with a rebuild from history"""
+
+    FIELDS = (
+        'delivery_counts', 'request_counts', 'earnings', 'spent',
+        'rating_sum', 'rating_count', 'rating_distribution'
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.users = [self.world.receiver, self.world.deliverer]
+
+    def snapshot(self):
+        return {
+            user.id: tuple(getattr(stats, field) for field in self.FIELDS)
+            for user in self.users
+            for stats in [UserOrderStatsService.get(UserAccount.objects.get(pk=user.pk))]
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        UserOrderStatsService.rebuild([user.id for user in self.users])
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_complete_reopen_and_cancel(self):
+        order = self.world.create_order(
+            Order.OrderStatus.ACCEPTED, self.world.deliverer, amount=Decimal('7.50'),
+            service=self.world.service
+        )
+        self.assertMatchesRebuild()
+
+        order.status = Order.OrderStatus.COMPLETED
+        order.save()
+        stats = UserOrderStatsService.get(UserAccount.objects.get(pk=self.world.deliverer.pk))
+        self.assertEqual(UserOrderStatsService.delivery_summary(stats)['completed_orders'], 1)
+        self.assertEqual(stats.earnings, Decimal('7.50'))
+        Review.objects.create(
+            user=self.world.receiver, order=order, rating=4, comment='Bien', service=self.world.service
+        )
+        self.assertMatchesRebuild()
+
+        # Reopening takes the earnings and the rating back off
+        order.status = Order.OrderStatus.ACCEPTED
+        order.save()
+        stats = UserOrderStatsService.get(UserAccount.objects.get(pk=self.world.deliverer.pk))
+        self.assertEqual((stats.earnings, stats.rating_count), (Decimal('0.00'), 0))
+        self.assertMatchesRebuild()
+
+        order.status = Order.OrderStatus.CANCELLED
+        order.save()
+        stats = UserOrderStatsService.get(UserAccount.objects.get(pk=self.world.receiver.pk))
+        self.assertEqual(UserOrderStatsService.request_summary(stats)['cancelled_orders'], 1)
+        self.assertMatchesRebuild()
+
+
+class EarningsRollupTests(TestCase):
+    """Daily earnings rollups agree with a rebuild from history"""
+
+    def setUp(self):
+        cache.clear()
+        self.world = QueryBudgetWorld()
+        self.deliverer = self.world.deliverer
+
+    def rollups(self):
+        return sorted(DailyEarnings.objects.values_list(
+            'deliverer_id', 'condominium_id', 'day', 'completed_orders', 'amount'
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        EarningsRollupService.rebuild([self.deliverer.id])
+        self.assertEqual(incremental, self.rollups())
+
+    def test_complete_reopen_and_cancel(self):
+        orders = [
+            self.world.create_order(
+                Order.OrderStatus.ACCEPTED, self.deliverer, amount=Decimal(amount),
+                scheduled_date=self.world.now - timedelta(days=days)
+            )
+            for days, amount in ((0, '10.00'), (0, '2.50'), (3, '4.00'))
+        ]
+        for order in orders:
+            order.status = Order.OrderStatus.COMPLETED
+            order.save()
+        self.assertEqual(EarningsRollupService.total(self.deliverer)['amount'], Decimal('16.50'))
+        self.assertMatchesRebuild()
+
+        orders[0].status = Order.OrderStatus.ACCEPTED
+        orders[0].save()
+        self.assertEqual(EarningsRollupService.total(self.deliverer)['amount'], Decimal('6.50'))
+        self.assertMatchesRebuild()
+
+        orders[2].status = Order.OrderStatus.CANCELLED
+        orders[2].save()
+        self.assertEqual(EarningsRollupService.total(self.deliverer), {
+            'completed_orders': 1, 'amount': Decimal('2.50')
+        })
+        self.assertMatchesRebuild()
+
+    def test_summary_windows_cover_the_last_7_and_30_days(self):
+        for days, amount in ((6, '1.00'), (7, '2.00'), (29, '4.00'), (30, '8.00')):
+            self.world.create_order(
+                Order.OrderStatus.COMPLETED, self.deliverer, amount=Decimal(amount),
+                scheduled_date=self.world.now - timedelta(days=days)
+            )
+        self.assertMatchesRebuild()
+
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.deliverer)
+        earnings = UserAccountViewSet.as_view({'get': 'earnings_summary'})(request).data['earnings']
+        self.assertEqual((earnings['weekly'], earnings['monthly']), (1.0, 7.0))
+
+    def test_period_count_matches_period_starts(self):
+        date_from = date(2023, 12, 29)
+        for date_to in (date_from, date(2024, 1, 1), date(2024, 3, 4)):
+            for period in EarningsRollupService.PERIODS:
+                with self.subTest(period=period, date_to=date_to):
+                    self.assertEqual(
+                        EarningsRollupService.period_count(period, date_from, date_to),
+                        len(EarningsRollupService.period_starts(period, date_from, date_to))
+                    )
+
+
+class ServiceQueryBudgetTests(QueryBudgetTestCase):
+    """Query budgets of /api/services/ and /api/service-types/"""
+
+    def test_service_list(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.deliverer).get('/api/services/'))
+
+    def test_service_update(self):
+        self.assertQueryBudget(5, lambda: self.client_for(self.world.deliverer).put(
+            f'/api/services/{self.world.service.id}/', {'status': Service.ServiceStatus.ACTIVE}, format='json'
+        ))
+
+    def test_service_destroy(self):
+        self.assertQueryBudget(
+            6,
+            lambda service: self.client_for(self.world.deliverer).delete(f'/api/services/{service.id}/'),
+            prepare=lambda: (Service.objects.create(
+                type_of_service=self.world.type_of_service, user=self.world.deliverer
+            ),)
+        )
+
+    def test_service_type_list(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get('/api/service-types/'))
+
+    def test_service_type_retrieve(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get(
+            f'/api/service-types/{self.world.type_of_service.id}/'
+        ))
+
+    def test_service_type_create(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.staff).post('/api/service-types/', {
+            'name': 'Lavandería', 'description': 'Recojo de ropa', 'price': '8.00'
+        }, format='json'))
+
+    def test_service_type_update(self):
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.staff).patch(
+            f'/api/service-types/{self.world.type_of_service.id}/', {'price': '6.00'}, format='json'
+        ))
+
+    def test_service_type_destroy(self):
+        self.assertQueryBudget(
+            4,
+            lambda type_of_service: self.client_for(self.world.staff).delete(
+                f'/api/service-types/{type_of_service.id}/'
+            ),
+            prepare=lambda: (TypeOfService.objects.create(
+                name='Temporal', description='Sin servicios', price=Decimal('1.00')
+            ),)
+        )
+
+
+class OrderQueryBudgetTests(QueryBudgetTestCase):
+    """Query budgets of /api/orders/"""
+
+    def test_list(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get('/api/orders/'))
+
+    def test_list_unpaginated(self):
+        # The whole list, serialized with the relations loaded up front
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get('/api/orders/?paginate=false'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(
+            2,
+            lambda order: self.client_for(self.world.receiver).get(f'/api/orders/{order.id}/'),
+            prepare=lambda: (self.world.create_order(),)
+        )
+
+    def test_create(self):
+        self.assertQueryBudget(38, lambda: self.client_for(self.world.receiver).post('/api/orders/', {
+            'is_immediate': True, 'scheduled_date': self.world.now.isoformat(), 'amount': '5.00',
+            'receiver': self.world.receiver.id,
+            'service': self.world.service.id
+        }, format='json'))
+
+    def test_update(self):
+        self.assertQueryBudget(
+            7,
+            lambda order: self.client_for(self.world.receiver).patch(
+                f'/api/orders/{order.id}/', {'delivery_notes': 'Dejar en conserjería'}, format='json'
+            ),
+            prepare=lambda: (self.world.create_order(),)
+        )
+
+    def test_destroy(self):
+        self.assertQueryBudget(
+            13,
+            lambda order: self.client_for(self.world.receiver).delete(f'/api/orders/{order.id}/'),
+            prepare=lambda: (self.world.create_order(),)
+        )
+
+    def test_accept_order(self):
+        self.assertQueryBudget(
+            13,
+            lambda order: self.client_for(self.world.deliverer).post(f'/api/orders/{order.id}/accept_order/'),
+            prepare=lambda: (self.world.create_order(deliverer=self.world.deliverer),)
+        )
+
+    def test_reject_order(self):
+        # The order is reassigned among every deliverer of the condominium
+        self.assertQueryBudget(
+            24,
+            lambda order: self.client_for(self.world.deliverer).post(f'/api/orders/{order.id}/reject_order/'),
+            prepare=lambda: (self.world.create_order(deliverer=self.world.deliverer),)
+        )
+
+    def test_open_orders(self):
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.claimer).get('/api/orders/open/?limit=100'))
+
+    def test_claim(self):
+        self.assertQueryBudget(
+            22,
+            lambda order: self.client_for(self.world.claimer).post(f'/api/orders/{order.id}/claim/'),
+            prepare=lambda: (self.world.create_order(condominium=self.world.condominium),)
+        )
+
+    def test_complete_order(self):
+        self.assertQueryBudget(
+            23,
+            lambda order: self.client_for(self.world.deliverer).post(f'/api/orders/{order.id}/complete_order/'),
+            prepare=lambda: (self.world.create_order(
+                status=Order.OrderStatus.ACCEPTED, deliverer=self.world.deliverer
+            ),)
+        )
+
+    def test_cancel_order(self):
+        self.assertQueryBudget(
+            12,
+            lambda order: self.client_for(self.world.receiver).post(f'/api/orders/{order.id}/cancel_order/'),
+            prepare=lambda: (self.world.create_order(),)
+        )
+
+    def test_my_deliveries(self):
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.deliverer).get('/api/orders/my_deliveries/'))
+
+    def test_my_deliveries_filtered(self):
+        self.assertQueryBudget(4, lambda: self.client_for(self.world.deliverer).get(
+            '/api/orders/my_deliveries/', {'status': Order.OrderStatus.COMPLETED}
+        ))
+
+    def test_my_requests(self):
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.receiver).get('/api/orders/my_requests/'))
+
+    def test_trip_plan(self):
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.deliverer).get('/api/orders/trip_plan/'))
+
+    def test_trip_plan_with_suggestions(self):
+        self.assertQueryBudget(7, lambda: self.client_for(self.world.claimer).get(
+            '/api/orders/trip_plan/', {'include_unassigned': 'true'}
+        ))
+
+    def test_check_availability(self):
+        self.assertQueryBudget(4, lambda: self.client_for(self.world.receiver).get('/api/orders/check_availability/'))
+
+    def test_availability_calendar(self):
+        self.assertQueryBudget(4, lambda: self.client_for(self.world.receiver).get(
+            '/api/orders/availability_calendar/', {'days': 14}
+        ))
+
+
+class PaymentQueryBudgetTests(QueryBudgetTestCase):
+    """Query budgets of /api/payments/"""
+
+    def completed_order(self):
+        return self.world.create_order(status=Order.OrderStatus.COMPLETED, deliverer=self.world.deliverer)
+
+    def payment(self):
+        return (Payment.objects.create(order=self.completed_order(), amount=Decimal('5.00')),)
+
+    def test_list(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get('/api/payments/'))
+
+    def test_list_staff(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.staff).get('/api/payments/'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(
+            2,
+            lambda payment: self.client_for(self.world.receiver).get(f'/api/payments/{payment.id}/'),
+            prepare=self.payment
+        )
+
+    def test_create(self):
+        self.assertQueryBudget(
+            4,
+            lambda order: self.client_for(self.world.receiver).post('/api/payments/', {
+                'order': order.id, 'amount': '5.00'
+            }, format='json'),
+            prepare=lambda: (self.completed_order(),)
+        )
+
+    def test_update(self):
+        self.assertQueryBudget(
+            4,
+            lambda payment: self.client_for(self.world.receiver).patch(
+                f'/api/payments/{payment.id}/', {'payment_method': Payment.PaymentMethod.DEBIT_CARD}, format='json'
+            ),
+            prepare=self.payment
+        )
+
+    def test_destroy(self):
+        self.assertQueryBudget(
+            3,
+            lambda payment: self.client_for(self.world.staff).delete(f'/api/payments/{payment.id}/'),
+            prepare=self.payment
+        )
+
+    def test_confirm_payment(self):
+        self.assertQueryBudget(
+            4,
+            lambda payment: self.client_for(self.world.receiver).post(f'/api/payments/{payment.id}/confirm_payment/'),
+            prepare=self.payment
+        )
+
+
+class ReviewQueryBudgetTests(QueryBudgetTestCase):
+    """Query budgets of /api/reviews/"""
+
+    def completed_order(self):
+        return self.world.create_order(
+            status=Order.OrderStatus.COMPLETED, deliverer=self.world.deliverer, service=self.world.service
+        )
+
+    def review(self):
+        order = self.completed_order()
+        return (Review.objects.create(
+            user=self.world.receiver, order=order, rating=4, comment='Puntual', service=order.service
+        ),)
+
+    def test_list(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get('/api/reviews/'))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(
+            2,
+            lambda review: self.client_for(self.world.receiver).get(f'/api/reviews/{review.id}/'),
+            prepare=self.review
+        )
+
+    def test_create(self):
+        self.assertQueryBudget(
+            17,
+            lambda order: self.client_for(self.world.receiver).post('/api/reviews/', {
+                'order': order.id, 'rating': 5, 'comment': 'Excelente', 'service': order.service_id
+            }, format='json'),
+            prepare=lambda: (self.completed_order(),)
+        )
+
+    def test_update(self):
+        self.assertQueryBudget(
+            11,
+            lambda review: self.client_for(self.world.receiver).patch(
+                f'/api/reviews/{review.id}/', {'rating': 3}, format='json'
+            ),
+            prepare=self.review
+        )
+
+    def test_destroy(self):
+        self.assertQueryBudget(
+            11,
+            lambda review: self.client_for(self.world.receiver).delete(f'/api/reviews/{review.id}/'),
+            prepare=self.review
+        )
+
+    def test_average_rating(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get(
+            '/api/reviews/average_rating/', {'user': self.world.deliverer.id}
+        ))
+
+    def test_my_reviews(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.receiver).get('/api/reviews/my_reviews/'))
+
+    def test_reviews_about_me(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.deliverer).get('/api/reviews/reviews_about_me/'))
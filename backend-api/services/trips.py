@@ -0,0 +1,105 @@
+"""
+Trip Planner
+Groups a deliverer's orders into delivery runs: orders due in the same
+time window of the condominium make one run, and the stops of a run are
+ordered to minimise walking between towers and floors, using the same
+model as OrderAssignmentService.get_proximity_score
+"""
+import datetime
+from django.db.models import prefetch_related_objects
+from condominiums.schedule import SlotTemplate
+from .models import Order
+from .assignment import OrderAssignmentService
+from .load import DelivererLoadService
+
+
+class TripPlanner:
+    """Service for planning a deliverer's delivery runs"""
+
+    # Orders a deliverer still has to deliver
+    PLANNED_STATUSES = (Order.OrderStatus.PENDING, Order.OrderStatus.ACCEPTED)
+
+    # Relations read when the planned orders are serialized
+    RELATED = ('receiver__department', 'deliverer', 'service__type_of_service', 'service__user')
+
+    @staticmethod
+    def plan(deliverer, include_unassigned=False):
+        """
+        Plan the runs of a deliverer. With include_unassigned, unassigned
+        orders it could take (up to its free capacity) are added as
+        suggestions, flagged with order.suggested.
+        Returns a list of runs ordered by time:
+        {'window_start', 'window_end', 'orders': [Order, ...], 'distance'}
+        """
+        if not deliverer.department_id:
+            return []
+
+        orders = list(
+            Order.objects.filter(
+                deliverer=deliverer,
+                status__in=TripPlanner.PLANNED_STATUSES
+            ).select_related(*TripPlanner.RELATED).order_by('scheduled_date', 'id')
+        )
+        for order in orders:
+            order.suggested = False
+
+        if include_unassigned:
+            free = DelivererLoadService.MAX_CONCURRENT_ORDERS - DelivererLoadService.get_active_orders(deliverer)
+            if free > 0:
+                suggestions = OrderAssignmentService.compatible_backlog(deliverer, free)
+                prefetch_related_objects(suggestions, *TripPlanner.RELATED)
+                for order in suggestions:
+                    order.suggested = True
+                orders.extend(suggestions)
+
+        template = SlotTemplate.for_condominium(deliverer.department.condominium_id)
+        window = datetime.timedelta(minutes=template.slot_minutes)
+        runs = {}
+        for order in orders:
+            window_start = TripPlanner.window_start(template, order.scheduled_date)
+            runs.setdefault(window_start, []).append(order)
+
+        return [
+            {
+                'window_start': window_start,
+                'window_end': window_start + window,
+                **TripPlanner.route(deliverer.department, runs[window_start])
+            }
+            for window_start in sorted(runs)
+        ]
+
+    @staticmethod
+    def window_start(template, scheduled_date):
+        """Start of the condominium time window containing scheduled_date"""
+        local_date = template.localize(scheduled_date)
+        midnight = datetime.datetime.combine(
+            local_date.date(), datetime.time.min, tzinfo=template.time_zone
+        )
+        window = datetime.timedelta(minutes=template.slot_minutes)
+        return midnight + (local_date - midnight) // window * window
+
+    @staticmethod
+    def route(start_department, orders):
+        """
+        Order the stops of a run, always walking to the closest remaining
+        department (orders to the same department are delivered together).
+        Returns {'orders': [...], 'distance': total proximity score}
+        """
+        remaining = list(orders)
+        current = start_department
+        route = []
+        distance = 0
+        while remaining:
+            closest = min(
+                remaining,
+                key=lambda order: OrderAssignmentService.get_proximity_score(
+                    order.receiver.department, current
+                )
+            )
+            score = OrderAssignmentService.get_proximity_score(closest.receiver.department, current)
+            if score != float('inf'):
+                distance += score
+                current = closest.receiver.department
+            remaining.remove(closest)
+            route.append(closest)
+        return {'orders': route, 'distance': distance}
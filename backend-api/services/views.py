@@ -1,6 +1,7 @@
 from rest_framework import viewsets, permissions, status, serializers
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.db import transaction
 from django.db.models import Avg, Count
 from django.shortcuts import get_object_or_404
 from .models import Service, TypeOfService, Order, Payment, Review
@@ -11,13 +12,22 @@ from .serializers import (
 from .permissions import IsDeliverer
 from .assignment import OrderAssignmentService
 from .availability import AvailabilityService
+from .queue import AssignmentQueue
+from .reservations import SlotReservationService
+from .roster import DelivererRoster
+from .trips import TripPlanner
+from .conf import assignment_setting
 from .throttles import OrderCreateRateThrottle
+from .pagination import KeysetPagination
+from .stats import UserOrderStatsService
+from condominiums.schedule import SlotTemplate
+from backend.eager_loading import EagerLoadingMixin, eager_load
 from backend.permissions import (
     IsOwner, IsReceiver, IsDeliverer as IsDelivererRole,
     IsOrderParticipant, IsReceiverOfOrder, IsDelivererOfOrder
 )
 
-class ServiceViewSet(viewsets.GenericViewSet):
+class ServiceViewSet(EagerLoadingMixin, viewsets.GenericViewSet):
     queryset = Service.objects.all()
     serializer_class = ServiceSerializer
     permission_classes = [permissions.IsAuthenticated, IsDeliverer]
@@ -61,13 +71,16 @@ class TypeOfServiceViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticated()]
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing orders.
     Includes auto-assignment of available deliverers.
+    Lists are paginated by keyset (see KeysetPagination); ?paginate=false
+    returns the whole list.
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
 
     def get_throttles(self):
         if self.action == 'create':
@@ -88,6 +101,9 @@ class OrderViewSet(viewsets.ModelViewSet):
         elif self.action == 'cancel_order':
             # Only order owner can cancel
             return [permissions.IsAuthenticated(), IsReceiverOfOrder()]
+        elif self.action in ['open_orders', 'claim', 'trip_plan']:
+            # Any deliverer can browse and claim the open pool and plan its runs
+            return [permissions.IsAuthenticated(), IsDelivererRole()]
         elif self.action in ['list', 'retrieve', 'my_requests', 'my_deliveries']:
             # Authenticated users can view orders they're involved in
             return [permissions.IsAuthenticated()]
@@ -134,7 +150,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action == 'create':
             return [permissions.IsAuthenticated(), IsReceiver()]
-        elif self.action in ['accept_order', 'reject_order', 'complete_order']:
+        elif self.action in ['accept_order', 'reject_order', 'complete_order', 'open_orders', 'claim', 'trip_plan']:
             return [permissions.IsAuthenticated(), IsDelivererRole()]
         elif self.action == 'cancel_order':
             return [permissions.IsAuthenticated(), IsReceiverOfOrder()]
@@ -154,8 +170,28 @@ class OrderViewSet(viewsets.ModelViewSet):
                 "Tu departamento debe estar asociado a un condominio"
             )
 
-        # Save order first
-        order = serializer.save(receiver=receiver)
+        condominium = receiver.department.condominium
+        with transaction.atomic():
+            # Scheduled orders take a unit of their slot's capacity
+            slot = None
+            if not serializer.validated_data.get('is_immediate', False):
+                slot, message = SlotReservationService.reserve(
+                    condominium, serializer.validated_data['scheduled_date']
+                )
+                if slot is None:
+                    raise serializers.ValidationError(message)
+
+            # Save order first
+            order = serializer.save(receiver=receiver, slot=slot)
+
+        if condominium.open_orders_mode:
+            # The order waits in the open pool until a deliverer claims it
+            return
+
+        if assignment_setting('ASYNC'):
+            # Return right away, the order stays pending until a worker assigns it
+            AssignmentQueue.enqueue(order)
+            return
 
         # Use assignment service for fair distribution
         assigned_deliverer = OrderAssignmentService.assign_order_to_deliverer(order)
@@ -165,6 +201,42 @@ class OrderViewSet(viewsets.ModelViewSet):
             order.status = Order.OrderStatus.PENDING
             order.save()
 
+    def perform_update(self, serializer):
+        order = serializer.instance
+        scheduled_date = serializer.validated_data.get('scheduled_date', order.scheduled_date)
+        is_immediate = serializer.validated_data.get('is_immediate', order.is_immediate)
+
+        if is_immediate:
+            # Immediate orders don't hold a slot
+            held_slot_id = order.slot_id
+            with transaction.atomic():
+                serializer.save(slot=None)
+                if held_slot_id:
+                    SlotReservationService.release(held_slot_id)
+            return
+
+        if not order.is_immediate and scheduled_date == order.scheduled_date:
+            serializer.save()
+            return
+
+        department = order.receiver.department
+        if department is None:
+            raise serializers.ValidationError(
+                "El receptor debe tener un departamento asignado para programar la orden"
+            )
+
+        # Moving or scheduling an order swaps its slot reservation
+        with transaction.atomic():
+            slot, message = SlotReservationService.reserve(
+                department.condominium_id, scheduled_date,
+                held_slot_id=order.slot_id
+            )
+            if slot is None:
+                raise serializers.ValidationError(message)
+            if order.slot_id and order.slot_id != slot.pk:
+                SlotReservationService.release(order.slot_id)
+            serializer.save(slot=slot)
+
     @action(detail=True, methods=['post'])
     def accept_order(self, request, pk=None):
         """Deliverer accepts an order"""
@@ -210,6 +282,8 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         if new_deliverer:
             message = f"Orden reasignada a {new_deliverer.get_full_name()}"
+        elif order.status == Order.OrderStatus.NOT_ASSIGNED:
+            message = "Orden rechazada demasiadas veces. Queda sin asignar"
         else:
             message = "Orden rechazada. No hay repartidores disponibles en este momento"
 
@@ -219,6 +293,51 @@ class OrderViewSet(viewsets.ModelViewSet):
             "order": serializer.data
         })
 
+    @action(detail=False, methods=['get'], url_path='open')
+    def open_orders(self, request):
+        """Orders of the deliverer's condominium waiting to be claimed, oldest first"""
+        try:
+            limit = min(int(request.query_params.get('limit', 50)), 100)
+        except ValueError:
+            return Response(
+                {"error": "El límite debe ser un número"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        pool = eager_load(OrderAssignmentService.open_pool(request.user), self.get_serializer_class())
+        orders = OrderAssignmentService.open_orders(request.user, max(limit, 1), pool=pool)
+        serializer = self.get_serializer(orders, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def claim(self, request, pk=None):
+        """Deliverer takes an order from the open pool"""
+        if not str(pk).isdigit():
+            return Response(
+                {"error": "Orden no encontrada"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if not request.user.is_available_for_delivery:
+            return Response(
+                {"error": "Debes activar tu disponibilidad para tomar órdenes"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not OrderAssignmentService.check_deliverer_availability(request.user):
+            return Response(
+                {"error": "Ya tienes el máximo de órdenes activas"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Checked again under the load lock, against concurrent claims
+        order, message = OrderAssignmentService.claim_open_order(pk, request.user)
+        if order is None:
+            return Response({"error": message}, status=status.HTTP_409_CONFLICT)
+
+        serializer = self.get_serializer(order)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def complete_order(self, request, pk=None):
         """Mark order as completed"""
@@ -265,6 +384,13 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
+    # Query parameters that narrow the orders listed by get_queryset
+    ORDER_FILTER_PARAMS = ('status', 'condominium', 'date_from', 'date_to', 'is_immediate')
+
+    def _has_order_filters(self, request):
+        """Whether the listed orders are a subset of the user's, so stats must be aggregated"""
+        return any(request.query_params.get(param) is not None for param in self.ORDER_FILTER_PARAMS)
+
     @action(detail=False, methods=['get'])
     def my_deliveries(self, request):
         """Get orders where user is the deliverer with statistics"""
@@ -284,29 +410,32 @@ class OrderViewSet(viewsets.ModelViewSet):
         if date_to:
             orders = orders.filter(scheduled_date__lte=date_to)
 
-        # Order by date
-        orders = orders.order_by('-scheduled_date')
-
-        # Calculate statistics
-        from django.db.models import Sum, Count, Q
-        stats = orders.aggregate(
-            total_orders=Count('id'),
-            completed_orders=Count('id', filter=Q(status=Order.OrderStatus.COMPLETED)),
-            pending_orders=Count('id', filter=Q(status=Order.OrderStatus.PENDING)),
-            accepted_orders=Count('id', filter=Q(status=Order.OrderStatus.ACCEPTED)),
-            total_earnings=Sum('amount', filter=Q(status=Order.OrderStatus.COMPLETED)) or 0
-        )
+        # Order by date, newest first, one page at a time, relations joined in
+        orders = eager_load(orders.order_by('-scheduled_date', '-id'), self.get_serializer_class())
+        paginator = KeysetPagination('scheduled_date')
+        page = paginator.paginate_queryset(orders, request, view=self)
+
+        # Calculate statistics, read from the user's stats record unless filtered
+        user_stats = UserOrderStatsService.get(request.user)
+        if self._has_order_filters(request):
+            from django.db.models import Sum, Count, Q
+            stats = orders.aggregate(
+                total_orders=Count('id'),
+                completed_orders=Count('id', filter=Q(status=Order.OrderStatus.COMPLETED)),
+                pending_orders=Count('id', filter=Q(status=Order.OrderStatus.PENDING)),
+                accepted_orders=Count('id', filter=Q(status=Order.OrderStatus.ACCEPTED)),
+                total_earnings=Sum('amount', filter=Q(status=Order.OrderStatus.COMPLETED)) or 0
+            )
+        else:
+            stats = UserOrderStatsService.delivery_summary(user_stats)
 
-        # Calculate average rating
-        avg_rating = Review.objects.filter(
-            order__deliverer=request.user,
-            order__status=Order.OrderStatus.COMPLETED
-        ).aggregate(avg=Avg('rating'))['avg'] or 0
+        avg_rating = UserOrderStatsService.average_rating(user_stats)
 
-        serializer = self.get_serializer(orders, many=True)
+        serializer = self.get_serializer(orders if page is None else page, many=True)
 
         return Response({
             'orders': serializer.data,
+            'next': None if page is None else paginator.get_next_link(),
             'statistics': {
                 'total_orders': stats['total_orders'],
                 'completed_orders': stats['completed_orders'],
@@ -318,6 +447,38 @@ class OrderViewSet(viewsets.ModelViewSet):
             }
         })
 
+    @action(detail=False, methods=['get'])
+    def trip_plan(self, request):
+        """
+        Group the deliverer's pending and accepted orders into runs per time
+        window, with the stops of each run ordered by tower and floor.
+        include_unassigned=true adds unassigned orders it could take.
+        """
+        include_unassigned = request.query_params.get('include_unassigned', 'false').lower() == 'true'
+        runs = TripPlanner.plan(request.user, include_unassigned)
+
+        return Response({
+            'runs': [
+                {
+                    'window_start': run['window_start'].isoformat(),
+                    'window_end': run['window_end'].isoformat(),
+                    'distance': run['distance'],
+                    'orders': [
+                        {
+                            **data,
+                            'tower': order.receiver.department.tower if order.receiver.department else None,
+                            'floor': order.receiver.department.floor if order.receiver.department else None,
+                            'suggested': order.suggested
+                        }
+                        for order, data in zip(
+                            run['orders'], self.get_serializer(run['orders'], many=True).data
+                        )
+                    ]
+                }
+                for run in runs
+            ]
+        })
+
     @action(detail=False, methods=['get'])
     def my_requests(self, request):
         """Get orders where user is the receiver with statistics"""
@@ -337,23 +498,29 @@ class OrderViewSet(viewsets.ModelViewSet):
         if date_to:
             orders = orders.filter(scheduled_date__lte=date_to)
 
-        # Order by date
-        orders = orders.order_by('-scheduled_date')
-
-        # Calculate statistics
-        from django.db.models import Sum, Count, Q
-        stats = orders.aggregate(
-            total_orders=Count('id'),
-            completed_orders=Count('id', filter=Q(status=Order.OrderStatus.COMPLETED)),
-            pending_orders=Count('id', filter=Q(status=Order.OrderStatus.PENDING)),
-            cancelled_orders=Count('id', filter=Q(status=Order.OrderStatus.CANCELLED)),
-            total_spent=Sum('amount', filter=Q(status=Order.OrderStatus.COMPLETED)) or 0
-        )
+        # Order by date, newest first, one page at a time, relations joined in
+        orders = eager_load(orders.order_by('-scheduled_date', '-id'), self.get_serializer_class())
+        paginator = KeysetPagination('scheduled_date')
+        page = paginator.paginate_queryset(orders, request, view=self)
+
+        # Calculate statistics, read from the user's stats record unless filtered
+        if self._has_order_filters(request):
+            from django.db.models import Sum, Count, Q
+            stats = orders.aggregate(
+                total_orders=Count('id'),
+                completed_orders=Count('id', filter=Q(status=Order.OrderStatus.COMPLETED)),
+                pending_orders=Count('id', filter=Q(status=Order.OrderStatus.PENDING)),
+                cancelled_orders=Count('id', filter=Q(status=Order.OrderStatus.CANCELLED)),
+                total_spent=Sum('amount', filter=Q(status=Order.OrderStatus.COMPLETED)) or 0
+            )
+        else:
+            stats = UserOrderStatsService.request_summary(UserOrderStatsService.get(request.user))
 
-        serializer = self.get_serializer(orders, many=True)
+        serializer = self.get_serializer(orders if page is None else page, many=True)
 
         return Response({
             'orders': serializer.data,
+            'next': None if page is None else paginator.get_next_link(),
             'statistics': {
                 'total_orders': stats['total_orders'],
                 'completed_orders': stats['completed_orders'],
@@ -377,19 +544,65 @@ class OrderViewSet(viewsets.ModelViewSet):
         condominium = user.department.condominium
 
         # Get available deliverers count
-        available_deliverers = OrderAssignmentService.get_available_deliverers(
-            condominium, exclude_user=user
-        )
+        available_deliverers = DelivererRoster.ids(condominium, exclude_user=user)
 
         # Check immediate delivery availability
-        immediate_available = AvailabilityService.is_immediate_delivery_available(
+        immediate = AvailabilityService.get_immediate_availability(
             condominium, exclude_user=user
         )
 
-        # Get today's time slots
-        from datetime import date
+        # Get today's time slots (condominium local date)
         time_slots = AvailabilityService.get_available_time_slots(
-            condominium, date.today(), exclude_user=user
+            condominium, SlotTemplate.for_condominium(condominium).today(),
+            exclude_user=user, limit=6
+        )
+
+        return Response({
+            "condominium": {
+                "id": condominium.id,
+                "name": condominium.name
+            },
+            "available_deliverers_count": len(available_deliverers),
+            "immediate_delivery_available": immediate['available'],
+            "spare_capacity_count": immediate['spare_capacity_count'],
+            "earliest_eta": immediate['earliest_eta'],
+            "time_slots_today": time_slots  # Next 6 available slots
+        })
+
+    @action(detail=False, methods=['get'])
+    def availability_calendar(self, request):
+        """
+        Slot availability in user's condominium for up to 14 days.
+        Query params: start_date (YYYY-MM-DD, default today), days (default 7)
+        """
+        user = request.user
+
+        if not user.department or not user.department.condominium:
+            return Response({
+                "error": "Usuario sin departamento o condominio asignado"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        from datetime import date
+        condominium = user.department.condominium
+        try:
+            start_param = request.query_params.get('start_date')
+            start_date = (
+                date.fromisoformat(start_param) if start_param
+                else SlotTemplate.for_condominium(condominium).today()
+            )
+            days = int(request.query_params.get('days', 7))
+        except ValueError:
+            return Response({
+                "error": "Parámetros start_date o days inválidos"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if not 1 <= days <= AvailabilityService.MAX_CALENDAR_DAYS:
+            return Response({
+                "error": f"days debe estar entre 1 y {AvailabilityService.MAX_CALENDAR_DAYS}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        calendar = AvailabilityService.get_availability_calendar(
+            condominium, start_date, days, exclude_user=user
         )
 
         return Response({
@@ -397,13 +610,11 @@ class OrderViewSet(viewsets.ModelViewSet):
                 "id": condominium.id,
                 "name": condominium.name
             },
-            "available_deliverers_count": available_deliverers.count(),
-            "immediate_delivery_available": immediate_available,
-            "time_slots_today": time_slots[:6]  # Next 6 available slots
+            **calendar
         })
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing payments.
     Only receivers can create payments for their orders.
@@ -485,7 +696,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing reviews.
     Users can only create reviews for completed orders they participated in.
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
+from services.reservations import SlotReservationService
+from services.roster import DelivererRoster
 from .models import UserAccount
 
 
@@ -36,13 +38,23 @@ class UserAccountAdmin(BaseUserAdmin):
 
     def make_deliverer(self, request, queryset):
         """Change selected users to deliverer role"""
+        condominium_ids = set(
+            queryset.filter(department__isnull=False).values_list('department__condominium_id', flat=True)
+        )
         updated = queryset.update(role=UserAccount.UserRole.DELIVERER)
+        DelivererRoster.invalidate(condominium_ids)
+        SlotReservationService.staffing_changed(condominium_ids)
         self.message_user(request, f'{updated} usuarios cambiados a rol Repartidor.')
     make_deliverer.short_description = "Cambiar a rol Repartidor"
 
     def make_receiver(self, request, queryset):
         """Change selected users to receiver role"""
+        condominium_ids = set(
+            queryset.filter(department__isnull=False).values_list('department__condominium_id', flat=True)
+        )
         updated = queryset.update(role=UserAccount.UserRole.RECEIVER)
+        DelivererRoster.invalidate(condominium_ids)
+        SlotReservationService.staffing_changed(condominium_ids)
         self.message_user(request, f'{updated} usuarios cambiados a rol Receptor.')
     make_receiver.short_description = "Cambiar a rol Receptor"
 
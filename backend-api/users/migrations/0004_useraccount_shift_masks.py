@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_useraccount_date_joined_alter_useraccount_department'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useraccount',
+            name='shift_masks',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -42,6 +42,8 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
         default=UserRole.RECEIVER
     )
     department = models.ForeignKey('condominiums.Department', on_delete=models.SET_NULL, null=True, blank=True, related_name="users")
+    # Recurring delivery shifts, one bitmask per weekday (see shifts.py)
+    shift_masks = models.JSONField(default=list, blank=True)
     date_joined = models.DateTimeField(auto_now_add=True)
 
     # This allow to use User.objects with .get, .filter, .create_user,
@@ -54,6 +56,35 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    # Fields that decide whether the user is on a condominium's deliverer roster
+    ROSTER_FIELDS = ('role', 'is_available_for_delivery', 'department_id', 'shift_masks')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted roster fields to invalidate deliverer rosters on change
+        instance._tracked_roster_state = tuple(
+            instance.__dict__.get(field) for field in cls.ROSTER_FIELDS
+        )
+        return instance
+
+    def _roster_state(self):
+        return tuple(getattr(self, field) for field in self.ROSTER_FIELDS)
+
+    def save(self, *args, **kwargs):
+        from services.roster import DelivererRoster
+
+        previous_state = getattr(self, '_tracked_roster_state', None)
+        super().save(*args, **kwargs)
+        DelivererRoster.user_changed(previous_state, self._roster_state())
+        self._tracked_roster_state = self._roster_state()
+
+    def delete(self, *args, **kwargs):
+        from services.roster import DelivererRoster
+
+        DelivererRoster.user_changed(getattr(self, '_tracked_roster_state', None), None)
+        return super().delete(*args, **kwargs)
+
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
 
@@ -15,6 +15,8 @@ class UserAccountSerializer(serializers.ModelSerializer):
                   'date_joined', 'last_login']
         read_only_fields = ['id', 'email', 'date_joined', 'last_login',
                            'full_name', 'role_display', 'department_info']
+        # Relations read per row, loaded up front by EagerLoadingMixin viewsets
+        select_related = ('department__condominium',)
 
     def get_full_name(self, obj):
         return obj.get_full_name()
@@ -23,7 +25,7 @@ class UserAccountSerializer(serializers.ModelSerializer):
         if obj.department:
             return {
                 'id': obj.department.id,
-                'number': obj.department.number,
+                'name': obj.department.name,
                 'floor': obj.department.floor,
                 'tower': obj.department.tower,
                 'condominium': {
@@ -0,0 +1,87 @@
+"""
+Deliverer Shifts
+Recurring shifts are stored per weekday as a bitmask of 15-minute blocks of
+the local day (bit i = minutes [15 * i, 15 * (i + 1))), so checking who is
+on shift for a slot is a bitwise AND over the deliverers of a condominium.
+A deliverer without shifts (empty list) is available whenever toggled on.
+"""
+import datetime
+
+
+class ShiftMask:
+    """Helpers to build and read deliverer shift bitmasks"""
+
+    # Minutes covered by each bit
+    RESOLUTION = 15
+    BITS_PER_DAY = 24 * 60 // RESOLUTION
+
+    @staticmethod
+    def bit_for(local_time):
+        """Bit of the block containing a local time"""
+        return 1 << ((local_time.hour * 60 + local_time.minute) // ShiftMask.RESOLUTION)
+
+    @staticmethod
+    def from_window(start_time, end_time):
+        """Bitmask of the blocks between two local times (end exclusive)"""
+        start = (start_time.hour * 60 + start_time.minute) // ShiftMask.RESOLUTION
+        end = -(-(end_time.hour * 60 + end_time.minute) // ShiftMask.RESOLUTION)
+        if end_time == datetime.time.min:
+            end = ShiftMask.BITS_PER_DAY  # 00:00 as end means midnight
+        if end <= start:
+            raise ValueError("La hora de fin debe ser posterior a la de inicio")
+        return ((1 << end) - 1) ^ ((1 << start) - 1)
+
+    @staticmethod
+    def compile(windows):
+        """
+        Compile shift windows into 7 daily masks (Monday first).
+        windows: iterable of {'weekdays': [0..6], 'start': 'HH:MM', 'end': 'HH:MM'}
+        """
+        masks = [0] * 7
+        for window in windows:
+            mask = ShiftMask.from_window(
+                datetime.time.fromisoformat(window['start']),
+                datetime.time.fromisoformat(window['end'])
+            )
+            for weekday in window['weekdays']:
+                if weekday not in range(7):
+                    raise ValueError("Los días de la semana van de 0 (lunes) a 6 (domingo)")
+                masks[weekday] |= mask
+        return masks if any(masks) else []
+
+    @staticmethod
+    def to_windows(masks):
+        """Expand daily masks back into one window per contiguous block run"""
+        windows = []
+        for weekday, mask in enumerate(masks):
+            bit = 0
+            while mask >> bit:
+                if not mask >> bit & 1:
+                    bit += 1
+                    continue
+                start = bit
+                while mask >> bit & 1:
+                    bit += 1
+                windows.append({
+                    'weekdays': [weekday],
+                    'start': ShiftMask._block_time(start),
+                    'end': ShiftMask._block_time(bit),
+                })
+        return windows
+
+    @staticmethod
+    def _block_time(block):
+        minutes = block * ShiftMask.RESOLUTION % (24 * 60)
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    @staticmethod
+    def day_mask(masks, weekday):
+        """Mask of a weekday, or None when the deliverer has no shifts"""
+        return masks[weekday] if masks else None
+
+    @staticmethod
+    def is_on_shift(masks, local_datetime):
+        """Whether a deliverer with these masks works at a local datetime"""
+        if not masks:
+            return True
+        return bool(masks[local_datetime.weekday()] & ShiftMask.bit_for(local_datetime))
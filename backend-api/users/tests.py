@@ -1,3 +1,198 @@
+import datetime
 from django.test import TestCase
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+from backend.query_budget import QueryBudgetTestCase, QueryBudgetWorld
+from .models import UserAccount
+from .views import UserAccountViewSet
 
-# Create your tests here.
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+    """
+    Query budgets of /api/users/; djoser's routes shadow the viewset's
+    under the same prefix, so actions not mounted ahead of djoser (see
+    users.urls.shadowed_urlpatterns) are called directly
+    """
+
+    def test_list(self):
+        self.assertQueryBudget(2, lambda: self.call_view(
+            UserAccountViewSet, {'get': 'list'}, self.world.staff
+        ))
+
+    def test_retrieve(self):
+        self.assertQueryBudget(2, lambda: self.call_view(
+            UserAccountViewSet, {'get': 'retrieve'}, self.world.deliverer, pk=self.world.deliverer.id
+        ))
+
+    def test_partial_update(self):
+        self.assertQueryBudget(3, lambda: self.call_view(
+            UserAccountViewSet, {'patch': 'partial_update'}, self.world.receiver, method='patch',
+            data={'first_name': 'Ana'}, pk=self.world.receiver.id
+        ))
+
+    def test_destroy(self):
+        self.assertQueryBudget(
+            14,
+            lambda user: self.call_view(
+                UserAccountViewSet, {'delete': 'destroy'}, self.world.staff, method='delete', pk=user.id
+            ),
+            prepare=lambda: (self.world.create_user(),)
+        )
+
+    def test_me(self):
+        self.assertQueryBudget(3, lambda: self.call_view(
+            UserAccountViewSet, {'get': 'me'}, self.world.deliverer
+        ))
+
+    def test_me_update(self):
+        self.assertQueryBudget(4, lambda: self.call_view(
+            UserAccountViewSet, {'patch': 'me'}, self.world.receiver, method='patch',
+            data={'last_name': 'Receptora'}
+        ))
+
+    def test_toggle_availability(self):
+        # Turning availability off; turning it on drains the backlog up to capacity
+        self.assertQueryBudget(
+            4,
+            lambda: self.call_view(
+                UserAccountViewSet, {'post': 'toggle_availability'}, self.world.claimer, method='post'
+            ),
+            prepare=self.make_claimer_available
+        )
+
+    def make_claimer_available(self):
+        UserAccount.objects.filter(pk=self.world.claimer.pk).update(is_available_for_delivery=True)
+        return ()
+
+    def test_shifts(self):
+        self.assertQueryBudget(1, lambda: self.client_for(self.world.deliverer).get('/api/users/shifts/'))
+
+    def test_shifts_update(self):
+        self.assertQueryBudget(2, lambda: self.client_for(self.world.deliverer).put(
+            '/api/users/shifts/',
+            {'shifts': [{'weekdays': [0, 1, 2, 3, 4], 'start': '18:00', 'end': '21:00'}]}, format='json'
+        ))
+
+    def test_update_department(self):
+        self.assertQueryBudget(4, lambda: self.call_view(
+            UserAccountViewSet, {'put': 'update_department'}, self.world.receiver, method='put',
+            data={'department_id': self.world.receiver.department_id}
+        ))
+
+    def test_earnings_summary(self):
+        self.assertQueryBudget(5, lambda: self.call_view(
+            UserAccountViewSet, {'get': 'earnings_summary'}, self.world.deliverer
+        ))
+
+    def test_earnings_summary_filtered(self):
+        today = self.world.now.date()
+        self.assertQueryBudget(6, lambda: self.call_view(
+            UserAccountViewSet, {'get': 'earnings_summary'}, self.world.deliverer,
+            data={'date_from': (today.replace(day=1)).isoformat(), 'date_to': today.isoformat()}
+        ))
+
+    def test_earnings_series(self):
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.deliverer).get(
+            '/api/users/earnings_series/'
+        ))
+
+    def test_earnings_series_monthly(self):
+        self.assertQueryBudget(3, lambda: self.client_for(self.world.deliverer).get(
+            '/api/users/earnings_series/', {'period': 'month'}
+        ))
+
+    def test_available_deliverers(self):
+        # Every deliverer of the condominium, with its stats and load
+        self.assertQueryBudget(5, lambda: self.call_view(
+            UserAccountViewSet, {'get': 'available_deliverers'}, self.world.receiver
+        ))
+
+
+class ShiftsTests(TestCase):
+    """GET/PUT /api/users/shifts/ through the real route"""
+
+    def setUp(self):
+        self.world = QueryBudgetWorld()
+        self.client = APIClient()
+        self.client.force_authenticate(self.world.deliverer)
+
+    def put_shifts(self, data):
+        return self.client.put('/api/users/shifts/', data, format='json')
+
+    def test_malformed_bodies_are_rejected(self):
+        for data in ([], 'turnos', {'shifts': 'turnos'}, {'shifts': [{'start': '18:00'}]}):
+            with self.subTest(data=data):
+                self.assertEqual(self.put_shifts(data).status_code, 400)
+
+    def test_shifts_are_replaced(self):
+        response = self.put_shifts({'shifts': [{'weekdays': [5], 'start': '09:00', 'end': '12:00'}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['shifts'], [{'weekdays': [5], 'start': '09:00', 'end': '12:00'}])
+        response = self.client.get('/api/users/shifts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['shifts'], [{'weekdays': [5], 'start': '09:00', 'end': '12:00'}])
+
+
+class EarningsParamsTests(TestCase):
+    """Date range params of the earnings endpoints"""
+
+    def setUp(self):
+        self.world = QueryBudgetWorld()
+
+    def get(self, action, params):
+        if action == 'earnings_series':
+            # Mounted ahead of djoser, so reachable through its URL
+            client = APIClient()
+            client.force_authenticate(self.world.deliverer)
+            return client.get('/api/users/earnings_series/', params)
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user=self.world.deliverer)
+        return UserAccountViewSet.as_view({'get': action})(request)
+
+    def test_series_range_is_bounded_before_listing_periods(self):
+        response = self.get('earnings_series', {'date_from': '0001-01-01', 'date_to': '9999-12-31'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_datetimes_are_accepted(self):
+        response = self.get('earnings_summary', {
+            'date_from': '2024-05-01T00:00:00Z', 'date_to': '2024-05-31T23:59:59'
+        })
+        self.assertEqual(response.status_code, 200)
+        response = self.get('earnings_series', {'date_from': '2024-05-01T08:30:00Z', 'date_to': '2024-05-03'})
+        self.assertEqual([point['start'] for point in response.data['series']], [
+            datetime.date(2024, 5, 1), datetime.date(2024, 5, 2), datetime.date(2024, 5, 3)
+        ])
+        self.assertEqual(self.get('earnings_summary', {'date_from': 'ayer'}).status_code, 400)
+
+
+class AuthQueryBudgetTests(QueryBudgetTestCase):
+    """Query budgets of the JWT, logout and social auth endpoints"""
+
+    def test_jwt_create(self):
+        self.assertQueryBudget(1, lambda: APIClient().post('/api/jwt/create/', {
+            'email': self.world.receiver.email, 'password': self.world.PASSWORD
+        }, format='json'))
+
+    def test_jwt_refresh(self):
+        self.assertQueryBudget(
+            0,
+            lambda refresh: APIClient().post('/api/jwt/refresh/', {'refresh': str(refresh)}, format='json'),
+            prepare=lambda: (RefreshToken.for_user(self.world.receiver),)
+        )
+
+    def test_jwt_verify(self):
+        self.assertQueryBudget(
+            0,
+            lambda refresh: APIClient().post(
+                '/api/jwt/verify/', {'token': str(refresh.access_token)}, format='json'
+            ),
+            prepare=lambda: (RefreshToken.for_user(self.world.receiver),)
+        )
+
+    def test_logout(self):
+        self.assertQueryBudget(1, lambda: self.client_for(self.world.receiver).post('/api/logout/'))
+
+    def test_provider_auth_url(self):
+        self.assertQueryBudget(4, lambda: APIClient().get(
+            '/api/o/google-oauth2/', {'redirect_uri': 'http://localhost'}
+        ))
@@ -12,6 +12,14 @@ from .views import (
 router = DefaultRouter()
 router.register(r'users', UserAccountViewSet)
 
+# djoser's UserViewSet owns users/ and reads users/<name>/ as a user id, so
+# actions of UserAccountViewSet it would shadow are routed explicitly and
+# mounted before djoser (see backend/urls.py)
+shadowed_urlpatterns = [
+    path('users/shifts/', UserAccountViewSet.as_view({'get': 'shifts', 'put': 'shifts'})),
+    path('users/earnings_series/', UserAccountViewSet.as_view({'get': 'earnings_series'})),
+]
+
 urlpatterns = [
     re_path(
         r'^o/(?P<provider>\S+)/$',
@@ -1,4 +1,7 @@
+from datetime import timedelta
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets, permissions
@@ -11,8 +14,13 @@ from rest_framework_simplejwt.views import (
 )
 from .models import UserAccount
 from .serializers import UserAccountSerializer
+from .shifts import ShiftMask
+from backend.eager_loading import EagerLoadingMixin
 from services.availability import AvailabilityService
 from services.assignment import OrderAssignmentService
+from services.load import DelivererLoadService
+from services.stats import UserOrderStatsService
+from services.rollups import EarningsRollupService
 
 class CustomProviderAuthView(ProviderAuthView):
     def post(self, request, *args, **kwargs):
@@ -117,7 +125,7 @@ class LogoutView(APIView):
         return response
 
 
-class UserAccountViewSet(viewsets.ModelViewSet):
+class UserAccountViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """
     ViewSet for user profile management.
     Users can only view and update their own profile.
@@ -172,6 +180,44 @@ class UserAccountViewSet(viewsets.ModelViewSet):
             "message": message
         })
 
+    @action(detail=False, methods=['get', 'put'])
+    def shifts(self, request):
+        """
+        Get or replace the current deliverer's recurring shifts.
+        PUT body: {"shifts": [{"weekdays": [0, 1, 2, 3, 4], "start": "18:00", "end": "21:00"}]}
+        An empty list means available whenever delivery availability is on.
+        """
+        user = request.user
+
+        if request.method == 'PUT':
+            if user.role not in [UserAccount.UserRole.DELIVERER,
+                                 UserAccount.UserRole.RECEIVER_AND_DELIVERER]:
+                return Response(
+                    {"error": "Usuario no tiene rol de repartidor"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if not isinstance(request.data, dict) or not isinstance(request.data.get('shifts', []), list):
+                return Response(
+                    {"error": "Turnos inválidos: se espera {\"shifts\": [...]}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                shift_masks = ShiftMask.compile(request.data.get('shifts', []))
+            except (KeyError, TypeError, ValueError) as err:
+                return Response(
+                    {"error": f"Turnos inválidos: {err}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            user.shift_masks = shift_masks
+            user.save(update_fields=['shift_masks'])
+
+        return Response({
+            "shifts": ShiftMask.to_windows(user.shift_masks)
+        })
+
     @action(detail=False, methods=['get'])
     def earnings_summary(self, request):
         """Get earnings summary for deliverer users"""
@@ -186,60 +232,36 @@ class UserAccountViewSet(viewsets.ModelViewSet):
             )
 
         # Get date filters
-        date_from = request.query_params.get('date_from', None)
-        date_to = request.query_params.get('date_to', None)
-
-        # Import required models
-        from services.models import Order, Review
-        from django.db.models import Sum, Count, Avg
-        from django.utils import timezone
-        from datetime import timedelta
-
-        # Base query for completed orders
-        orders_query = Order.objects.filter(
-            deliverer=user,
-            status=Order.OrderStatus.COMPLETED
-        )
+        try:
+            date_from, date_to = self._date_range_params(request)
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Apply date filters
-        if date_from:
-            orders_query = orders_query.filter(scheduled_date__gte=date_from)
-        if date_to:
-            orders_query = orders_query.filter(scheduled_date__lte=date_to)
+        # Total earnings, read from the user's stats record unless filtered
+        user_stats = UserOrderStatsService.get(user)
+        if date_from or date_to:
+            totals = EarningsRollupService.total(user, date_from, date_to)
+            earnings_data = {
+                'total_earnings': totals['amount'],
+                'total_orders': totals['completed_orders']
+            }
+        else:
+            delivery_summary = UserOrderStatsService.delivery_summary(user_stats)
+            earnings_data = {
+                'total_earnings': delivery_summary['total_earnings'],
+                'total_orders': delivery_summary['completed_orders']
+            }
 
-        # Calculate earnings
-        earnings_data = orders_query.aggregate(
-            total_earnings=Sum('amount') or 0,
-            total_orders=Count('id')
-        )
+        # Weekly (last 7 days) and monthly (last 30 days) earnings from the daily rollups
+        today = EarningsRollupService.today(user)
+        weekly_earnings = EarningsRollupService.total(user, today - timedelta(days=6))['amount']
+        monthly_earnings = EarningsRollupService.total(user, today - timedelta(days=29))['amount']
 
-        # Calculate weekly earnings (last 7 days)
-        week_ago = timezone.now() - timedelta(days=7)
-        weekly_earnings = Order.objects.filter(
-            deliverer=user,
-            status=Order.OrderStatus.COMPLETED,
-            scheduled_date__gte=week_ago
-        ).aggregate(amount=Sum('amount'))['amount'] or 0
-
-        # Calculate monthly earnings (last 30 days)
-        month_ago = timezone.now() - timedelta(days=30)
-        monthly_earnings = Order.objects.filter(
-            deliverer=user,
-            status=Order.OrderStatus.COMPLETED,
-            scheduled_date__gte=month_ago
-        ).aggregate(amount=Sum('amount'))['amount'] or 0
-
-        # Get average rating
-        avg_rating = Review.objects.filter(
-            order__deliverer=user,
-            order__status=Order.OrderStatus.COMPLETED
-        ).aggregate(avg=Avg('rating'))['avg'] or 0
-
-        # Get rating distribution
-        rating_distribution = Review.objects.filter(
-            order__deliverer=user,
-            order__status=Order.OrderStatus.COMPLETED
-        ).values('rating').annotate(count=Count('rating')).order_by('rating')
+        # Ratings from the stats record
+        avg_rating = UserOrderStatsService.average_rating(user_stats)
 
         return Response({
             'earnings': {
@@ -250,11 +272,110 @@ class UserAccountViewSet(viewsets.ModelViewSet):
             },
             'ratings': {
                 'average': round(avg_rating, 2) if avg_rating else 0,
-                'total_reviews': sum(r['count'] for r in rating_distribution),
-                'distribution': {r['rating']: r['count'] for r in rating_distribution}
+                'total_reviews': user_stats.rating_count,
+                'distribution': {
+                    int(rating): count
+                    for rating, count in sorted(user_stats.rating_distribution.items(), key=lambda item: int(item[0]))
+                }
             }
         })
 
+    # Default length of an earnings series for each period
+    EARNINGS_SERIES_DEFAULT_SPAN = {'day': 30, 'week': 12, 'month': 12}
+
+    @action(detail=False, methods=['get'])
+    def earnings_series(self, request):
+        """Get completed orders and earnings per day, week or month for deliverer users"""
+        user = request.user
+
+        # Check if user has deliverer role
+        if user.role not in [UserAccount.UserRole.DELIVERER,
+                           UserAccount.UserRole.RECEIVER_AND_DELIVERER]:
+            return Response(
+                {"error": "Solo los repartidores pueden ver ganancias"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        period = request.query_params.get('period', 'day')
+        if period not in EarningsRollupService.PERIODS:
+            return Response(
+                {"error": f"Periodo inválido. Use uno de: {', '.join(EarningsRollupService.PERIODS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            date_from, date_to = self._date_range_params(request)
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Default to the last periods up to today
+        date_to = date_to or EarningsRollupService.today(user)
+        if not date_from:
+            span = self.EARNINGS_SERIES_DEFAULT_SPAN[period]
+            date_from = EarningsRollupService.period_start(period, date_to)
+            for _ in range(span - 1):
+                date_from = EarningsRollupService.period_start(period, date_from - timedelta(days=1))
+
+        if date_from > date_to:
+            return Response(
+                {"error": "date_from debe ser anterior a date_to"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if EarningsRollupService.period_count(period, date_from, date_to) > EarningsRollupService.MAX_POINTS:
+            return Response(
+                {"error": f"El rango no puede tener más de {EarningsRollupService.MAX_POINTS} periodos"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        series = EarningsRollupService.series(user, period, date_from, date_to)
+        return Response({
+            'period': period,
+            'date_from': date_from,
+            'date_to': date_to,
+            'series': [
+                {
+                    'start': point['start'],
+                    'completed_orders': point['completed_orders'],
+                    'amount': float(point['amount'])
+                }
+                for point in series
+            ]
+        })
+
+    def _date_range_params(self, request):
+        """
+        Parse the date_from/date_to query params, None when missing. Days
+        (YYYY-MM-DD) are taken as is; datetimes, as accepted before the
+        rollups, count as their day in the user's condominium time zone.
+        """
+        dates = []
+        for param in ('date_from', 'date_to'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    parsed = parse_date(value)
+                    if parsed is None:
+                        moment = parse_datetime(value)
+                        if moment is not None:
+                            parsed = self._local_day(request.user, moment)
+                except ValueError:
+                    parsed = None
+                if parsed is None:
+                    raise ValueError(f"Formato de {param} inválido. Use YYYY-MM-DD o YYYY-MM-DDTHH:MM")
+                value = parsed
+            dates.append(value or None)
+        return tuple(dates)
+
+    def _local_day(self, user, moment):
+        """Day of a (possibly naive) datetime in the user's condominium time zone"""
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        condominium_id = user.department.condominium_id if user.department_id else None
+        return EarningsRollupService.local_day(condominium_id, moment)
+
     @action(detail=False, methods=['put'])
     def update_department(self, request):
         """Update user's department assignment"""
@@ -305,8 +426,6 @@ class UserAccountViewSet(viewsets.ModelViewSet):
 
         # Import models
         from condominiums.models import Condominium
-        from services.models import Order
-        from django.db.models import Avg
 
         try:
             condominium = Condominium.objects.get(id=condominium_id)
@@ -316,29 +435,22 @@ class UserAccountViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get available deliverers
+        # Get available deliverers with their stats and load records
         deliverers = OrderAssignmentService.get_available_deliverers(
             condominium, exclude_user=request.user
-        )
+        ).select_related('order_stats', 'delivery_load', 'department__condominium')
 
         # Add statistics for each deliverer
         deliverer_data = []
         for deliverer in deliverers:
-            # Get completed orders count
-            completed_orders = Order.objects.filter(
-                deliverer=deliverer,
-                status=Order.OrderStatus.COMPLETED
-            ).count()
-
-            # Get average rating
-            from services.models import Review
-            avg_rating = Review.objects.filter(
-                order__deliverer=deliverer,
-                order__status=Order.OrderStatus.COMPLETED
-            ).aggregate(avg=Avg('rating'))['avg'] or 0
+            deliverer_stats = UserOrderStatsService.get(deliverer)
+            completed_orders = UserOrderStatsService.delivery_summary(deliverer_stats)['completed_orders']
+            avg_rating = UserOrderStatsService.average_rating(deliverer_stats)
 
             # Check current availability
-            is_currently_available = OrderAssignmentService.check_deliverer_availability(deliverer)
+            is_currently_available = DelivererLoadService.has_capacity(
+                DelivererLoadService.get_load(deliverer)
+            )
 
             deliverer_info = UserAccountSerializer(deliverer).data
             deliverer_info['statistics'] = {
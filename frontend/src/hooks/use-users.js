@@ -13,6 +13,7 @@ export const userKeys = {
   current: () => [...userKeys.all, 'me'],
   availableDeliverers: (filters) => [...userKeys.all, 'available-deliverers', { filters }],
   earnings: (filters) => [...userKeys.all, 'earnings', { filters }],
+  earningsSeries: (filters) => [...userKeys.all, 'earnings-series', { filters }],
 };
 
 // Hook to get all users (admin)
@@ -137,6 +138,14 @@ export const useEarningsSummary = (params = {}) => {
   });
 };
 
+// Hook to get earnings series for charts
+export const useEarningsSeries = (params = {}) => {
+  return useQuery({
+    queryKey: userKeys.earningsSeries(params),
+    queryFn: () => usersService.getEarningsSeries(params),
+  });
+};
+
 // Hook to update user department
 export const useUpdateUserDepartment = () => {
   const queryClient = useQueryClient();
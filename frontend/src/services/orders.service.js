@@ -1,9 +1,9 @@
 import apiClient from './api-client';
 
 const ordersService = {
-  // Get all orders
+  // Get all orders (the API pages by cursor unless paginate=false)
   getOrders: async (params = {}) => {
-    return apiClient.get('/api/orders/', params);
+    return apiClient.get('/api/orders/', { paginate: false, ...params });
   },
 
   // Get single order
@@ -43,14 +43,29 @@ const ordersService = {
     return apiClient.post(`/api/orders/${id}/cancel_order/`, data);
   },
 
+  // Take an order from the open pool of the deliverer's condominium
+  claimOrder: async (id) => {
+    return apiClient.post(`/api/orders/${id}/claim/`);
+  },
+
+  // Get the open pool of orders waiting to be claimed
+  getOpenOrders: async (params = {}) => {
+    return apiClient.get('/api/orders/open/', params);
+  },
+
   // Get user's orders as receiver
   getMyRequests: async (params = {}) => {
-    return apiClient.get('/api/orders/my_requests/', params);
+    return apiClient.get('/api/orders/my_requests/', { paginate: false, ...params });
   },
 
   // Get user's orders as deliverer
   getMyDeliveries: async (params = {}) => {
-    return apiClient.get('/api/orders/my_deliveries/', params);
+    return apiClient.get('/api/orders/my_deliveries/', { paginate: false, ...params });
+  },
+
+  // Get the deliverer's orders grouped into runs (include_unassigned=true adds suggestions)
+  getTripPlan: async (params = {}) => {
+    return apiClient.get('/api/orders/trip_plan/', params);
   },
 
   // Check delivery availability
@@ -58,6 +73,11 @@ const ordersService = {
     return apiClient.get(`/api/orders/check_availability/?condominium=${condominiumId}`);
   },
 
+  // Get slot availability for several days (start_date, days up to 14)
+  getAvailabilityCalendar: async (params = {}) => {
+    return apiClient.get('/api/orders/availability_calendar/', params);
+  },
+
   // Get order statistics
   getOrderStats: async (params = {}) => {
     return apiClient.get('/api/orders/stats/', params);
@@ -46,11 +46,26 @@ const usersService = {
     return apiClient.get('/api/users/available_deliverers/', params);
   },
 
+  // Get recurring shifts (deliverer)
+  getShifts: async () => {
+    return apiClient.get('/api/users/shifts/');
+  },
+
+  // Replace recurring shifts: [{ weekdays: [0, 1], start: '18:00', end: '21:00' }]
+  updateShifts: async (shifts) => {
+    return apiClient.put('/api/users/shifts/', { shifts });
+  },
+
   // Get earnings summary (deliverer)
   getEarningsSummary: async (params = {}) => {
     return apiClient.get('/api/users/earnings_summary/', params);
   },
 
+  // Get earnings series (deliverer): { period: 'day' | 'week' | 'month', date_from, date_to }
+  getEarningsSeries: async (params = {}) => {
+    return apiClient.get('/api/users/earnings_series/', params);
+  },
+
   // Update user department
   updateUserDepartment: async ({ id, departmentId }) => {
     return apiClient.patch(`/api/users/${id}/`, { department: departmentId });